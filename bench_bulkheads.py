@@ -0,0 +1,82 @@
+"""
+Measure CRUD latency while report endpoints are under load.
+
+Runs --report-clients threads that request report URLs back to back
+(with a cache-busting parameter, so every request computes; 503s are
+retried after their Retry-After), and one
+client that requests the CRUD URL in a loop for --duration seconds.
+Prints the CRUD latency percentiles and the report status codes (503s are
+requests the report pool turned away).
+
+Usage:
+    python bench_bulkheads.py --base-url http://localhost:8000 \
+        --crud /projects/ /reports/portfolio-summary /reports/cash-flow/1
+"""
+import argparse
+import statistics
+import threading
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("reports", nargs="+", help="report paths to load the server with")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--crud", default="/projects/", help="CRUD path to time")
+    parser.add_argument("--report-clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--ignore-retry-after", action="store_true", help="retry 503s immediately")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def load(worker):
+        with httpx.Client(base_url=args.base_url, timeout=120) as client:
+            i = 0
+            while not stop.is_set():
+                path = args.reports[(worker + i) % len(args.reports)]
+                url = path + ("&" if "?" in path else "?") + f"_bench={time.time_ns()}"
+                try:
+                    response = client.get(url)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    response, status = None, type(e).__name__
+                with lock:
+                    statuses[status] += 1
+                i += 1
+                if status == 503 and not args.ignore_retry_after:
+                    stop.wait(float(response.headers.get("Retry-After", 1)))
+
+    loaders = [threading.Thread(target=load, args=(n,), daemon=True) for n in range(args.report_clients)]
+    for thread in loaders:
+        thread.start()
+    time.sleep(1)  # let the report load build up
+
+    latencies = []
+    with httpx.Client(base_url=args.base_url, timeout=120) as client:
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            client.get(args.crud).raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+    stop.set()
+
+    print(f"CRUD {args.crud}: {len(latencies)} requests, "
+          f"p50 {statistics.median(latencies):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms, "
+          f"max {max(latencies):.1f} ms")
+    print("report responses: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+
+
+if __name__ == "__main__":
+    main()
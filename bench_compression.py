@@ -0,0 +1,65 @@
+"""
+Measure bytes on the wire and time to first byte for report endpoints.
+
+Requests each URL against a running instance once per Accept-Encoding
+(identity, gzip and, when the server supports it, br) and reports the
+transferred body size, time to first byte and total time, as the median
+of --repeat requests. The first request per URL warms the report cache,
+so the numbers describe cache hits unless --cold is given (which adds a
+cache-busting query parameter).
+
+Usage:
+    python bench_compression.py --base-url http://localhost:8000 \
+        /reports/portfolio-summary /reports/budget-timeline/1
+"""
+import argparse
+import statistics
+import time
+
+import httpx
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def measure(client, url, encoding):
+    """(wire bytes, ttfb ms, total ms, content-encoding) for one request."""
+    started = time.perf_counter()
+    with client.stream("GET", url, headers={"Accept-Encoding": encoding}) as response:
+        chunks = response.iter_raw()
+        first = next(chunks, b"")
+        ttfb = time.perf_counter() - started
+        size = len(first) + sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - started
+    return size, ttfb * 1000, total * 1000, response.headers.get("content-encoding", "identity")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cold", action="store_true", help="bypass the report cache")
+    args = parser.parse_args()
+
+    print(f"{'path':<36} {'encoding':<9} {'bytes':>9} {'ttfb ms':>8} {'total ms':>9}")
+    with httpx.Client(base_url=args.base_url, timeout=60) as client:
+        for path in args.paths:
+            for encoding in ENCODINGS:
+                samples = []
+                for i in range(args.repeat + 1):
+                    url = path
+                    if args.cold:
+                        url += ("&" if "?" in path else "?") + f"_bench={time.time_ns()}"
+                    sample = measure(client, url, encoding)
+                    if i or args.cold:  # first request only warms the cache
+                        samples.append(sample)
+                served = samples[-1][3]
+                if served != encoding:
+                    continue  # not supported by the server
+                print(f"{path:<36} {encoding:<9} {samples[-1][0]:>9} "
+                      f"{statistics.median(s[1] for s in samples):>8.1f} "
+                      f"{statistics.median(s[2] for s in samples):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark memory and time of loading the transactions ledger.
+
+Fills a temporary SQLite file with --rows synthetic transactions (legacy
+Text columns included) and loads the fields the reports use three ways:
+
+    orm       db.query(models.Transaction).all(), then read the fields
+    projected the selected columns with .all(), unpacked at once (the
+              ledger snapshot's previous loader)
+    streamed  services/ledger_snapshot._load_rows: the same columns streamed
+              in LEAN_YIELD_PER batches (services/lean_rows.py)
+
+Time is the best of --repeat runs; peak memory is measured separately with
+tracemalloc. Both are scaled to one million rows.
+
+Usage:
+    python bench_lean_loading.py --rows 200000 --repeat 3
+"""
+import argparse
+import gc
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from services.ledger_snapshot import _detail_columns, _load_rows, load_account_types, normalized_type
+
+TEXT = "Legacy import note " * 6
+
+
+def build_db(path: str, rows: int, seed: int = 1):
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO transactions (project_id, date, month_key, amount, amount_cents, transaction_type, "
+        "budget_item_id, phase_id, type, category, description, supplier, remarks) "
+        "VALUES (?, '2024-05-10 00:00:00', ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (rng.randint(1, 20), 202401 + rng.randint(0, 11), cents / 100, cents, rng.randint(1, 400),
+             rng.randint(0, 5), rng.choice(("income", "expense")), "Materials", TEXT, "Supplier Ltd", "note")
+            for cents in (rng.randint(100, 10_000_000) for _ in range(rows))
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def load_orm(db):
+    txs = db.query(models.Transaction).all()
+    return np.array([(t.project_id, t.month_key, t.amount_cents, t.budget_item_id, t.phase_id) for t in txs])
+
+
+def load_projected(db):
+    Tx = models.Transaction
+    rows = db.query(
+        Tx.id, Tx.project_id, Tx.month_key, Tx.amount_cents, normalized_type(Tx.type),
+        Tx.to_account_id, Tx.budget_item_id, Tx.phase_id, Tx.transaction_type,
+    ).filter(Tx.id > 0).order_by(Tx.id).all()
+    return _detail_columns(rows, load_account_types(db))
+
+
+def load_streamed(db):
+    return _load_rows(db, 0)
+
+
+LOADERS = {"orm": load_orm, "projected": load_projected, "streamed": load_streamed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ledger.db")
+        build_db(path, args.rows)
+        Session = sessionmaker(bind=create_engine(f"sqlite:///{path}"))
+        scale = 1_000_000 / args.rows
+
+        print(f"{args.rows} rows, figures per million rows")
+        print(f"{'loader':<10} {'seconds':>8} {'peak MB':>8}")
+        for name, loader in LOADERS.items():
+            times = []
+            for _ in range(args.repeat):
+                with Session() as db:
+                    gc.collect()
+                    started = time.perf_counter()
+                    loader(db)
+                    times.append(time.perf_counter() - started)
+            with Session() as db:
+                gc.collect()
+                tracemalloc.start()
+                loader(db)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            print(f"{name:<10} {min(times) * scale:>8.2f} {peak * scale / 2**20:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark response serialization for the ledger and portfolio payloads.
+
+Builds a synthetic portfolio in an in-memory SQLite database and compares,
+per payload, the default FastAPI path (ORM objects or dicts through
+jsonable_encoder and json.dumps, or response_model validation from ORM
+attributes) with the fast path (column tuples, model_construct, orjson).
+
+Usage:
+    python bench_serialization.py --projects 20 --transactions 20000 --repeat 5
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+import schemas
+from services.fast_json import dumps, row_dicts, construct_all
+
+
+def build_db(projects: int, transactions: int, seed: int = 1):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+
+    for p in range(projects):
+        project = models.Project(name=f"Project {p}", status="Active")
+        db.add(project)
+        db.flush()
+        categories = [
+            models.BudgetCategory(project_id=project.id, category_name=f"Cat {c}", planned_amount=100000)
+            for c in range(10)
+        ]
+        db.add_all(categories)
+        apartments = [models.Apartment(project_id=project.id, name=f"A{a}", sale_price=250000) for a in range(20)]
+        db.add_all(apartments)
+        db.flush()
+        for apt in apartments:
+            db.add(models.CustomerPayment(apartment_id=apt.id, date=start, amount=50000))
+        for _ in range(transactions // projects):
+            db.add(models.Transaction(
+                project_id=project.id, date=start + timedelta(days=rng.randrange(720)),
+                amount=round(rng.uniform(10, 5000), 2), transaction_type=rng.choice((1, 2)),
+                type=rng.choice(("expense", "income")), vat_rate=0.24,
+                budget_item_id=rng.choice(categories).id, remarks="bench",
+            ))
+    db.commit()
+    return engine, db
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, size
+
+
+def starlette_dumps(content) -> bytes:
+    # What JSONResponse does after jsonable_encoder
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine, db = build_db(args.projects, args.transactions)
+    Tx = models.Transaction
+    columns = tuple(Tx.__table__.columns)
+    names = tuple(c.key for c in columns)
+    converters = {"amount": float, "vat_rate": float, "withholding_rate": float}
+
+    def ledger_default():
+        db.expunge_all()
+        items = db.query(Tx).order_by(Tx.date.desc()).all()
+        return starlette_dumps(jsonable_encoder({"items": items, "total": len(items)}))
+
+    def ledger_fast():
+        rows = db.query(*columns).order_by(Tx.date.desc()).all()
+        items = row_dicts(names, rows, converters)
+        return dumps({"items": items, "total": len(items)})
+
+    import main as app_main  # report code; imported late so the synthetic DB is built first
+    portfolio = app_main.portfolio_summary(db)
+
+    Pay = models.CustomerPayment
+    pay_names = ("id", "apartment_id", "date", "amount", "payment_method", "notes", "linked_transaction_ids")
+    adapter = TypeAdapter(List[schemas.CustomerPayment])
+
+    def payments_default():
+        db.expunge_all()
+        return adapter.dump_json(adapter.validate_python(db.query(Pay).all(), from_attributes=True))
+
+    def payments_fast():
+        rows = db.query(*(getattr(Pay, n) for n in pay_names)).all()
+        return adapter.dump_json(construct_all(
+            schemas.CustomerPayment, pay_names, rows, {"amount": float, "payment_method": schemas.PaymentMethodEnum}
+        ))
+
+    cases = [
+        ("ledger (query + serialize)", ledger_default, ledger_fast),
+        ("portfolio (serialize)", lambda: starlette_dumps(jsonable_encoder(portfolio)), lambda: dumps(portfolio)),
+        ("payments response_model", payments_default, payments_fast),
+    ]
+    print(f"{'payload':<28} {'bytes':>10} {'default ms':>11} {'fast ms':>9} {'speedup':>8}")
+    for label, default, fast in cases:
+        default_ms, size = timed(default, args.repeat)
+        fast_ms, _ = timed(fast, args.repeat)
+        print(f"{label:<28} {size:>10} {default_ms:>11.1f} {fast_ms:>9.1f} {default_ms / fast_ms:>7.1f}x")
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import sqlite3
 
+from database import engine
+from migrate_phase4 import migrate_cents_columns, migrate_month_keys
+
 DB_NAME = 'greece_project.db'
 
 def clean_database():
@@ -62,6 +65,12 @@ def clean_database():
     final_count = cursor.fetchone()[0]
     
     conn.close()
+
+    # Raw SQL bypasses the ORM hooks: fill any *_cents / month_key columns still missing
+    with engine.connect() as sa_conn:
+        migrate_cents_columns(sa_conn)
+        migrate_month_keys(sa_conn)
+
     print(f"✨ הניקוי הושלם! יש כרגע {final_count} תנועות תקינות במערכת.")
 
 if __name__ == "__main__":
@@ -8,8 +8,9 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from main import app, get_db
+from main import app, get_db, get_report_db
 import models
+from services import engine_registry
 
 # In-memory SQLite for testing
 SQLALCHEMY_DATABASE_URL = "sqlite://"
@@ -31,6 +32,8 @@ def override_get_db():
 
 
 app.dependency_overrides[get_db] = override_get_db
+# Reports read through the same in-memory database
+app.dependency_overrides[get_report_db] = override_get_db
 
 
 @pytest.fixture(autouse=True)
@@ -38,6 +41,7 @@ def reset_db():
     """Drop and recreate all tables before each test for isolation."""
     models.Base.metadata.drop_all(bind=engine)
     models.Base.metadata.create_all(bind=engine)
+    engine_registry.reset_all()
     yield
 
 
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import sqlite3
@@ -17,7 +17,7 @@ if IS_RENDER:
         os.makedirs(RENDER_DATA_DIR, exist_ok=True)
 
     # Seed: if persistent disk DB has no data, copy from repo
-    import shutil
+    from services.backup_service import copy_database
     REPO_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "greece_project.db")
 
     needs_seed = False
@@ -34,7 +34,8 @@ if IS_RENDER:
             needs_seed = True
 
     if needs_seed and os.path.exists(REPO_DB) and os.path.getsize(REPO_DB) > 0:
-        shutil.copy2(REPO_DB, DB_NAME)
+        # Through the backup API: a consistent copy even if the repo file is open elsewhere
+        copy_database(REPO_DB, DB_NAME)
 else:
     # Local development path
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -42,16 +43,52 @@ else:
 
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_NAME}"
 
+# Reports read from their own engine so long aggregations never hold up
+# payment and transaction entry. By default that is a read-only connection
+# pool on the same SQLite file (WAL lets readers and the writer proceed
+# concurrently); set REPORT_DATABASE_URL to point reports at a replica,
+# e.g. a PostgreSQL read replica.
+REPORT_DATABASE_URL = os.environ.get("REPORT_DATABASE_URL") or f"sqlite:///file:{DB_NAME}?mode=ro&uri=true"
+
 # --- SQLAlchemy setup ---
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+@event.listens_for(engine, "connect")
+def _enable_wal(dbapi_connection, connection_record):
+    # Persistent on the file; lets report readers run alongside writers
+    dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+
+def create_report_engine(url):
+    """Engine whose connections cannot write: query_only on SQLite, read-only transactions on PostgreSQL."""
+    if url.startswith("sqlite"):
+        report = create_engine(url, connect_args={"check_same_thread": False})
+
+        @event.listens_for(report, "connect")
+        def _read_only(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA query_only=ON")
+        return report
+    if url.startswith("postgres"):
+        return create_engine(url, connect_args={"options": "-c default_transaction_read_only=on"})
+    return create_engine(url)
+
+
+report_engine = create_report_engine(REPORT_DATABASE_URL)
+ReportSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=report_engine)
+
+
 Base = declarative_base()
 
 # --- Raw SQLite connection ---
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+def get_db_connection(read_only=False):
+    if read_only:
+        conn = sqlite3.connect(f"file:{DB_NAME}?mode=ro", uri=True)
+        conn.execute("PRAGMA query_only=ON")
+    else:
+        conn = sqlite3.connect(DB_NAME)
     conn.row_factory = sqlite3.Row
     return conn
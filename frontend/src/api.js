@@ -162,6 +162,29 @@ export const getProjectKpiSummary = async (projectId) => {
     return response.data;
 };
 
+// --- Project Dashboard (kpi, cash_flow, budget, budget_timeline in one call) ---
+
+export const getProjectDashboard = async (projectId, sections = null) => {
+    const params = sections ? { sections: sections.join(',') } : {};
+    const response = await api.get(`/projects/${projectId}/dashboard`, { params });
+    return response.data;
+};
+
+// --- Change Feed (Server-Sent Events) ---
+
+// Calls onChange(notification) whenever a write touches the project; returns an unsubscribe function.
+// EventSource reconnects on its own and resumes from the last event id it saw.
+export const subscribeToChanges = (projectId, onChange) => {
+    const source = new EventSource(`${api.defaults.baseURL}/events/changes?project_id=${projectId}`);
+    source.addEventListener('change', (event) => onChange(JSON.parse(event.data)));
+    // Too much was missed to replay: treat it as a change to everything
+    source.addEventListener('reset', (event) => {
+        const { version } = JSON.parse(event.data);
+        onChange({ id: version, entity: null, sections: ['kpi', 'cash_flow', 'budget', 'budget_timeline'] });
+    });
+    return () => source.close();
+};
+
 // --- CSV Import ---
 
 export const importApartments = async (file) => {
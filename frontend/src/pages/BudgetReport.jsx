@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useMemo } from 'react';
-import { getBudgetReport, getBudgetTimeline, updateBudgetCategory, getTransactions } from '../api';
+import { getProjectDashboard, updateBudgetCategory, getTransactions } from '../api';
 import { useProject } from '../contexts/ProjectContext';
 import { PencilIcon, CheckIcon, XIcon, EmptyStateIcon, CalendarPlanIcon, TimelineIcon, TableIcon } from '../components/Icons';
 import BudgetPlanEditor from '../components/BudgetPlanEditor';
@@ -166,12 +166,17 @@ const BudgetReport = () => {
 
         setMessage(null);
         try {
-            const [tableData, timeline] = await Promise.all([
-                getBudgetReport(selectedProjectId),
-                getBudgetTimeline(selectedProjectId).catch(() => []),
-            ]);
-            setReportData(tableData);
-            setTimelineData(timeline);
+            const { budget, budget_timeline: timeline, errors } = await getProjectDashboard(
+                selectedProjectId, ['budget', 'budget_timeline']
+            );
+            // Sections fail independently: a missing timeline leaves the table usable
+            if (errors) console.error("Budget report sections failed", errors);
+            if (errors?.budget) {
+                setMessage({ type: 'error', text: 'Failed to load budget report' });
+            } else {
+                setReportData(budget);
+            }
+            setTimelineData(timeline || []);
         } catch (error) {
             console.error("Failed to load budget report", error);
             setMessage({ type: 'error', text: 'Failed to load budget report' });
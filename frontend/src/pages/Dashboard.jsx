@@ -3,7 +3,7 @@ import {
     ComposedChart, Bar, Line, XAxis, YAxis, CartesianGrid,
     Tooltip, Legend, ResponsiveContainer, ReferenceLine
 } from 'recharts';
-import { getCashFlowForecast, getProjectKpiSummary } from '../api';
+import { getProjectDashboard, subscribeToChanges } from '../api';
 import { useProject } from '../contexts/ProjectContext';
 import { IncomeIcon, ExpenseIcon, NetFlowIcon, BalanceIcon, ApartmentsIcon, ShieldCheckIcon, CalendarPlanIcon } from '../components/Icons';
 import { cn, formatEUR, formatPercent } from '../lib/utils';
@@ -68,15 +68,23 @@ const Dashboard = () => {
     const [loading, setLoading] = useState(true);
     const [timeRange, setTimeRange] = useState('all');
     const [viewMode, setViewMode] = useState('monthly');
+    const [dataVersion, setDataVersion] = useState(0);
+
+    // Refetch when a write touches what this page shows, instead of polling
+    useEffect(() => {
+        if (!selectedProjectId) return undefined;
+        return subscribeToChanges(selectedProjectId, ({ id, sections }) => {
+            if (sections.includes('kpi') || sections.includes('cash_flow')) setDataVersion(id);
+        });
+    }, [selectedProjectId]);
 
     useEffect(() => {
         if (selectedProjectId) {
-            setLoading(true);
-            Promise.all([
-                getCashFlowForecast(selectedProjectId),
-                getProjectKpiSummary(selectedProjectId).catch(() => null),
-            ]).then(([cashFlow, kpi]) => {
-                const chartData = cashFlow.map(item => ({
+            if (!dataVersion) setLoading(true);
+            getProjectDashboard(selectedProjectId, ['kpi', 'cash_flow']).then(({ kpi, cash_flow: cashFlow, errors }) => {
+                // Sections fail independently; show whatever loaded
+                if (errors) console.error("Dashboard sections failed", errors);
+                const chartData = (cashFlow || []).map(item => ({
                     ...item,
                     name: item.date,
                     Income: (item.actual_income || 0) + (item.planned_income || 0),
@@ -94,7 +102,7 @@ const Dashboard = () => {
         } else {
             setLoading(false);
         }
-    }, [selectedProjectId]);
+    }, [selectedProjectId, dataVersion]);
 
     // Compute totals & trends
     const totals = data.reduce((acc, row) => ({
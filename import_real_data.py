@@ -3,6 +3,9 @@ import sqlite3
 import os
 from datetime import datetime
 
+from services.money import to_cents
+from services.periods import month_key
+
 # --- הגדרות שמות קבצים (ודא שהם תואמים למה שיש לך בתיקייה) ---
 FILE_TRANSACTIONS = 'progreeace 34 - תנועות בפועל.csv'
 FILE_PROJECTS = 'progreeace 34 - Appartment_price_upload.csv'
@@ -91,9 +94,9 @@ def run_import():
 
             # הכנסה לטבלה
             cursor.execute("""
-                INSERT INTO transactions (project_id, date, amount, category, description, supplier, type)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (new_project_id, date_val, amount, category, description, supplier, 'expense'))
+                INSERT INTO transactions (project_id, date, month_key, amount, amount_cents, category, description, supplier, type)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (new_project_id, date_val, month_key(date_val), amount, to_cents(amount), category, description, supplier, 'expense'))
             
             count_inserted += 1
 
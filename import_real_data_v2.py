@@ -17,6 +17,9 @@ import sqlite3
 import os
 from datetime import datetime
 
+from services.money import to_cents
+from services.periods import month_key
+
 FILE_TRANSACTIONS = 'progreeace 34 - תנועות בפועל.csv'
 FILE_PROJECTS = 'progreeace 34 - Appartment_price_upload.csv'
 DB_NAME = 'greece_project.db'
@@ -234,11 +237,11 @@ def run_import():
 
             cursor.execute(
                 """INSERT INTO transactions
-                   (project_id, date, amount, category, description, supplier,
+                   (project_id, date, month_key, amount, amount_cents, category, description, supplier,
                     type, remarks, transaction_type,
                     from_account_id, to_account_id, budget_item_id)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (new_project_id, date_val, amount, category, remarks, supplier,
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (new_project_id, date_val, month_key(date_val), amount, to_cents(amount), category, remarks, supplier,
                  tx_type, remarks, 1,
                  from_account_id, to_account_id, budget_item_id),
             )
@@ -1,20 +1,90 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, select
 from typing import List, Optional
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
 import json
+import math
 import os
 import models, schemas
 import services.budget_report_service
 import services.forecast_service
-from database import SessionLocal, engine, DB_NAME, IS_RENDER
+import services.scenario_service
+import services.cash_risk_service
+import services.buffer_alerts
+import services.dashboard_service
+import services.change_feed
+from services.money import to_cents, from_cents, sum_cents
+from services.periods import parse_month_label
+from services import ledger_archive
+from services.traffic_capture import install_traffic_capture
+from services.category_mappings import upsert_account_category_mapping, upsert_account_category_mappings, mapping_pairs
+from services.suggestion_index import suggest_categories
+from services.account_registry import get_account_roles, system_account_ids, check_accounts
+from services import project_rollups
+from services.fast_json import FastJSONResponse, row_dicts, construct_all
+from services.compression import CompressionMiddleware
+from services.report_cache import cached_report
+from services.backup_service import BackupService, BackupScheduler, BackupInProgress, BACKUP_INTERVAL
+from services.change_log import ChangeLogCompactor, CHANGE_LOG_COMPACT_INTERVAL
+from services.bulkhead import BulkheadFull, report_pool, reserve_crud_threads
+from services import process_pool
+from services.portfolio_service import portfolio_summary
+from database import SessionLocal, ReportSessionLocal, engine, report_engine, DB_NAME, IS_RENDER
 
 # Create tables (only if they don't exist)
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+# Background buffer-alert evaluation (BUFFER_ALERT_INTERVAL seconds, 0 = off)
+BUFFER_ALERT_INTERVAL = float(os.getenv("BUFFER_ALERT_INTERVAL", "300"))
+
+# Online backups of the main and archive databases (BACKUP_DIR, BACKUP_INTERVAL, BACKUP_RETENTION)
+backups = BackupService([DB_NAME, ledger_archive.ARCHIVE_DB_PATH])
+
+# Fail startup on missing Direct/Owner accounts instead of only warning
+STRICT_SYSTEM_ACCOUNTS = os.getenv("STRICT_SYSTEM_ACCOUNTS", "0") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Report endpoints run in report_pool; the default threadpool is kept for CRUD
+    reserve_crud_threads()
+    roles = check_accounts(SessionLocal)
+    if STRICT_SYSTEM_ACCOUNTS and not roles.ok:
+        raise RuntimeError("System accounts misconfigured: " + "; ".join(roles.issues))
+    evaluator = None
+    if BUFFER_ALERT_INTERVAL > 0:
+        evaluator = services.buffer_alerts.BufferAlertEvaluator(SessionLocal, BUFFER_ALERT_INTERVAL)
+        evaluator.start()
+    scheduler = None
+    if BACKUP_INTERVAL > 0:
+        scheduler = BackupScheduler(backups, BACKUP_INTERVAL)
+        scheduler.start()
+    compactor = None
+    if CHANGE_LOG_COMPACT_INTERVAL > 0:
+        compactor = ChangeLogCompactor(SessionLocal, CHANGE_LOG_COMPACT_INTERVAL)
+        compactor.start()
+    yield
+    if evaluator is not None:
+        evaluator.stop()
+    if scheduler is not None:
+        scheduler.stop()
+    if compactor is not None:
+        compactor.stop()
+    services.change_feed.stop_all()
+    report_pool.shutdown()
+    process_pool.shutdown()
+    # Close pooled connections so SQLite checkpoints and removes the WAL files
+    engine.dispose()
+    report_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -25,6 +95,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated gzip/brotli for large responses (COMPRESS_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY)
+app.add_middleware(CompressionMiddleware)
+
+# Opt-in request capture for load replay (set TRAFFIC_CAPTURE_FILE)
+install_traffic_capture(app)
+
+@app.exception_handler(BulkheadFull)
+async def report_pool_full(request: Request, exc: BulkheadFull):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(RequestValidationError)
+async def request_validation_error(request: Request, exc: RequestValidationError):
+    # NaN and Infinity parse as JSON numbers but cannot be echoed back in the error body
+    errors = jsonable_encoder(exc.errors(), custom_encoder={float: lambda v: v if math.isfinite(v) else str(v)})
+    return JSONResponse(status_code=422, content={"detail": errors})
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -33,6 +119,14 @@ def get_db():
     finally:
         db.close()
 
+def get_report_db():
+    """Read-only session for reports (see REPORT_DATABASE_URL in database.py)."""
+    db = ReportSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # --- Routes ---
 
 @app.get("/")
@@ -79,31 +173,14 @@ def health_check():
         status["db_error"] = str(e)
     return status
 
-@app.get("/projects/", response_model=List[schemas.Project])
-def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    projects = db.query(models.Project).offset(skip).limit(limit).all()
-    
-    # Calculate total_budget dynamically for each project
-    result = []
-    for project in projects:
-        # Sum all planned_amount from budget_categories for this project
-        total_budget = db.query(func.sum(models.BudgetCategory.planned_amount)).filter(
-            models.BudgetCategory.project_id == project.id
-        ).scalar() or 0
-        
-        # Create a dict with all project fields and override total_budget
-        project_dict = {
-            "id": project.id,
-            "name": project.name,
-            "status": project.status,
-            "project_account_val": float(project.project_account_val) if project.project_account_val else 0,
-            "property_cost": float(project.property_cost) if project.property_cost else None,
-            "remarks": project.remarks,
-            "account_balance": float(project.account_balance) if project.account_balance else 0,
-            "total_budget": float(total_budget) if total_budget else None
-        }
-        result.append(project_dict)
-    
+@app.get("/projects/", response_model=List[schemas.ProjectListItem], response_model_exclude_unset=True)
+def read_projects(skip: int = 0, limit: int = 100, rollups: bool = False, db: Session = Depends(get_db)):
+    # One query with budget totals pre-grouped per project; rollups come from a cache
+    result = project_rollups.list_projects(db, skip, limit)
+    if rollups:
+        cached = project_rollups.get_rollups(db, [p["id"] for p in result])
+        for project in result:
+            project["rollups"] = cached[project["id"]]
     return result
 
 @app.post("/projects/", response_model=schemas.Project)
@@ -140,6 +217,39 @@ def update_project(project_id: int, project: schemas.ProjectCreate, db: Session
     db.refresh(db_project)
     return db_project
 
+# Ledger rows are read as plain column tuples (no ORM objects) and shaped once
+TRANSACTION_COLUMNS = tuple(models.Transaction.__table__.columns)
+TRANSACTION_FIELDS = tuple(c.key for c in TRANSACTION_COLUMNS)
+TRANSACTION_CONVERTERS = {"amount": float, "vat_rate": float, "withholding_rate": float}
+
+def _transaction_filters(table, project_id, budget_item_id, date_from, date_to, search, transaction_type, tx_type):
+    """WHERE conditions of the transactions list, for the hot or the archive table."""
+    c = table.c
+    conditions = []
+    if project_id:
+        conditions.append(c.project_id == project_id)
+    if budget_item_id:
+        conditions.append(c.budget_item_id == budget_item_id)
+    if date_from:
+        conditions.append(c.date >= date_from)
+    if date_to:
+        conditions.append(c.date <= date_to)
+    if search:
+        pattern = f"%{search}%"
+        conditions.append(
+            or_(
+                c.remarks.ilike(pattern),
+                c.description.ilike(pattern),
+                c.supplier.ilike(pattern),
+                c.category.ilike(pattern),
+            )
+        )
+    if transaction_type is not None:
+        conditions.append(c.transaction_type == transaction_type)
+    if tx_type:
+        conditions.append(c.type == tx_type)
+    return conditions
+
 @app.get("/transactions/")
 def read_transactions(
     skip: int = 0,
@@ -153,58 +263,73 @@ def read_transactions(
     budget_item_id: Optional[int] = None,
     db: Session = Depends(get_db),
 ):
-    query = db.query(models.Transaction)
-    if project_id:
-        query = query.filter(models.Transaction.project_id == project_id)
-    if budget_item_id:
-        query = query.filter(models.Transaction.budget_item_id == budget_item_id)
-    if date_from:
-        query = query.filter(models.Transaction.date >= datetime.fromisoformat(date_from))
-    if date_to:
-        dt_to = datetime.fromisoformat(date_to).replace(hour=23, minute=59, second=59)
-        query = query.filter(models.Transaction.date <= dt_to)
-    if search:
-        pattern = f"%{search}%"
-        query = query.filter(
-            or_(
-                models.Transaction.remarks.ilike(pattern),
-                models.Transaction.description.ilike(pattern),
-                models.Transaction.supplier.ilike(pattern),
-                models.Transaction.category.ilike(pattern),
-            )
+    dt_from = datetime.fromisoformat(date_from) if date_from else None
+    dt_to = datetime.fromisoformat(date_to).replace(hour=23, minute=59, second=59) if date_to else None
+    filters = (project_id, budget_item_id, dt_from, dt_to, search, transaction_type, tx_type)
+
+    hot = models.Transaction.__table__
+    rows = select(*TRANSACTION_COLUMNS).where(*_transaction_filters(hot, *filters))
+    # Archived years are read from the archive database only when the date range reaches them
+    if ledger_archive.years_overlap(ledger_archive.archived_years(db), dt_from, dt_to):
+        ledger_archive.attach(db.connection())
+        archived = ledger_archive.archived_transactions
+        rows = rows.union_all(
+            select(*archived.columns).where(*_transaction_filters(archived, *filters))
         )
-    if transaction_type is not None:
-        query = query.filter(models.Transaction.transaction_type == transaction_type)
-    if tx_type:
-        query = query.filter(models.Transaction.type == tx_type)
-    total = query.count()
-    transactions = query.order_by(models.Transaction.date.desc()).offset(skip).limit(limit).all()
-    return {"items": transactions, "total": total, "skip": skip, "limit": limit}
+    rows = rows.subquery()
+    total = db.execute(select(func.count()).select_from(rows)).scalar()
+    page = db.execute(
+        # id breaks ties so pages stay stable across the union
+        select(*rows.columns).order_by(rows.c.date.desc(), rows.c.id).offset(skip).limit(limit)
+    ).all()
+    items = row_dicts(TRANSACTION_FIELDS, page, TRANSACTION_CONVERTERS)
+    return FastJSONResponse({"items": items, "total": total, "skip": skip, "limit": limit})
+
+def _vat_rate_for(transaction, system_account_ids):
+    # Handle VAT logic: if from_account or to_account is system account, set vat_rate to 0
+    if transaction.from_account_id in system_account_ids or transaction.to_account_id in system_account_ids:
+        return 0
+    return transaction.vat_rate or 0
 
 @app.post("/transactions/", response_model=schemas.Transaction)
 def create_transaction(transaction: schemas.TransactionCreate, db: Session = Depends(get_db)):
-    # Handle VAT logic: if from_account or to_account is system account, set vat_rate to 0
-    vat_rate = transaction.vat_rate or 0
-    if transaction.from_account_id:
-        from_acc = db.query(models.Account).filter(models.Account.id == transaction.from_account_id).first()
-        if from_acc and from_acc.is_system_account:
-            vat_rate = 0
-    if transaction.to_account_id:
-        to_acc = db.query(models.Account).filter(models.Account.id == transaction.to_account_id).first()
-        if to_acc and to_acc.is_system_account:
-            vat_rate = 0
+    system_ids = system_account_ids(db)
 
     transaction_data = transaction.dict()
-    transaction_data['vat_rate'] = vat_rate
+    transaction_data['vat_rate'] = _vat_rate_for(transaction, system_ids)
     db_transaction = models.Transaction(**transaction_data)
     db.add(db_transaction)
+
+    # Feature 3: Upsert AccountCategoryMapping (same commit as the transaction)
+    upsert_account_category_mapping(db, db_transaction)
+
     db.commit()
     db.refresh(db_transaction)
+    return db_transaction
 
-    # Feature 3: Upsert AccountCategoryMapping
-    _upsert_account_category_mapping(db, db_transaction)
+MAX_BULK_TRANSACTIONS = 1000
+
+@app.post("/transactions/bulk", response_model=List[schemas.Transaction])
+def create_transactions_bulk(transactions: List[schemas.TransactionCreate], db: Session = Depends(get_db)):
+    """Create many transactions in one commit, with one batched mapping upsert."""
+    if len(transactions) > MAX_BULK_TRANSACTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_TRANSACTIONS} transactions per request")
+    system_ids = system_account_ids(db)
+
+    db_transactions = []
+    for transaction in transactions:
+        transaction_data = transaction.dict()
+        transaction_data['vat_rate'] = _vat_rate_for(transaction, system_ids)
+        db_transactions.append(models.Transaction(**transaction_data))
+    db.add_all(db_transactions)
+    upsert_account_category_mappings(db, mapping_pairs(db_transactions))
+    db.flush()
+    ids = [t.id for t in db_transactions]
 
-    return db_transaction
+    db.commit()
+    # Reload the committed rows with one IN query instead of a refresh per row
+    db.query(models.Transaction).filter(models.Transaction.id.in_(ids)).all()
+    return db_transactions
 
 @app.put("/transactions/{transaction_id}", response_model=schemas.Transaction)
 def update_transaction(transaction_id: int, transaction: schemas.TransactionCreate, db: Session = Depends(get_db)):
@@ -213,28 +338,19 @@ def update_transaction(transaction_id: int, transaction: schemas.TransactionCrea
         raise HTTPException(status_code=404, detail="Transaction not found")
 
     # Handle VAT logic
-    vat_rate = transaction.vat_rate or 0
-    if transaction.from_account_id:
-        from_acc = db.query(models.Account).filter(models.Account.id == transaction.from_account_id).first()
-        if from_acc and from_acc.is_system_account:
-            vat_rate = 0
-    if transaction.to_account_id:
-        to_acc = db.query(models.Account).filter(models.Account.id == transaction.to_account_id).first()
-        if to_acc and to_acc.is_system_account:
-            vat_rate = 0
+    system_ids = system_account_ids(db)
 
     transaction_data = transaction.dict()
-    transaction_data['vat_rate'] = vat_rate
+    transaction_data['vat_rate'] = _vat_rate_for(transaction, system_ids)
 
     for key, value in transaction_data.items():
         setattr(db_transaction, key, value)
 
+    # Feature 3: Upsert AccountCategoryMapping (same commit as the transaction)
+    upsert_account_category_mapping(db, db_transaction)
+
     db.commit()
     db.refresh(db_transaction)
-
-    # Feature 3: Upsert AccountCategoryMapping
-    _upsert_account_category_mapping(db, db_transaction)
-
     return db_transaction
 
 @app.delete("/transactions/{transaction_id}")
@@ -250,29 +366,83 @@ def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
 # --- דוחות ותקציב ---
 
 @app.get("/reports/budget/{project_id}")
+@report_pool.offload
 def get_budget_report(project_id: int):
     # שימוש בפונקציה החדשה והנכונה מה-Service
     try:
-        return services.budget_report_service.get_budget_report(project_id)
+        return FastJSONResponse(services.budget_report_service.get_budget_report(project_id, read_only=True))
     except Exception as e:
         print(f"Error generating budget report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _month_param(value: Optional[str]) -> Optional[int]:
+    """'2025-03' -> 202503 (None stays None); ValueError for anything else."""
+    if not value:
+        return None
+    key = parse_month_label(value)
+    if not 1 <= key % 100 <= 12:
+        raise ValueError(value)
+    return key
+
 @app.get("/reports/cash-flow/{project_id}")
-def get_cash_flow_forecast(project_id: int, db: Session = Depends(get_db)):
+@report_pool.offload
+def get_cash_flow_forecast(
+    project_id: int,
+    request: Request,
+    from_month: Optional[str] = Query(None, alias="from", description="First month, YYYY-MM"),
+    to_month: Optional[str] = Query(None, alias="to", description="Last month, YYYY-MM"),
+    db: Session = Depends(get_report_db),
+    checkpoint_db: Session = Depends(get_db),
+):
     """תחזית תזרים מזומנים לפרויקט"""
     try:
-        return services.forecast_service.generate_cash_flow_forecast(db, project_id)
+        from_key = _month_param(from_month)
+        to_key = _month_param(to_month)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from/to must be months in YYYY-MM format")
+    if from_key is None and to_key is None:
+        compute = lambda: services.forecast_service.generate_cash_flow_forecast(db, project_id)
+    else:
+        # Windowed: starts from the nearest closing-balance checkpoint
+        compute = lambda: services.forecast_service.generate_cash_flow_window(
+            db, project_id, from_key, to_key, checkpoint_db=checkpoint_db
+        )
+    try:
+        return cached_report(request, db, project_id, compute)
     except Exception as e:
         print(f"Error generating cash flow forecast: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+MAX_SCENARIOS = 100
+
+@app.post("/reports/scenarios/{project_id}")
+@report_pool.offload
+def run_cash_flow_scenarios(project_id: int, request: schemas.ScenarioRequest, db: Session = Depends(get_report_db)):
+    """What-if תרחישים: הזזה והגדלה של תזרים מתוכנן, ללא כתיבה ל-DB"""
+    project = db.query(models.Project).filter(models.Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if len(request.scenarios) > MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SCENARIOS} scenarios per request")
+
+    if request.cash_buffer_amount is not None:
+        buffer_cents = to_cents(request.cash_buffer_amount)
+    else:
+        buffer_cents = services.cash_risk_service.cash_buffer_cents(db, project_id)
+
+    inputs = services.forecast_service.load_forecast_inputs(db, project_id)
+    return FastJSONResponse(services.scenario_service.evaluate_scenarios(inputs, request.scenarios, buffer_cents))
+
 @app.get("/projects/{project_id}/budget-items", response_model=List[schemas.BudgetCategory])
 def read_project_budget_items(project_id: int, db: Session = Depends(get_db)):
-    items = db.query(models.BudgetCategory).filter(models.BudgetCategory.project_id == project_id).all()
-    return items
+    Cat = models.BudgetCategory
+    rows = db.query(Cat.id, Cat.project_id, Cat.category_name, Cat.planned_amount).filter(
+        Cat.project_id == project_id
+    ).all()
+    return construct_all(schemas.BudgetCategory, ("id", "project_id", "category_name", "planned_amount"), rows,
+                         {"planned_amount": float})
 
 @app.put("/budget-categories/{category_id}", response_model=schemas.BudgetCategory)
 def update_budget_category(category_id: int, update: schemas.BudgetCategoryUpdate, db: Session = Depends(get_db)):
@@ -293,8 +463,11 @@ def update_budget_category(category_id: int, update: schemas.BudgetCategoryUpdat
 def read_accounts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """רשימת כל החשבונות"""
     try:
-        accounts = db.query(models.Account).offset(skip).limit(limit).all()
-        return accounts
+        Acc = models.Account
+        rows = db.query(Acc.id, Acc.name, Acc.account_type_id, Acc.remarks, Acc.is_system_account).offset(
+            skip
+        ).limit(limit).all()
+        return construct_all(schemas.Account, ("id", "name", "account_type_id", "remarks", "is_system_account"), rows)
     except Exception as e:
         print(f"Error fetching accounts: {e}")
         import traceback
@@ -310,11 +483,11 @@ def read_apartments(project_id: int, skip: int = 0, limit: int = 50, db: Session
     apartments = query.offset(skip).limit(limit).all()
     result = []
     for apt in apartments:
-        total_paid = db.query(func.sum(models.CustomerPayment.amount)).filter(
+        total_paid = db.query(sum_cents(models.CustomerPayment.amount_cents)).filter(
             models.CustomerPayment.apartment_id == apt.id
-        ).scalar() or 0
+        ).scalar()
         sale_price = float(apt.sale_price) if apt.sale_price else None
-        remaining = (sale_price - float(total_paid)) if sale_price is not None else None
+        remaining = from_cents(to_cents(apt.sale_price) - total_paid) if sale_price is not None else None
         result.append({
             "id": apt.id,
             "project_id": apt.project_id,
@@ -326,10 +499,10 @@ def read_apartments(project_id: int, skip: int = 0, limit: int = 50, db: Session
             "sale_price": sale_price,
             "ownership_percent": float(apt.ownership_percent) if apt.ownership_percent else None,
             "remarks": apt.remarks,
-            "total_paid": float(total_paid),
+            "total_paid": from_cents(total_paid),
             "remaining": remaining,
         })
-    return {"items": result, "total": total, "skip": skip, "limit": limit}
+    return FastJSONResponse({"items": result, "total": total, "skip": skip, "limit": limit})
 
 @app.post("/projects/{project_id}/apartments", response_model=schemas.Apartment)
 def create_apartment(project_id: int, apartment: schemas.ApartmentCreate, db: Session = Depends(get_db)):
@@ -351,12 +524,12 @@ def update_apartment(apartment_id: int, apartment: schemas.ApartmentCreate, db:
         setattr(db_apartment, key, value)
     db.commit()
     db.refresh(db_apartment)
-    total_paid = db.query(func.sum(models.CustomerPayment.amount)).filter(
+    total_paid = db.query(sum_cents(models.CustomerPayment.amount_cents)).filter(
         models.CustomerPayment.apartment_id == apartment_id
-    ).scalar() or 0
+    ).scalar()
     sale_price = float(db_apartment.sale_price) if db_apartment.sale_price else None
-    remaining = (sale_price - float(total_paid)) if sale_price is not None else None
-    return {**db_apartment.__dict__, "total_paid": float(total_paid), "remaining": remaining}
+    remaining = from_cents(to_cents(db_apartment.sale_price) - total_paid) if sale_price is not None else None
+    return {**db_apartment.__dict__, "total_paid": from_cents(total_paid), "remaining": remaining}
 
 @app.delete("/apartments/{apartment_id}")
 def delete_apartment(apartment_id: int, db: Session = Depends(get_db)):
@@ -371,10 +544,16 @@ def delete_apartment(apartment_id: int, db: Session = Depends(get_db)):
 
 @app.get("/apartments/{apartment_id}/payments", response_model=List[schemas.CustomerPayment])
 def read_payments(apartment_id: int, db: Session = Depends(get_db)):
-    payments = db.query(models.CustomerPayment).filter(
-        models.CustomerPayment.apartment_id == apartment_id
-    ).order_by(models.CustomerPayment.date.desc()).all()
-    return payments
+    Pay = models.CustomerPayment
+    rows = db.query(
+        Pay.id, Pay.apartment_id, Pay.date, Pay.amount, Pay.payment_method, Pay.notes, Pay.linked_transaction_ids
+    ).filter(Pay.apartment_id == apartment_id).order_by(Pay.date.desc()).all()
+    return construct_all(
+        schemas.CustomerPayment,
+        ("id", "apartment_id", "date", "amount", "payment_method", "notes", "linked_transaction_ids"),
+        rows,
+        {"amount": float, "payment_method": schemas.PaymentMethodEnum},
+    )
 
 @app.post("/apartments/{apartment_id}/payments", response_model=schemas.CustomerPayment)
 def create_payment(apartment_id: int, payment: schemas.CustomerPaymentCreate, db: Session = Depends(get_db)):
@@ -411,10 +590,12 @@ def delete_payment(payment_id: int, db: Session = Depends(get_db)):
 
 @app.get("/budget-categories/{category_id}/plans", response_model=List[schemas.BudgetPlan])
 def read_budget_plans(category_id: int, db: Session = Depends(get_db)):
-    plans = db.query(models.BudgetPlan).filter(
-        models.BudgetPlan.budget_category_id == category_id
-    ).order_by(models.BudgetPlan.planned_date).all()
-    return plans
+    Plan = models.BudgetPlan
+    rows = db.query(Plan.id, Plan.budget_category_id, Plan.planned_date, Plan.amount, Plan.description).filter(
+        Plan.budget_category_id == category_id
+    ).order_by(Plan.planned_date).all()
+    return construct_all(schemas.BudgetPlan, ("id", "budget_category_id", "planned_date", "amount", "description"),
+                         rows, {"amount": float})
 
 @app.post("/budget-categories/{category_id}/plans", response_model=schemas.BudgetPlan)
 def create_budget_plan(category_id: int, plan: schemas.BudgetPlanCreate, db: Session = Depends(get_db)):
@@ -447,386 +628,105 @@ def delete_budget_plan(plan_id: int, db: Session = Depends(get_db)):
     db.commit()
     return {"message": "Budget plan deleted successfully"}
 
+# --- Cash Buffer Risk (Monte Carlo) ---
+
+@app.get("/reports/cash-risk")
+@report_pool.offload
+def get_cash_risk(
+    project_id: Optional[int] = None,
+    paths: int = Query(services.cash_risk_service.DEFAULT_PATHS, ge=100, le=20000),
+    seed: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_report_db),
+):
+    """הסתברות לחריגה מכרית המזומנים לפי חודש, עם רצועות אחוזונים (Monte Carlo)"""
+    query = db.query(models.Project)
+    if project_id is not None:
+        query = query.filter(models.Project.id == project_id)
+    else:
+        query = query.filter(models.Project.status.in_(["Active", "Completed"]))
+    projects = query.order_by(models.Project.id).all()
+    if project_id is not None and not projects:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return FastJSONResponse(services.cash_risk_service.run_breach_risk(db, projects, paths=paths, seed=seed))
+
 # --- Portfolio Summary ---
 
 @app.get("/reports/portfolio-summary")
-def get_portfolio_summary(db: Session = Depends(get_db)):
+@report_pool.offload
+def get_portfolio_summary(request: Request, db: Session = Depends(get_db), report_db: Session = Depends(get_report_db)):
     """Aggregated portfolio summary across all active projects."""
-    projects = db.query(models.Project).filter(
-        models.Project.status.in_(["Active", "Completed"])
-    ).all()
-
-    project_summaries = []
-    total_budget_all = 0
-    total_spent_all = 0
-    total_collected_all = 0
-    total_revenue_all = 0
-
-    for project in projects:
-        # Budget: sum of planned amounts
-        total_budget = db.query(func.sum(models.BudgetCategory.planned_amount)).filter(
-            models.BudgetCategory.project_id == project.id
-        ).scalar() or 0
-        total_budget = float(total_budget)
-
-        # Actual spending: sum of expense transactions (executed only)
-        actual_spent = db.query(func.sum(models.Transaction.amount)).filter(
-            models.Transaction.project_id == project.id,
-            models.Transaction.transaction_type == 1,
-            models.Transaction.type == "expense"
-        ).scalar() or 0
-        actual_spent = float(actual_spent)
-
-        # Apartments: collection data
-        apartments = db.query(models.Apartment).filter(
-            models.Apartment.project_id == project.id
-        ).all()
-
-        total_revenue = 0
-        total_collected = 0
-        apartments_count = len(apartments)
-        fully_paid = 0
-
-        for apt in apartments:
-            sale_price = float(apt.sale_price) if apt.sale_price else 0
-            paid = db.query(func.sum(models.CustomerPayment.amount)).filter(
-                models.CustomerPayment.apartment_id == apt.id
-            ).scalar() or 0
-            paid = float(paid)
-            total_revenue += sale_price
-            total_collected += paid
-            if sale_price > 0 and paid >= sale_price:
-                fully_paid += 1
-
-        collection_rate = (total_collected / total_revenue * 100) if total_revenue > 0 else 0
-        budget_progress = (actual_spent / total_budget * 100) if total_budget > 0 else 0
-
-        # Budget health: count categories by status
-        budget_items = db.query(models.BudgetCategory).filter(
-            models.BudgetCategory.project_id == project.id
-        ).all()
-
-        categories_ok = 0
-        categories_warning = 0
-        categories_over = 0
-        worst_category = None
-        worst_overrun = 0
-
-        for cat in budget_items:
-            planned = float(cat.planned_amount) if cat.planned_amount else 0
-            if planned <= 0:
-                continue
-            cat_actual = db.query(func.sum(models.Transaction.amount)).filter(
-                models.Transaction.budget_item_id == cat.id,
-                models.Transaction.transaction_type == 1
-            ).scalar() or 0
-            cat_actual = float(cat_actual)
-            cat_progress = (cat_actual / planned * 100) if planned > 0 else 0
-
-            if cat_progress > 100:
-                categories_over += 1
-                overrun = cat_actual - planned
-                if overrun > worst_overrun:
-                    worst_overrun = overrun
-                    worst_category = {"name": cat.category_name, "progress": round(cat_progress, 1), "overrun": round(overrun, 2)}
-            elif cat_progress > 90:
-                categories_warning += 1
-            else:
-                categories_ok += 1
-
-        total_cats = categories_ok + categories_warning + categories_over
-        budget_health = round(max(0, 100 - (categories_over * 20) - (categories_warning * 5)), 0) if total_cats > 0 else 100
-
-        # Cash flow for this project
-        try:
-            cash_flow = services.forecast_service.generate_cash_flow_forecast(db, project.id)
-            net_cash_flow = sum(row.get("net_flow", 0) for row in cash_flow)
-        except Exception:
-            cash_flow = []
-            net_cash_flow = 0
-
-        project_summaries.append({
-            "id": project.id,
-            "name": project.name,
-            "status": project.status,
-            "total_budget": round(total_budget, 2),
-            "actual_spent": round(actual_spent, 2),
-            "budget_progress": round(budget_progress, 1),
-            "total_revenue": round(total_revenue, 2),
-            "total_collected": round(total_collected, 2),
-            "collection_rate": round(collection_rate, 1),
-            "apartments_count": apartments_count,
-            "fully_paid": fully_paid,
-            "net_cash_flow": round(net_cash_flow, 2),
-            "budget_health": budget_health,
-            "categories_ok": categories_ok,
-            "categories_warning": categories_warning,
-            "categories_over": categories_over,
-            "worst_category": worst_category,
-            "cash_flow": cash_flow,
-        })
+    return cached_report(request, report_db, None, lambda: portfolio_summary(report_db, alerts_db=db))
 
-        total_budget_all += total_budget
-        total_spent_all += actual_spent
-        total_collected_all += total_collected
-        total_revenue_all += total_revenue
-
-    overall_collection = (total_collected_all / total_revenue_all * 100) if total_revenue_all > 0 else 0
-    overall_budget_progress = (total_spent_all / total_budget_all * 100) if total_budget_all > 0 else 0
-
-    # Feature 4: Buffer alerts
-    buffer_alerts = []
-    for proj_summary in project_summaries:
-        setting = db.query(models.ProjectSetting).filter(
-            models.ProjectSetting.project_id == proj_summary["id"]
-        ).first()
-        buffer_amount = float(setting.cash_buffer_amount) if setting else 200000
-
-        proj_buffer_alerts = []
-        for row in (proj_summary.get("cash_flow") or []):
-            cum_balance = row.get("cumulative_balance", 0)
-            if cum_balance < buffer_amount:
-                shortfall = buffer_amount - cum_balance
-                proj_buffer_alerts.append({
-                    "month": row["date"],
-                    "balance": round(cum_balance, 2),
-                    "buffer": round(buffer_amount, 2),
-                    "shortfall": round(shortfall, 2),
-                })
-
-        proj_summary["buffer_alerts"] = proj_buffer_alerts
-        for alert in proj_buffer_alerts:
-            buffer_alerts.append({
-                "project_id": proj_summary["id"],
-                "project_name": proj_summary["name"],
-                **alert,
-            })
+# --- Buffer Alerts ---
 
-    return {
-        "projects": project_summaries,
-        "totals": {
-            "project_count": len(project_summaries),
-            "total_budget": round(total_budget_all, 2),
-            "total_spent": round(total_spent_all, 2),
-            "budget_progress": round(overall_budget_progress, 1),
-            "total_revenue": round(total_revenue_all, 2),
-            "total_collected": round(total_collected_all, 2),
-            "collection_rate": round(overall_collection, 1),
-        },
-        "buffer_alerts": buffer_alerts,
-    }
+@app.get("/alerts/buffer")
+def get_buffer_alerts(project_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """התראות כרית מזומנים מחושבות מראש (לבאנר בדשבורד)"""
+    project_ids = [project_id] if project_id is not None else None
+    return FastJSONResponse(services.buffer_alerts.read_alerts(db, project_ids))
 
 # --- Project KPI Summary ---
 
 @app.get("/projects/{project_id}/kpi-summary")
-def get_project_kpi_summary(project_id: int, db: Session = Depends(get_db)):
+@report_pool.offload
+def get_project_kpi_summary(project_id: int, db: Session = Depends(get_report_db)):
     """Per-project KPI summary: collection, budget health, next month projection."""
-    # Collection data from apartments
-    apartments = db.query(models.Apartment).filter(
-        models.Apartment.project_id == project_id
-    ).all()
-
-    total_revenue = 0
-    total_collected = 0
-    fully_paid = 0
-    outstanding = 0
-
-    for apt in apartments:
-        sale_price = float(apt.sale_price) if apt.sale_price else 0
-        paid = db.query(func.sum(models.CustomerPayment.amount)).filter(
-            models.CustomerPayment.apartment_id == apt.id
-        ).scalar() or 0
-        paid = float(paid)
-        total_revenue += sale_price
-        total_collected += paid
-        if sale_price > 0 and paid >= sale_price:
-            fully_paid += 1
-        elif sale_price > 0:
-            outstanding += 1
-
-    collection_percent = (total_collected / total_revenue * 100) if total_revenue > 0 else 0
-
-    # Budget health
-    budget_items = db.query(models.BudgetCategory).filter(
-        models.BudgetCategory.project_id == project_id
-    ).all()
-
-    categories_ok = 0
-    categories_warning = 0
-    categories_over = 0
-    worst_category = None
-    worst_overrun = 0
-    total_budget = 0
-    total_actual_spent = 0
-
-    for cat in budget_items:
-        planned = float(cat.planned_amount) if cat.planned_amount else 0
-        total_budget += planned
-        if planned <= 0:
-            continue
-        cat_actual = db.query(func.sum(models.Transaction.amount)).filter(
-            models.Transaction.budget_item_id == cat.id,
-            models.Transaction.transaction_type == 1
-        ).scalar() or 0
-        cat_actual = float(cat_actual)
-        total_actual_spent += cat_actual
-        cat_progress = (cat_actual / planned * 100) if planned > 0 else 0
-
-        if cat_progress > 100:
-            categories_over += 1
-            overrun = cat_actual - planned
-            if overrun > worst_overrun:
-                worst_overrun = overrun
-                worst_category = {"name": cat.category_name, "progress": round(cat_progress, 1), "overrun": round(overrun, 2)}
-        elif cat_progress > 90:
-            categories_warning += 1
-        else:
-            categories_ok += 1
-
-    total_cats = categories_ok + categories_warning + categories_over
-    budget_health = round(max(0, 100 - (categories_over * 20) - (categories_warning * 5)), 0) if total_cats > 0 else 100
-
-    # Next month projection from cash flow
-    from datetime import datetime
-    now = datetime.now()
-    next_month = now.month + 1
-    next_year = now.year
-    if next_month > 12:
-        next_month = 1
-        next_year += 1
-    next_month_key = f"{next_year}-{next_month:02d}"
-
-    try:
-        cash_flow = services.forecast_service.generate_cash_flow_forecast(db, project_id)
-        next_month_data = next((row for row in cash_flow if row["date"] == next_month_key), None)
-    except Exception:
-        next_month_data = None
-
-    next_month_income = 0
-    next_month_expense = 0
-    if next_month_data:
-        next_month_income = next_month_data.get("actual_income", 0) + next_month_data.get("planned_income", 0)
-        next_month_expense = next_month_data.get("actual_expense", 0) + next_month_data.get("planned_expense", 0)
-
-    return {
-        "collection": {
-            "total_revenue": round(total_revenue, 2),
-            "total_collected": round(total_collected, 2),
-            "collection_percent": round(collection_percent, 1),
-            "fully_paid": fully_paid,
-            "outstanding": outstanding,
-            "total_apartments": len(apartments),
-        },
-        "budget_health": {
-            "score": budget_health,
-            "categories_ok": categories_ok,
-            "categories_warning": categories_warning,
-            "categories_over": categories_over,
-            "worst_category": worst_category,
-            "total_budget": round(total_budget, 2),
-            "total_spent": round(total_actual_spent, 2),
-        },
-        "next_month": {
-            "month": next_month_key,
-            "projected_income": round(next_month_income, 2),
-            "projected_expense": round(next_month_expense, 2),
-            "gap": round(next_month_income - next_month_expense, 2),
-        }
-    }
+    return FastJSONResponse(services.dashboard_service.kpi_summary(db, project_id))
 
 # --- Budget Timeline ---
 
 @app.get("/reports/budget-timeline/{project_id}")
-def get_budget_timeline(project_id: int, db: Session = Depends(get_db)):
+@report_pool.offload
+def get_budget_timeline(project_id: int, request: Request, db: Session = Depends(get_report_db)):
     """Budget timeline: monthly planned vs actual spending per category."""
-    from collections import defaultdict
-
-    categories = db.query(models.BudgetCategory).filter(
-        models.BudgetCategory.project_id == project_id
-    ).all()
+    return cached_report(
+        request, db, project_id, lambda: services.dashboard_service.budget_timeline(db, project_id)
+    )
 
-    if not categories:
-        return []
+# --- Project Dashboard ---
 
-    result = []
+@app.get("/projects/{project_id}/dashboard")
+@report_pool.offload
+def get_project_dashboard(
+    project_id: int,
+    request: Request,
+    sections: Optional[str] = Query(None, description="Comma-separated: kpi, cash_flow, budget, budget_timeline"),
+    db: Session = Depends(get_report_db),
+):
+    """KPI summary, cash flow, budget and budget timeline in one response, from data loaded once.
 
-    for cat in categories:
-        planned = float(cat.planned_amount) if cat.planned_amount else 0
-
-        # Get budget plans (planned spending schedule)
-        plans = db.query(models.BudgetPlan).filter(
-            models.BudgetPlan.budget_category_id == cat.id
-        ).order_by(models.BudgetPlan.planned_date).all()
-
-        planned_by_month = defaultdict(float)
-        for bp in plans:
-            if bp.planned_date:
-                month_key = bp.planned_date.strftime("%Y-%m")
-                planned_by_month[month_key] += float(bp.amount) if bp.amount else 0
-
-        # Get actual transactions for this category
-        txns = db.query(models.Transaction).filter(
-            models.Transaction.budget_item_id == cat.id,
-            models.Transaction.transaction_type == 1
-        ).all()
-
-        actual_by_month = defaultdict(float)
-        total_actual = 0
-        for tx in txns:
-            if tx.date:
-                month_key = tx.date.strftime("%Y-%m")
-                amt = float(tx.amount) if tx.amount else 0
-                actual_by_month[month_key] += amt
-                total_actual += amt
-
-        # Fallback: match by category name if no budget_item_id matches
-        if total_actual == 0 and cat.category_name:
-            fallback_txns = db.query(models.Transaction).filter(
-                models.Transaction.project_id == project_id,
-                models.Transaction.transaction_type == 1,
-                func.lower(models.Transaction.category) == cat.category_name.strip().lower()
-            ).all()
-            for tx in fallback_txns:
-                if tx.date:
-                    month_key = tx.date.strftime("%Y-%m")
-                    amt = float(tx.amount) if tx.amount else 0
-                    actual_by_month[month_key] += amt
-                    total_actual += amt
-
-        # Collect all months
-        all_months = sorted(set(list(planned_by_month.keys()) + list(actual_by_month.keys())))
-
-        monthly = []
-        cumulative_planned = 0
-        cumulative_actual = 0
-        for month in all_months:
-            p = planned_by_month.get(month, 0)
-            a = actual_by_month.get(month, 0)
-            cumulative_planned += p
-            cumulative_actual += a
-            monthly.append({
-                "month": month,
-                "planned": round(p, 2),
-                "actual": round(a, 2),
-                "cumulative_planned": round(cumulative_planned, 2),
-                "cumulative_actual": round(cumulative_actual, 2),
-            })
-
-        progress = (total_actual / planned * 100) if planned > 0 else 0
+    A section that fails is null, with its message under "errors"; the others are still served.
+    """
+    try:
+        names = services.dashboard_service.parse_sections(sections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return cached_report(
+        request, db, project_id,
+        lambda: services.dashboard_service.project_dashboard(db, project_id, names, isolate_errors=True),
+    )
 
-        result.append({
-            "id": cat.id,
-            "name": cat.category_name,
-            "budget": round(planned, 2),
-            "total_actual": round(total_actual, 2),
-            "progress": round(progress, 1),
-            "variance": round(planned - total_actual, 2),
-            "monthly": monthly,
-            "start_month": all_months[0] if all_months else None,
-            "end_month": all_months[-1] if all_months else None,
-        })
+# --- Change Feed (Server-Sent Events) ---
 
-    return result
+@app.get("/events/changes")
+async def stream_changes(
+    request: Request,
+    project_id: Optional[int] = None,
+    since: Optional[int] = Query(None, description="Replay changes after this change id"),
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_report_db),
+):
+    """Push compact change notifications (entity, data version, affected sections) as SSE."""
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)  # EventSource reconnect
+    feed = services.change_feed.get_feed(db)
+    subscription = services.change_feed.Subscription(asyncio.get_running_loop(), project_id)
+    start_id, backlog = await run_in_threadpool(feed.open, subscription, since)
+    return StreamingResponse(
+        services.change_feed.event_stream(feed, subscription, start_id, backlog, request.is_disconnected, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # --- CSV Import ---
 
@@ -881,32 +781,29 @@ def update_project_settings(project_id: int, settings: schemas.ProjectSettingCre
 
 # --- Feature 3: Suggested Category ---
 
-def _upsert_account_category_mapping(db: Session, tx):
-    """Upsert AccountCategoryMapping when transaction has both to_account_id and budget_item_id."""
-    if tx.to_account_id and tx.budget_item_id:
-        existing = db.query(models.AccountCategoryMapping).filter(
-            models.AccountCategoryMapping.account_id == tx.to_account_id,
-            models.AccountCategoryMapping.budget_category_id == tx.budget_item_id,
-        ).first()
-        if existing:
-            existing.last_used = datetime.now()
-        else:
-            mapping = models.AccountCategoryMapping(
-                account_id=tx.to_account_id,
-                budget_category_id=tx.budget_item_id,
-                last_used=datetime.now(),
-            )
-            db.add(mapping)
-        db.commit()
-
 @app.get("/accounts/{account_id}/suggested-category")
-def get_suggested_category(account_id: int, db: Session = Depends(get_db)):
-    mapping = db.query(models.AccountCategoryMapping).filter(
-        models.AccountCategoryMapping.account_id == account_id
-    ).order_by(models.AccountCategoryMapping.last_used.desc()).first()
-    if not mapping:
-        return {"budget_category_id": None}
-    return {"budget_category_id": mapping.budget_category_id}
+def get_suggested_category(account_id: int, project_id: Optional[int] = None, db: Session = Depends(get_db)):
+    ranked = suggest_categories(db, [account_id], project_id, limit=1)[account_id]
+    return {"budget_category_id": ranked[0][0] if ranked else None}
+
+MAX_SUGGESTION_ACCOUNTS = 10000
+
+@app.post("/accounts/suggested-categories")
+def get_suggested_categories(request: schemas.SuggestionRequest, db: Session = Depends(get_db)):
+    """Ranked category suggestions for many accounts at once (e.g. bulk import auto-categorization)."""
+    if len(request.account_ids) > MAX_SUGGESTION_ACCOUNTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SUGGESTION_ACCOUNTS} accounts per request")
+    ranked = suggest_categories(db, dict.fromkeys(request.account_ids), request.project_id, request.limit)
+    return {
+        "suggestions": [
+            {
+                "account_id": account_id,
+                "budget_category_id": candidates[0][0] if candidates else None,
+                "candidates": [{"budget_category_id": c, "score": score} for c, score in candidates],
+            }
+            for account_id, candidates in ranked.items()
+        ]
+    }
 
 # --- Feature 1: Apartment Search ---
 
@@ -946,20 +843,14 @@ def create_direct_to_owner_payment(
     if not apartment:
         raise HTTPException(status_code=404, detail="Apartment not found")
 
-    # Find Direct Account and Owner Account
-    direct_account = db.query(models.Account).filter(
-        models.Account.name.ilike("%direct%"),
-        models.Account.is_system_account == 1,
-    ).first()
-    owner_account = db.query(models.Account).filter(
-        models.Account.name.ilike("%owner%"),
-    ).first()
+    # Find Direct Account and Owner Account (cached registry, no lookup queries)
+    roles = get_account_roles(db)
+    direct_account = roles.direct
+    owner_account = roles.owner
 
     if not direct_account:
         # Check if a "Direct" account exists but isn't marked as system
-        maybe_direct = db.query(models.Account).filter(
-            models.Account.name.ilike("%direct%")
-        ).first()
+        maybe_direct = roles.direct_unflagged
         if maybe_direct:
             raise HTTPException(
                 status_code=400,
@@ -1042,43 +933,73 @@ def create_direct_to_owner_payment(
 @app.get("/diagnostics/system-accounts")
 def diagnostics_system_accounts(db: Session = Depends(get_db)):
     """Returns all accounts with system account flags, highlights Direct and Owner candidates."""
-    all_accounts = db.query(models.Account).all()
+    roles = get_account_roles(db)
     accounts_list = []
-    direct_candidate = None
-    owner_candidate = None
-
-    for acc in all_accounts:
+    for acc in roles.accounts:
         entry = {
             "id": acc.id,
             "name": acc.name,
-            "is_system_account": bool(acc.is_system_account),
+            "is_system_account": acc.is_system_account,
         }
         if "direct" in (acc.name or "").lower():
             entry["role"] = "Direct Account candidate"
-            if acc.is_system_account:
-                direct_candidate = acc
         if "owner" in (acc.name or "").lower():
             entry["role"] = "Owner Account candidate"
-            owner_candidate = acc
         accounts_list.append(entry)
 
-    issues = []
-    if not direct_candidate:
-        # Check if there's a non-system Direct account
-        maybe = next((a for a in all_accounts if "direct" in (a.name or "").lower()), None)
-        if maybe:
-            issues.append(f"Account '{maybe.name}' (id={maybe.id}) found but is_system_account is not set")
-        else:
-            issues.append("No account with 'Direct' in the name exists")
-    if not owner_candidate:
-        issues.append("No account with 'Owner' in the name exists")
-
     return {
         "accounts": accounts_list,
-        "status": "ok" if not issues else "misconfigured",
-        "issues": issues,
+        "status": "ok" if roles.ok else "misconfigured",
+        "issues": roles.issues,
     }
 
+# --- Ledger Archive ---
+
+@app.get("/admin/archive")
+def get_ledger_archive(db: Session = Depends(get_db)):
+    """Archived years and closed years still in the hot database."""
+    return {
+        "archived_years": ledger_archive.archived_years(db),
+        "closed_years": ledger_archive.closed_years(db),
+        "archive_path": ledger_archive.ARCHIVE_DB_PATH,
+    }
+
+@app.post("/admin/archive")
+def archive_closed_years(year: Optional[int] = None, db: Session = Depends(get_db)):
+    """Move closed years' transactions to the archive database (all closed years, or one)."""
+    closed = ledger_archive.closed_years(db)
+    if year is None:
+        return {"archived": {y: ledger_archive.archive_year(db, y) for y in closed}}
+    if year not in closed:
+        raise HTTPException(status_code=400, detail=f"{year} is not a closed year with transactions to archive")
+    return {"archived": {year: ledger_archive.archive_year(db, year)}}
+
+# --- Backups ---
+
+@app.post("/admin/backups", status_code=202)
+def start_backup():
+    """Start an online backup in the background (or return the one already running)."""
+    try:
+        return backups.start().to_dict()
+    except BackupInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/admin/backups")
+def get_backups():
+    """Progress of the latest backup started by this worker, and the retained backup files."""
+    job = backups.job
+    files = []
+    for path in backups.backups():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue  # pruned by a running backup since it was listed
+        files.append({
+            "file": os.path.basename(path),
+            "size_bytes": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        })
+    return {"job": job.to_dict() if job else None, "backups": files}
 
 if __name__ == "__main__":
     import uvicorn
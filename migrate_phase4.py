@@ -0,0 +1,165 @@
+"""
+Phase 4 Migration Script
+Run once before deploying Phase 4 (reporting performance) features.
+Safe to re-run: existing columns/indexes are skipped and backfills only
+touch rows that are still missing values.
+
+- Adds integer-cents shadow columns to money tables and backfills them
+- Adds yyyymm month_key columns to dated tables, backfills and indexes them
+- Merges duplicate account_category_mappings and adds a unique index on
+  (account_id, budget_category_id) for ON CONFLICT upserts
+- Indexes change_events by (entity, id) for per-entity data versions
+- Adds change_events.inserts_only so caches can tell appends from edits
+- Rebuilds transactions as AUTOINCREMENT and moves its id sequence past the
+  ledger archive, so archived transaction ids are never reused
+
+Usage: python migrate_phase4.py
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import engine
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+import models
+from services import ledger_archive
+
+
+def _add_column(conn, table, column, ddl):
+    try:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        conn.commit()
+        print(f"  [OK] Added {column} to {table}")
+    except Exception as e:
+        conn.rollback()
+        if "duplicate column" in str(e).lower() or "already exists" in str(e).lower():
+            print(f"  [SKIP] {column} already exists on {table}")
+        else:
+            print(f"  [WARN] {column} migration: {e}")
+
+
+def _create_index(conn, name, table, columns):
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+    conn.commit()
+    print(f"  [OK] Index {name}")
+
+
+def migrate_cents_columns(conn):
+    """Integer-cents shadow columns for exact aggregation."""
+    for table, source, shadow in [
+        ("transactions", "amount", "amount_cents"),
+        ("customer_payment_plans", "value", "value_cents"),
+        ("customer_payments", "amount", "amount_cents"),
+        ("budget_plans", "amount", "amount_cents"),
+    ]:
+        _add_column(conn, table, shadow, "BIGINT")
+        result = conn.execute(text(
+            f"UPDATE {table} SET {shadow} = CAST(ROUND({source} * 100) AS INTEGER) "
+            f"WHERE {shadow} IS NULL AND {source} IS NOT NULL"
+        ))
+        conn.commit()
+        print(f"  [OK] Backfilled {result.rowcount} rows of {table}.{shadow}")
+        _create_index(conn, f"ix_{table}_{shadow}", table, shadow)
+
+
+def migrate_month_keys(conn):
+    """Integer yyyymm month keys for SQL-side time bucketing."""
+    for table, source, indexes in [
+        ("transactions", "date", [
+            ("ix_transactions_project_month", "project_id, month_key"),
+            ("ix_transactions_budget_item_month", "budget_item_id, month_key"),
+        ]),
+        ("customer_payment_plans", "manual_date", [
+            ("ix_customer_payment_plans_project_month", "project_id, month_key"),
+        ]),
+        ("budget_plans", "planned_date", [
+            ("ix_budget_plans_category_month", "budget_category_id, month_key"),
+        ]),
+    ]:
+        _add_column(conn, table, "month_key", "INTEGER")
+        result = conn.execute(text(
+            f"UPDATE {table} SET month_key = CAST(strftime('%Y%m', {source}) AS INTEGER) "
+            f"WHERE month_key IS NULL AND {source} IS NOT NULL"
+        ))
+        conn.commit()
+        print(f"  [OK] Backfilled {result.rowcount} rows of {table}.month_key")
+        for name, columns in indexes:
+            _create_index(conn, name, table, columns)
+
+
+def migrate_category_mapping_unique(conn):
+    """One mapping row per (account, category), keeping the latest last_used."""
+    conn.execute(text(
+        "UPDATE account_category_mappings SET last_used = ("
+        "  SELECT MAX(m.last_used) FROM account_category_mappings m"
+        "  WHERE m.account_id = account_category_mappings.account_id"
+        "    AND m.budget_category_id = account_category_mappings.budget_category_id)"
+    ))
+    result = conn.execute(text(
+        "DELETE FROM account_category_mappings WHERE id NOT IN ("
+        "  SELECT MIN(id) FROM account_category_mappings GROUP BY account_id, budget_category_id)"
+    ))
+    conn.commit()
+    print(f"  [OK] Removed {result.rowcount} duplicate account_category_mappings rows")
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_account_category_mappings_account_category "
+        "ON account_category_mappings (account_id, budget_category_id)"
+    ))
+    conn.commit()
+    print("  [OK] Unique index uq_account_category_mappings_account_category")
+
+
+def migrate_transactions_autoincrement(conn):
+    """AUTOINCREMENT ids for transactions, above every archived id."""
+    if engine.dialect.name != "sqlite":
+        return
+    table_sql = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'transactions'"
+    )).scalar()
+    if "AUTOINCREMENT" in table_sql.upper():
+        print("  [SKIP] transactions already AUTOINCREMENT")
+    else:
+        # SQLite cannot alter a primary key: copy into a new table and swap it in
+        index_sql = [sql for (sql,) in conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'transactions' AND sql IS NOT NULL"
+        ))]
+        columns = ", ".join(c.name for c in models.Transaction.__table__.columns)
+        ddl = str(CreateTable(models.Transaction.__table__).compile(engine))
+        conn.execute(text(ddl.replace("CREATE TABLE transactions (", "CREATE TABLE transactions_rebuild (", 1)))
+        conn.execute(text(f"INSERT INTO transactions_rebuild ({columns}) SELECT {columns} FROM transactions"))
+        conn.execute(text("DROP TABLE transactions"))
+        conn.execute(text("ALTER TABLE transactions_rebuild RENAME TO transactions"))
+        for sql in index_sql:
+            conn.execute(text(sql))
+        conn.commit()
+        print("  [OK] transactions rebuilt with AUTOINCREMENT")
+
+    if os.path.exists(ledger_archive.ARCHIVE_DB_PATH):
+        ledger_archive.attach(conn)
+        if inspect(conn).has_table("transactions", schema=ledger_archive.ARCHIVE_SCHEMA):
+            ledger_archive.reserve_archived_ids(conn)
+            conn.commit()
+            print("  [OK] transactions id sequence moved past the archive")
+
+
+def run_migration():
+    print("Phase 4 Migration - Starting...")
+
+    # Auto-create any new tables
+    models.Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        migrate_cents_columns(conn)
+        migrate_month_keys(conn)
+        migrate_category_mapping_unique(conn)
+        _create_index(conn, "ix_change_events_entity_id", "change_events", "entity, id")
+        _add_column(conn, "change_events", "inserts_only", "BOOLEAN")
+        migrate_transactions_autoincrement(conn)
+
+    print("Phase 4 Migration - Complete!")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Numeric, Text
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, Float, Date, DateTime, ForeignKey, Numeric, Text, Index, event
 from sqlalchemy.orm import relationship
 from database import Base
+from services.money import to_cents
+from services.periods import month_key
+from datetime import datetime
 import enum
 
 
@@ -41,10 +44,12 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
     date = Column(DateTime)
+    month_key = Column(Integer)  # yyyymm of date, kept in sync on write
     phase_id = Column(Integer)
     from_account_id = Column(Integer, ForeignKey("accounts.id"))
     to_account_id = Column(Integer, ForeignKey("accounts.id"))
     amount = Column(Numeric(18, 2))
+    amount_cents = Column(BigInteger, index=True)  # shadow of amount, kept in sync on write
     vat_rate = Column(Numeric(10, 4))
     withholding_rate = Column(Numeric(10, 4))
     remarks = Column(String(255))
@@ -64,6 +69,13 @@ class Transaction(Base):
     to_account = relationship("Account", foreign_keys=[to_account_id])
     apartment = relationship("Apartment")
 
+    __table_args__ = (
+        Index("ix_transactions_project_month", "project_id", "month_key"),
+        Index("ix_transactions_budget_item_month", "budget_item_id", "month_key"),
+        # Ids of archived rows (services/ledger_archive.py) must never be handed out again
+        {"sqlite_autoincrement": True},
+    )
+
 class BudgetCategory(Base):
     __tablename__ = "budget_categories"
     id = Column(Integer, primary_key=True, index=True)
@@ -79,12 +91,18 @@ class CustomerPaymentPlan(Base):
     price_id = Column(Integer)
     phase_id = Column(Integer)
     manual_date = Column(DateTime)
+    month_key = Column(Integer)  # yyyymm of manual_date, kept in sync on write
     value = Column(Numeric(18, 2))
+    value_cents = Column(BigInteger, index=True)  # shadow of value, kept in sync on write
     remarks = Column(Text)
     project_id = Column(Integer, ForeignKey("projects.id"))
 
     project = relationship("Project")
 
+    __table_args__ = (
+        Index("ix_customer_payment_plans_project_month", "project_id", "month_key"),
+    )
+
 
 class Apartment(Base):
     __tablename__ = "apartments"
@@ -110,6 +128,7 @@ class CustomerPayment(Base):
     apartment_id = Column(Integer, ForeignKey("apartments.id"), nullable=False)
     date = Column(DateTime, nullable=False)
     amount = Column(Numeric(18, 2), nullable=False)
+    amount_cents = Column(BigInteger, index=True)  # shadow of amount, kept in sync on write
     payment_method = Column(String(50), nullable=False, default="Bank Transfer")
     notes = Column(Text, nullable=True)
     linked_transaction_ids = Column(Text, nullable=True)
@@ -122,11 +141,17 @@ class BudgetPlan(Base):
     id = Column(Integer, primary_key=True, index=True)
     budget_category_id = Column(Integer, ForeignKey("budget_categories.id"), nullable=False)
     planned_date = Column(DateTime, nullable=False)
+    month_key = Column(Integer)  # yyyymm of planned_date, kept in sync on write
     amount = Column(Numeric(18, 2), nullable=False)
+    amount_cents = Column(BigInteger, index=True)  # shadow of amount, kept in sync on write
     description = Column(Text, nullable=True)
 
     budget_category = relationship("BudgetCategory", backref="plans")
 
+    __table_args__ = (
+        Index("ix_budget_plans_category_month", "budget_category_id", "month_key"),
+    )
+
 
 class ProjectSetting(Base):
     __tablename__ = "project_settings"
@@ -145,4 +170,121 @@ class AccountCategoryMapping(Base):
     last_used = Column(DateTime, nullable=True)
 
     account = relationship("Account")
-    budget_category = relationship("BudgetCategory")
\ No newline at end of file
+    budget_category = relationship("BudgetCategory")
+
+    __table_args__ = (
+        Index("uq_account_category_mappings_account_category", "account_id", "budget_category_id", unique=True),
+    )
+
+
+
+# --- Change tracking & precomputed reports ---
+
+class ChangeEvent(Base):
+    """One row per (project, entity) touched by an ORM flush; id doubles as a data version."""
+    __tablename__ = "change_events"
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, index=True, nullable=True)  # NULL = affects every project
+    entity = Column(String(50), nullable=False)
+    month_key = Column(Integer, nullable=True)  # earliest month touched, NULL = not month-specific
+    inserts_only = Column(Boolean, nullable=True)  # every touched row was new; NULL = rows may have changed
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_change_events_entity_id", "entity", "id"),
+    )
+
+
+class BufferAlert(Base):
+    __tablename__ = "buffer_alerts"
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    month_key = Column(Integer, nullable=False)
+    balance_cents = Column(BigInteger, nullable=False)
+    buffer_cents = Column(BigInteger, nullable=False)
+    shortfall_cents = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_buffer_alerts_project_month", "project_id", "month_key"),
+    )
+
+
+class BufferAlertState(Base):
+    """When a project's alerts were last evaluated, and against which data."""
+    __tablename__ = "buffer_alert_states"
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    source_version = Column(Integer, nullable=False, default=0)  # last change_events.id included
+    month_key = Column(Integer, nullable=False)  # current month at evaluation (plans roll into it)
+    evaluated_at = Column(DateTime, nullable=False)
+
+
+class BalanceCheckpoint(Base):
+    """Closing cumulative cash balance of a past month, as the forecast computes it."""
+    __tablename__ = "balance_checkpoints"
+    project_id = Column(Integer, primary_key=True)  # 0 = all projects
+    month_key = Column(Integer, primary_key=True)
+    closing_cents = Column(BigInteger, nullable=False)
+    source_version = Column(Integer, nullable=False)  # last change_events.id included
+
+
+# --- Ledger archive (services/ledger_archive.py) ---
+
+class TransactionSummary(Base):
+    """Totals of archived transactions per month and every dimension reports group by."""
+    __tablename__ = "transaction_summaries"
+    id = Column(Integer, primary_key=True, index=True)
+    year = Column(Integer, nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    month_key = Column(Integer)
+    transaction_type = Column(Integer)
+    type = Column(Text)
+    category = Column(Text)
+    budget_item_id = Column(Integer)
+    phase_id = Column(Integer)
+    direction = Column(Integer, nullable=False)  # 1 income / -1 expense, resolved when archived
+    amount_cents = Column(BigInteger, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_transaction_summaries_project_month", "project_id", "month_key"),
+    )
+
+
+class ArchivedYear(Base):
+    """A year whose transactions were moved to the archive database."""
+    __tablename__ = "archived_years"
+    year = Column(Integer, primary_key=True)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime, nullable=False)
+
+
+# --- Derived columns ---
+# Keep the *_cents and month_key columns in step with their source columns on
+# every ORM write. Rows written with raw SQL are backfilled by migrate_phase4.py.
+
+_CENTS_COLUMNS = {
+    Transaction: ("amount", "amount_cents"),
+    CustomerPaymentPlan: ("value", "value_cents"),
+    CustomerPayment: ("amount", "amount_cents"),
+    BudgetPlan: ("amount", "amount_cents"),
+}
+
+_MONTH_KEY_COLUMNS = {
+    Transaction: "date",
+    CustomerPaymentPlan: "manual_date",
+    BudgetPlan: "planned_date",
+}
+
+
+def _sync_derived_columns(mapper, connection, target):
+    model = type(target)
+    if model in _CENTS_COLUMNS:
+        source, shadow = _CENTS_COLUMNS[model]
+        setattr(target, shadow, to_cents(getattr(target, source)))
+    if model in _MONTH_KEY_COLUMNS:
+        target.month_key = month_key(getattr(target, _MONTH_KEY_COLUMNS[model]))
+
+
+for _model in set(_CENTS_COLUMNS) | set(_MONTH_KEY_COLUMNS):
+    event.listen(_model, "before_insert", _sync_derived_columns)
+    event.listen(_model, "before_update", _sync_derived_columns)
@@ -0,0 +1,159 @@
+"""
+Replay captured API traffic against a running instance and report latency.
+
+Reads a JSONL capture produced by the traffic capture middleware
+(TRAFFIC_CAPTURE_FILE) and re-issues the GET requests with their original
+relative timing, optionally sped up, at a bounded concurrency. Write requests
+are skipped because request bodies are never captured.
+
+Usage:
+    python replay_traffic.py capture.jsonl --base-url http://localhost:8000 \
+        --concurrency 20 --rate 4
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def load_capture(path):
+    """Load captured request records, ordered by capture timestamp."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    records.sort(key=lambda r: r.get("ts", 0))
+    return records
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(results):
+    """Group replay results by route and compute latency percentiles and error rates."""
+    by_route = defaultdict(list)
+    for r in results:
+        by_route[(r["method"], r["route"])].append(r)
+
+    summary = []
+    for (method, route), rows in sorted(by_route.items()):
+        latencies = [r["latency_ms"] for r in rows if r["status"] is not None]
+        errors = sum(1 for r in rows if r["status"] is None or r["status"] >= 500)
+        client_errors = sum(1 for r in rows if r["status"] is not None and 400 <= r["status"] < 500)
+        summary.append({
+            "method": method,
+            "route": route,
+            "count": len(rows),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies), 2) if latencies else 0,
+            "error_rate": round(errors / len(rows) * 100, 2),
+            "client_error_rate": round(client_errors / len(rows) * 100, 2),
+        })
+    return summary
+
+
+async def replay(records, base_url, concurrency=10, rate=1.0, timeout=30.0, transport=None):
+    """
+    Re-issue captured GET requests.
+
+    rate scales the recorded inter-arrival times: 2.0 replays twice as fast,
+    0 fires everything as fast as the concurrency limit allows.
+    """
+    records = [r for r in records if r.get("method") == "GET"]
+    if not records:
+        return []
+
+    semaphore = asyncio.Semaphore(concurrency)
+    first_ts = records[0].get("ts", 0)
+    results = []
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, transport=transport) as client:
+        start = time.perf_counter()
+
+        async def fire(record):
+            if rate > 0:
+                delay = (record.get("ts", first_ts) - first_ts) / rate
+                wait = delay - (time.perf_counter() - start)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            url = record["path"]
+            if record.get("query"):
+                url = f"{url}?{record['query']}"
+            async with semaphore:
+                t0 = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = None
+                latency_ms = (time.perf_counter() - t0) * 1000
+            results.append({
+                "method": "GET",
+                "route": record.get("route") or record["path"],
+                "status": status,
+                "latency_ms": latency_ms,
+            })
+
+        await asyncio.gather(*(fire(r) for r in records))
+    return results
+
+
+def print_summary(summary, elapsed):
+    total = sum(row["count"] for row in summary)
+    print(f"Replayed {total} requests in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} req/s)")
+    print(f"{'route':<45} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'err%':>6}")
+    for row in summary:
+        print(f"{row['route']:<45} {row['count']:>6} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+              f"{row['p99_ms']:>9} {row['error_rate']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured API traffic")
+    parser.add_argument("capture", help="JSONL file written by the traffic capture middleware")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=1.0,
+                        help="Multiple of the recorded request rate (0 = unthrottled)")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the capture this many times")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture)
+    if args.repeat > 1 and records:
+        span = records[-1].get("ts", 0) - records[0].get("ts", 0) + 1
+        records = [
+            {**r, "ts": r.get("ts", 0) + i * span}
+            for i in range(args.repeat) for r in records
+        ]
+
+    started = time.perf_counter()
+    results = asyncio.run(replay(records, args.base_url, args.concurrency, args.rate))
+    elapsed = time.perf_counter() - started
+    summary = summarize(results)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary, elapsed)
+
+
+if __name__ == "__main__":
+    main()
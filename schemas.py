@@ -1,4 +1,4 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, validator
 from datetime import date, datetime
 from typing import Optional, List
 from decimal import Decimal
@@ -40,6 +40,14 @@ class Project(ProjectBase):
     class Config:
         from_attributes = True
 
+class ProjectRollups(BaseModel):
+    actual_spent: float
+    total_collected: float
+    apartments_count: int
+
+class ProjectListItem(Project):
+    rollups: Optional[ProjectRollups] = None
+
 # --- Transaction Schemas ---
 class TransactionBase(BaseModel):
     date: datetime
@@ -177,4 +185,32 @@ class AccountCategoryMapping(AccountCategoryMappingBase):
     id: int
     last_used: Optional[datetime] = None
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SuggestionRequest(BaseModel):
+    account_ids: List[int]
+    project_id: Optional[int] = None  # only suggest this project's categories
+    limit: int = Field(3, ge=1, le=20)
+
+# --- Scenario Schemas ---
+# Shifts widen the dense month axis of every scenario, so they are bounded to ten years
+MAX_SHIFT_MONTHS = 120
+# Factors scale plan amounts: finite, not negative, and at most a hundredfold
+MAX_FACTOR = 100.0
+
+class CategoryOverride(BaseModel):
+    budget_category_id: int
+    shift_months: Optional[int] = Field(None, ge=-MAX_SHIFT_MONTHS, le=MAX_SHIFT_MONTHS)
+    factor: Optional[float] = Field(None, ge=0, le=MAX_FACTOR, allow_inf_nan=False)
+
+class Scenario(BaseModel):
+    name: str
+    income_shift_months: int = Field(0, ge=-MAX_SHIFT_MONTHS, le=MAX_SHIFT_MONTHS)  # collections slip (+) or arrive early (-)
+    income_factor: float = Field(1.0, ge=0, le=MAX_FACTOR, allow_inf_nan=False)  # scale open customer payment plans
+    expense_shift_months: int = Field(0, ge=-MAX_SHIFT_MONTHS, le=MAX_SHIFT_MONTHS)  # budget plans slip (+) or arrive early (-)
+    expense_factor: float = Field(1.0, ge=0, le=MAX_FACTOR, allow_inf_nan=False)  # e.g. 1.1 = costs rise 10%
+    category_overrides: List[CategoryOverride] = []
+
+class ScenarioRequest(BaseModel):
+    scenarios: List[Scenario]
+    cash_buffer_amount: Optional[float] = None  # defaults to the project's setting
@@ -0,0 +1,162 @@
+"""
+Cached registry of system and role accounts.
+
+VAT rules need to know which accounts are system accounts, and Direct to
+Owner payments need the "Direct" (system) and "Owner" accounts. Instead of
+querying the accounts table on every write, each process keeps an
+immutable snapshot of all accounts per engine.
+
+The snapshot is versioned by the latest account change in change_events.
+Account writes in this process invalidate it immediately (and again after
+commit). Other processes' writes are picked up by re-checking the version
+at most every REVALIDATE_SECONDS, so hot paths normally run no query.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_session
+
+import models
+from services.engine_registry import PerEngine
+
+REVALIDATE_SECONDS = 5.0
+ACCOUNT_ENTITIES = ("account",)
+
+
+@dataclass(frozen=True)
+class AccountInfo:
+    id: int
+    name: str
+    is_system_account: bool
+
+
+@dataclass(frozen=True)
+class AccountRoles:
+    version: int
+    accounts: Tuple[AccountInfo, ...] = ()
+    system_ids: FrozenSet[int] = frozenset()
+    direct: Optional[AccountInfo] = None            # first system account named "direct"
+    direct_unflagged: Optional[AccountInfo] = None  # "direct" account missing the system flag
+    owner: Optional[AccountInfo] = None             # first account named "owner"
+    issues: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+
+def _role_name(account: AccountInfo) -> str:
+    return (account.name or "").lower()
+
+
+def build_roles(version: int, accounts: Tuple[AccountInfo, ...]) -> AccountRoles:
+    direct = next((a for a in accounts if "direct" in _role_name(a) and a.is_system_account), None)
+    direct_any = next((a for a in accounts if "direct" in _role_name(a)), None)
+    owner = next((a for a in accounts if "owner" in _role_name(a)), None)
+
+    issues = []
+    if not direct:
+        if direct_any:
+            issues.append(f"Account '{direct_any.name}' (id={direct_any.id}) found but is_system_account is not set")
+        else:
+            issues.append("No account with 'Direct' in the name exists")
+    if not owner:
+        issues.append("No account with 'Owner' in the name exists")
+
+    return AccountRoles(
+        version=version,
+        accounts=accounts,
+        system_ids=frozenset(a.id for a in accounts if a.is_system_account),
+        direct=direct,
+        direct_unflagged=None if direct else direct_any,
+        owner=owner,
+        issues=issues,
+    )
+
+
+def _account_version(db: Session) -> int:
+    return db.query(func.max(models.ChangeEvent.id)).filter(
+        models.ChangeEvent.entity.in_(ACCOUNT_ENTITIES)
+    ).scalar() or 0
+
+
+def _load(db: Session) -> AccountRoles:
+    version = _account_version(db)
+    rows = db.query(models.Account.id, models.Account.name, models.Account.is_system_account).order_by(
+        models.Account.id
+    ).all()
+    accounts = tuple(AccountInfo(acc_id, name, bool(is_system)) for acc_id, name, is_system in rows)
+    return build_roles(version, accounts)
+
+
+class AccountRegistry:
+    """Per-process, per-engine holder of the current AccountRoles snapshot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roles: Optional[AccountRoles] = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._roles = None
+
+    def get(self, db: Session) -> AccountRoles:
+        with self._lock:
+            roles = self._roles
+            now = time.monotonic()
+            if roles is not None and now - self._checked_at < REVALIDATE_SECONDS:
+                return roles
+            if roles is None or _account_version(db) != roles.version:
+                roles = self._roles = _load(db)
+            self._checked_at = now
+            return roles
+
+
+_registries: PerEngine[AccountRegistry] = PerEngine(lambda bind: AccountRegistry())
+
+
+def get_account_roles(db: Session) -> AccountRoles:
+    """Current system/role accounts for the database behind this session."""
+    return _registries.for_session(db).get(db)
+
+
+def system_account_ids(db: Session) -> FrozenSet[int]:
+    return get_account_roles(db).system_ids
+
+
+def check_accounts(session_factory) -> AccountRoles:
+    """Load the registry at startup and report misconfigured role accounts."""
+    db = session_factory()
+    try:
+        roles = get_account_roles(db)
+    finally:
+        db.close()
+    for issue in roles.issues:
+        print(f"WARNING: system accounts misconfigured: {issue}")
+    return roles
+
+
+def invalidate_all():
+    for registry in _registries.values():
+        registry.invalidate()
+
+
+def _mark_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info["accounts_changed"] = True
+    invalidate_all()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("accounts_changed", False):
+        invalidate_all()
+
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(models.Account, _event, _mark_changed)
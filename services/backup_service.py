@@ -0,0 +1,266 @@
+"""
+Online backups of the SQLite database files.
+
+Copies go through SQLite's online backup API (sqlite3.Connection.backup) in
+steps of BACKUP_PAGES_PER_STEP pages, pausing BACKUP_STEP_PAUSE seconds
+between steps so writers get the database in between. Every backup is a
+consistent snapshot: SQLite restarts the copy when another connection
+writes mid-way, and after MAX_RESTARTS the rest is copied in one step so a
+busy database still gets backed up.
+
+Backups are written to a .partial file, checked with PRAGMA quick_check and
+renamed into BACKUP_DIR as <name>-<yyyymmdd-HHMMSS>.db; the newest
+BACKUP_RETENTION per database are kept. BackupScheduler takes one whenever
+the newest is older than BACKUP_INTERVAL, and a lock file in BACKUP_DIR
+keeps gunicorn workers from running two at once.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+BACKUP_DIR = os.getenv("BACKUP_DIR")  # default: "backups" next to the database
+BACKUP_INTERVAL = float(os.getenv("BACKUP_INTERVAL", "86400"))  # seconds, 0 = no scheduled backups
+BACKUP_RETENTION = int(os.getenv("BACKUP_RETENTION", "7"))
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_PAUSE = float(os.getenv("BACKUP_STEP_PAUSE", "0.01"))  # seconds between steps
+MAX_RESTARTS = 3
+LOCK_STALE_SECONDS = 3600  # a lock older than this was left by a crashed worker
+
+_STAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class BackupInProgress(Exception):
+    """Another backup (in this or another worker) holds the lock."""
+
+
+class _Restarted(Exception):
+    pass
+
+
+def copy_database(source: str, dest: str, pages: int = -1, pause: float = 0.0, progress=None) -> int:
+    """
+    Copy a live SQLite database with the backup API; returns how many times
+    the copy restarted because of concurrent writes. progress(remaining,
+    total) is called after every step.
+    """
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(dest)
+    restarts = 0
+    try:
+        if pages <= 0:
+            src.backup(dst, progress=(lambda status, remaining, total: progress(remaining, total)) if progress else None)
+            return 0
+        seen = {"remaining": None}
+
+        def step(status, remaining, total):
+            if progress:
+                progress(remaining, total)
+            if seen["remaining"] is not None and remaining > seen["remaining"]:
+                raise _Restarted()
+            seen["remaining"] = remaining
+            if remaining and pause:
+                time.sleep(pause)
+
+        while True:
+            try:
+                src.backup(dst, pages=pages, progress=step)
+                return restarts
+            except _Restarted:
+                restarts += 1
+                seen["remaining"] = None
+                if restarts >= MAX_RESTARTS:
+                    src.backup(dst)
+                    return restarts
+    finally:
+        dst.close()
+        src.close()
+
+
+def _page_count(path: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _check(path: str):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise RuntimeError(f"Backup {os.path.basename(path)} failed quick_check: {result}")
+
+
+@dataclass
+class BackupJob:
+    id: int
+    status: str = "running"  # running / done / failed
+    started_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    finished_at: Optional[str] = None
+    files: List[str] = field(default_factory=list)
+    total_pages: int = 0
+    copied_pages: int = 0
+    restarts: int = 0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["progress"] = round(self.copied_pages / self.total_pages, 3) if self.total_pages else 0.0
+        return data
+
+
+class BackupService:
+    """Backs up a set of database files into backup_dir, one job at a time."""
+
+    def __init__(self, sources: List[str], backup_dir: Optional[str] = None,
+                 retention: int = BACKUP_RETENTION, pages_per_step: int = BACKUP_PAGES_PER_STEP,
+                 pause: float = BACKUP_STEP_PAUSE):
+        self.sources = list(sources)
+        self.backup_dir = backup_dir or BACKUP_DIR or os.path.join(os.path.dirname(os.path.abspath(self.sources[0])), "backups")
+        self.retention = retention
+        self.pages_per_step = pages_per_step
+        self.pause = pause
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._job: Optional[BackupJob] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def job(self) -> Optional[BackupJob]:
+        return self._job
+
+    @property
+    def _lock_path(self) -> str:
+        return os.path.join(self.backup_dir, "backup.lock")
+
+    def _acquire_file_lock(self):
+        os.makedirs(self.backup_dir, exist_ok=True)
+        try:
+            if time.time() - os.path.getmtime(self._lock_path) > LOCK_STALE_SECONDS:
+                os.remove(self._lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            raise BackupInProgress("A backup is already running")
+
+    def start(self) -> BackupJob:
+        """Run a backup in a background thread; returns the running job if there is one."""
+        with self._lock:
+            if self._job is not None and self._job.status == "running":
+                return self._job
+            self._acquire_file_lock()
+            job = self._job = BackupJob(id=next(self._ids))
+        self._thread = threading.Thread(target=self._run, args=(job,), name="db-backup", daemon=True)
+        self._thread.start()
+        return job
+
+    def run(self) -> BackupJob:
+        """Run a backup now, in this thread."""
+        with self._lock:
+            self._acquire_file_lock()
+            job = self._job = BackupJob(id=next(self._ids))
+        self._run(job)
+        return job
+
+    def wait(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, job: BackupJob):
+        try:
+            stamp = datetime.now().strftime(_STAMP_FORMAT)
+            sources = [path for path in self.sources if os.path.exists(path)]
+            job.total_pages = sum(_page_count(source) for source in sources)
+            for source in sources:
+                name = os.path.splitext(os.path.basename(source))[0]
+                dest = os.path.join(self.backup_dir, f"{name}-{stamp}.db")
+                partial = dest + ".partial"
+                base = job.copied_pages
+
+                def progress(remaining, total, base=base):
+                    job.copied_pages = min(base + total - remaining, job.total_pages)
+
+                job.restarts += copy_database(source, partial, self.pages_per_step, self.pause, progress)
+                _check(partial)
+                os.replace(partial, dest)
+                job.files.append(dest)
+                self._prune(name)
+            job.copied_pages = job.total_pages
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"Database backup failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow().isoformat()
+            try:
+                os.remove(self._lock_path)
+            except OSError:
+                pass
+
+    def _prune(self, name: str):
+        for path in self.backups(name)[self.retention:]:
+            os.remove(path)
+
+    def backups(self, name: Optional[str] = None) -> List[str]:
+        """Backup files, newest first (only those of one database with name)."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        prefixes = [name] if name else [os.path.splitext(os.path.basename(s))[0] for s in self.sources]
+        files = [
+            os.path.join(self.backup_dir, f) for f in os.listdir(self.backup_dir)
+            if f.endswith(".db") and any(f.startswith(p + "-") for p in prefixes)
+        ]
+        return sorted(files, key=lambda f: f.rsplit("-", 2)[-2:], reverse=True)
+
+    def last_backup_age(self) -> Optional[float]:
+        files = self.backups()
+        return time.time() - os.path.getmtime(files[0]) if files else None
+
+
+class BackupScheduler:
+    """Background thread that backs up whenever the newest backup is older than `interval`."""
+
+    def __init__(self, service: BackupService, interval: float = BACKUP_INTERVAL):
+        self.service = service
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def run_once(self) -> bool:
+        age = self.service.last_backup_age()
+        if age is not None and age < self.interval:
+            return False
+        try:
+            self.service.run()
+        except BackupInProgress:
+            return False
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Scheduled backup failed: {e}")
+            # Re-check often enough that a worker restart does not postpone the next backup by a full interval
+            self._stop.wait(min(self.interval, 600))
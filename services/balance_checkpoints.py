@@ -0,0 +1,67 @@
+"""
+Persisted monthly closing balances for windowed cash-flow forecasts.
+
+Months before the current one only hold actuals (past-due plans roll into
+the current month), so their cumulative balance stays final until someone
+back-dates a transaction. balance_checkpoints stores that closing balance
+per project and month together with the change_events version it was
+computed from. A checkpoint is valid while no newer change to transactions
+(or to accounts, which can flip an untyped row's direction) is dated in or
+before its month; invalid ones are ignored on read and overwritten the next
+time their month is computed.
+"""
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import exists, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from services.change_log import LEDGER_ENTITIES
+
+
+def _ledger_changes(project_id: Optional[int], since_version, through_month):
+    """EXISTS clause: a ledger change newer than since_version dated in or before through_month."""
+    E = models.ChangeEvent
+    changes = exists().where(
+        E.id > since_version,
+        E.entity.in_(LEDGER_ENTITIES),
+        or_(E.month_key.is_(None), E.month_key <= through_month),
+    )
+    if project_id:
+        changes = changes.where(or_(E.project_id == project_id, E.project_id.is_(None)))
+    return changes
+
+
+def ledger_changed(db: Session, project_id: Optional[int], since_version: int, through_month: int) -> bool:
+    """Whether actuals of any month up to through_month changed after since_version."""
+    return db.query(_ledger_changes(project_id, since_version, through_month)).scalar()
+
+
+def latest_checkpoint(db: Session, project_id: Optional[int], before_key: int) -> Optional[Tuple[int, int]]:
+    """(month_key, closing cents) of the latest valid checkpoint before before_key."""
+    C = models.BalanceCheckpoint
+    row = db.query(C.month_key, C.closing_cents).filter(
+        C.project_id == (project_id or 0),
+        C.month_key < before_key,
+        ~_ledger_changes(project_id, C.source_version, C.month_key),
+    ).order_by(C.month_key.desc()).first()
+    return tuple(row) if row else None
+
+
+def save_checkpoints(db: Session, project_id: Optional[int], version: int, closings: Iterable[Tuple[int, int]]):
+    """Store (month_key, closing cents) checkpoints computed from data at `version`."""
+    closings = list(closings)
+    if not closings:
+        return
+    C = models.BalanceCheckpoint
+    key = project_id or 0
+    db.query(C).filter(C.project_id == key, C.month_key.in_([m for m, _ in closings])).delete(
+        synchronize_session=False
+    )
+    db.add_all(C(project_id=key, month_key=m, closing_cents=cents, source_version=version) for m, cents in closings)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker stored the same months concurrently
+        db.rollback()
@@ -1,6 +1,9 @@
 import sqlite3
 from database import get_db_connection
+from services.ledger_archive import LEDGER_ROWS_SQL, ledger_rows
 from collections import defaultdict
+from sqlalchemy import func, or_
+from services.money import from_cents
 
 def normalize_string(s):
     """Normalize string for case-insensitive comparison"""
@@ -8,13 +11,13 @@ def normalize_string(s):
         return ""
     return str(s).strip().lower()
 
-def get_budget_report(project_id):
+def get_budget_report(project_id, read_only=False):
     """
     מחזיר את דוח התקציב: משווה בין התקציב המתוכנן (budget_categories)
     לבין ההוצאות בפועל (transactions).
     מבצע התאמה case-insensitive בין קטגוריות.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(read_only=read_only)
     cursor = conn.cursor()
 
     # 1. שליפת כל קטגוריות התקציב לפרויקט
@@ -28,12 +31,13 @@ def get_budget_report(project_id):
     # 2. שליפת סיכום הוצאות בפועל לפי קטגוריה
     # Check both 'type' field (legacy) and 'transaction_type' field
     # transaction_type = 1 means Executed, and we want expenses
-    cursor.execute("""
+    # Archived years are read from their summary rows (services/ledger_archive.py)
+    cursor.execute(f"""
         SELECT 
             budget_item_id,
             category, 
-            SUM(amount) as total_actual
-        FROM transactions
+            SUM(amount_cents) as total_actual_cents
+        FROM {LEDGER_ROWS_SQL}
         WHERE project_id = ? 
           AND (
             type = 'expense' 
@@ -45,16 +49,30 @@ def get_budget_report(project_id):
 
     conn.close()
 
+    return build_budget_report(budget_rows, actual_rows)
+
+def load_budget_actuals(db, project_id):
+    """(budget_item_id, category, total cents) rows, as get_budget_report reads them."""
+    rows = ledger_rows().c
+    return db.query(rows.budget_item_id, rows.category, func.sum(rows.amount_cents)).filter(
+        rows.project_id == project_id,
+        or_(rows.type == 'expense', rows.transaction_type == 1),
+    ).group_by(rows.budget_item_id, rows.category).all()
+
+def build_budget_report(budget_rows, actual_rows):
+    """
+    Build the report rows from (id, category_name, planned_amount) budget rows
+    and (budget_item_id, category, total cents) actual rows.
+    """
     # Create maps for matching:
     # 1. By budget_item_id (most accurate)
     # 2. By normalized category name (case-insensitive fallback)
-    actual_by_budget_id = defaultdict(float)
-    actual_by_category = defaultdict(float)
+    # Sums stay in integer cents until the report rows are built
+    actual_by_budget_id = defaultdict(int)
+    actual_by_category = defaultdict(int)
     
-    for row in actual_rows:
-        amount = float(row['total_actual'] or 0)
-        budget_item_id = row['budget_item_id']
-        category = row['category']
+    for budget_item_id, category, amount in actual_rows:
+        amount = amount or 0
         
         # Match by budget_item_id if available (most accurate)
         if budget_item_id:
@@ -69,10 +87,8 @@ def get_budget_report(project_id):
     total_planned = 0
     total_actual = 0
 
-    for item in budget_rows:
-        budget_id = item['id']
-        cat_name = item['category_name']
-        planned = float(item['planned_amount'] or 0)
+    for budget_id, cat_name, planned in budget_rows:
+        planned = float(planned or 0)
         
         # First try to match by budget_item_id (most accurate)
         actual = actual_by_budget_id.get(budget_id, 0)
@@ -81,6 +97,7 @@ def get_budget_report(project_id):
         if actual == 0:
             normalized_budget_cat = normalize_string(cat_name)
             actual = actual_by_category.get(normalized_budget_cat, 0)
+        actual = from_cents(actual)
         
         variance = planned - actual
         progress = (actual / planned * 100) if planned > 0 else 0
@@ -89,7 +106,7 @@ def get_budget_report(project_id):
         total_actual += actual
 
         report.append({
-            "id": item['id'],
+            "id": budget_id,
             "name": cat_name,  # Changed from "category" to "name" to match frontend
             "planned": planned,
             "actual": actual,
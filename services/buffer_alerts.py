@@ -0,0 +1,179 @@
+"""
+Precomputed cash-buffer alerts.
+
+A project has an alert for every forecast month whose cumulative balance
+falls below its cash buffer. Alerts are evaluated per project and stored in
+the indexed buffer_alerts table, together with a buffer_alert_states row
+recording the change_events version and the month they were computed for.
+Readers only refresh projects that are stale (newer changes, a new month,
+or older than MAX_AGE), so with the background evaluator running the
+alerts endpoint is a single indexed read.
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from services import change_log
+from services.cash_risk_service import load_cash_buffers
+from services.forecast_service import build_forecast_report, load_forecast_inputs
+from services.money import to_cents, from_cents
+from services.periods import current_month_key, month_label, parse_month_label
+
+ALERT_STATUSES = ("Active", "Completed")
+MAX_AGE = timedelta(hours=6)  # catches writes made with raw SQL
+
+
+def _project_ids(db: Session, project_ids: Optional[Iterable[int]] = None) -> List[int]:
+    query = db.query(models.Project.id).filter(models.Project.status.in_(ALERT_STATUSES))
+    if project_ids is not None:
+        query = query.filter(models.Project.id.in_(list(project_ids)))
+    return [pid for (pid,) in query.order_by(models.Project.id).all()]
+
+
+def stale_project_ids(db: Session, project_ids: Optional[Iterable[int]] = None) -> List[int]:
+    """Projects whose stored alerts no longer reflect the data, month or age limit."""
+    candidates = _project_ids(db, project_ids)
+    if not candidates:
+        return []
+    versions, global_version = change_log.latest_versions(db)
+    states = {
+        s.project_id: s for s in db.query(models.BufferAlertState).filter(
+            models.BufferAlertState.project_id.in_(candidates)
+        )
+    }
+    current_key = current_month_key()
+    oldest = datetime.utcnow() - MAX_AGE
+    return [
+        pid for pid in candidates
+        if pid not in states
+        or states[pid].month_key != current_key
+        or states[pid].evaluated_at < oldest
+        or states[pid].source_version < max(versions.get(pid, 0), global_version)
+    ]
+
+
+def compute_alerts(db: Session, project_id: int, buffer_cents: int, current_key: Optional[int] = None) -> List[Dict[str, int]]:
+    """Months of the project's forecast below the buffer (amounts in cents)."""
+    report = build_forecast_report(load_forecast_inputs(db, project_id, current_key))
+    alerts = []
+    for row in report:
+        balance = to_cents(row["cumulative_balance"])
+        if balance < buffer_cents:
+            alerts.append({
+                "month_key": parse_month_label(row["date"]),
+                "balance_cents": balance,
+                "buffer_cents": buffer_cents,
+                "shortfall_cents": buffer_cents - balance,
+            })
+    return alerts
+
+
+def evaluate_projects(db: Session, project_ids: List[int]) -> int:
+    """Recompute and store alerts for the given projects. Returns how many were evaluated."""
+    if not project_ids:
+        return 0
+    # Read the version first so changes made while we compute stay pending
+    version = change_log.data_version(db)
+    current_key = current_month_key()
+    buffers = load_cash_buffers(db, project_ids)
+
+    for project_id in project_ids:
+        alerts = compute_alerts(db, project_id, buffers[project_id], current_key)
+        db.query(models.BufferAlert).filter(models.BufferAlert.project_id == project_id).delete(
+            synchronize_session=False
+        )
+        db.add_all(models.BufferAlert(project_id=project_id, **alert) for alert in alerts)
+        db.merge(models.BufferAlertState(
+            project_id=project_id, source_version=version, month_key=current_key,
+            evaluated_at=datetime.utcnow(),
+        ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker evaluated the same projects concurrently
+        db.rollback()
+    return len(project_ids)
+
+
+def refresh_stale(db: Session, project_ids: Optional[Iterable[int]] = None) -> int:
+    return evaluate_projects(db, stale_project_ids(db, project_ids))
+
+
+def read_alerts(db: Session, project_ids: Optional[Iterable[int]] = None, refresh: bool = True) -> List[Dict[str, Any]]:
+    """Stored alerts ordered by project and month, refreshing stale projects first."""
+    if refresh:
+        refresh_stale(db, project_ids)
+    query = db.query(
+        models.BufferAlert.project_id,
+        models.Project.name,
+        models.BufferAlert.month_key,
+        models.BufferAlert.balance_cents,
+        models.BufferAlert.buffer_cents,
+        models.BufferAlert.shortfall_cents,
+    ).join(models.Project, models.Project.id == models.BufferAlert.project_id).filter(
+        models.Project.status.in_(ALERT_STATUSES)
+    )
+    if project_ids is not None:
+        query = query.filter(models.BufferAlert.project_id.in_(list(project_ids)))
+    rows = query.order_by(models.BufferAlert.project_id, models.BufferAlert.month_key).all()
+    return [
+        {
+            "project_id": project_id,
+            "project_name": name,
+            "month": month_label(month),
+            "balance": from_cents(balance),
+            "buffer": from_cents(buffer),
+            "shortfall": from_cents(shortfall),
+        }
+        for project_id, name, month, balance, buffer, shortfall in rows
+    ]
+
+
+class BufferAlertEvaluator:
+    """
+    Background thread that refreshes stale alerts after committed changes
+    (woken through the change log) and at least every `interval` seconds,
+    which also picks up month rollovers and age expiry.
+    """
+
+    def __init__(self, session_factory, interval: float = 300):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _on_change(self, project_ids):
+        self._wake.set()
+
+    def start(self):
+        change_log.add_listener(self._on_change)
+        self._thread = threading.Thread(target=self._run, name="buffer-alerts", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        change_log.remove_listener(self._on_change)
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def run_once(self) -> int:
+        db = self.session_factory()
+        try:
+            return refresh_stale(db)
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Buffer alert evaluation failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
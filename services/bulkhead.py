@@ -0,0 +1,115 @@
+"""
+Bulkhead thread pools: heavy reports cannot starve CRUD endpoints.
+
+FastAPI runs every sync endpoint in one shared threadpool, so a burst of
+portfolio summaries could queue a simple create_payment behind them. Report
+endpoints are decorated with report_pool.offload and run in their own
+bounded pool instead: REPORT_WORKERS threads plus up to REPORT_QUEUE
+waiting requests. Beyond that, or when a request has waited longer than
+REPORT_QUEUE_TIMEOUT seconds for a thread, the request fails with
+BulkheadFull, which the API answers with 503 and Retry-After. The default
+threadpool (CRUD_THREADS threads) is left to everything else.
+
+Settings (environment):
+    REPORT_WORKERS        report threads (default 4)
+    REPORT_QUEUE          report requests allowed to wait (default 16)
+    REPORT_QUEUE_TIMEOUT  seconds a report may wait for a thread (default 10)
+    REPORT_RETRY_AFTER    Retry-After seconds on 503 (default 5)
+    CRUD_THREADS          size of the default threadpool (default 40)
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import anyio.to_thread
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "4"))
+REPORT_QUEUE = int(os.getenv("REPORT_QUEUE", "16"))
+REPORT_QUEUE_TIMEOUT = float(os.getenv("REPORT_QUEUE_TIMEOUT", "10"))
+REPORT_RETRY_AFTER = int(os.getenv("REPORT_RETRY_AFTER", "5"))
+CRUD_THREADS = int(os.getenv("CRUD_THREADS", "40"))
+
+
+class BulkheadFull(Exception):
+    """The pool's threads and queue are taken (or the request waited too long)."""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"The {name} pool is busy, retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """A bounded executor with a bounded queue for one class of endpoints."""
+
+    def __init__(self, name: str, workers: int = REPORT_WORKERS, queue: int = REPORT_QUEUE,
+                 queue_timeout: float = REPORT_QUEUE_TIMEOUT, retry_after: int = REPORT_RETRY_AFTER):
+        self.name = name
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.configure(workers, queue, queue_timeout, retry_after)
+
+    def configure(self, workers: int, queue: int, queue_timeout: Optional[float] = None,
+                  retry_after: Optional[int] = None):
+        """Resize the pool; requests already admitted finish on the old one."""
+        with self._lock:
+            old = self._executor
+            self.workers = workers
+            self.queue = queue
+            if queue_timeout is not None:
+                self.queue_timeout = queue_timeout
+            if retry_after is not None:
+                self.retry_after = retry_after
+            self._slots = threading.BoundedSemaphore(workers + queue)
+            self._executor = None
+        if old is not None:
+            old.shutdown(wait=False)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise BulkheadFull(self.name, self.retry_after)
+        admitted = time.monotonic()
+
+        def task():
+            if time.monotonic() - admitted > self.queue_timeout:
+                raise BulkheadFull(self.name, self.retry_after)
+            return fn(*args, **kwargs)
+        try:
+            future = self._get_executor().submit(task)
+        except BaseException:
+            slots.release()
+            raise
+        # Also releases the slot when a disconnected client cancels a queued request
+        future.add_done_callback(lambda _: slots.release())
+        return await asyncio.wrap_future(future)
+
+    def offload(self, endpoint: Callable) -> Callable:
+        """Decorator: run a sync endpoint in this pool (FastAPI still sees its signature)."""
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            return await self.run(endpoint, *args, **kwargs)
+        return wrapper
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def reserve_crud_threads(threads: int = CRUD_THREADS):
+    """Size the default threadpool that sync CRUD endpoints run in (call inside the event loop)."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+
+
+report_pool = Bulkhead("reports")
@@ -0,0 +1,208 @@
+"""
+Monte Carlo cash-buffer breach probability.
+
+The deterministic forecast says whether a project's cumulative balance
+drops below its cash buffer. This module asks how likely that is: it
+samples collection delays and cost overruns from our own history of plans
+versus actual transactions, replays the forecast thousands of times per
+project as (path x month) matrices (see scenario_service.balance_paths),
+and reports per-month breach probabilities and percentile balance bands.
+
+Projects are simulated in parallel through services/process_pool.py (with
+REPORT_PROCESSES > 0). Workers only get the compact ForecastInputs and the
+fitted samples, never a database session.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import models
+from services import process_pool
+from services.forecast_service import ForecastInputs, load_forecast_inputs
+from services.ledger_snapshot import get_ledger, group_sum, INCOME
+from services.money import to_cents, from_cents, sum_cents
+from services.periods import current_month_key, month_index, month_from_index, month_label
+from services.scenario_service import balance_paths
+
+DEFAULT_CASH_BUFFER = 200000
+DEFAULT_PATHS = 2000
+PERCENTILES = (5, 25, 50, 75, 95)
+MAX_OVERRUN = 3.0
+
+
+def load_cash_buffers(db: Session, project_ids=None) -> Dict[int, int]:
+    """project_id -> cash buffer in cents (projects without a setting, or with an empty one, get the default)."""
+    query = db.query(models.ProjectSetting.project_id, models.ProjectSetting.cash_buffer_amount)
+    if project_ids is not None:
+        query = query.filter(models.ProjectSetting.project_id.in_(project_ids))
+    # An explicit 0 is a real setting (no buffer), as in the original per-project cash-flow check
+    buffers = {pid: to_cents(amount) for pid, amount in query.all() if amount is not None}
+    if project_ids is not None:
+        for pid in project_ids:
+            buffers.setdefault(pid, to_cents(DEFAULT_CASH_BUFFER))
+    return buffers
+
+
+def cash_buffer_cents(db: Session, project_id: int) -> int:
+    return load_cash_buffers(db, [project_id])[project_id]
+
+
+# ---------------------------------------------------------
+# Distributions fitted to history
+# ---------------------------------------------------------
+
+@dataclass
+class RiskHistory:
+    """Empirical samples the simulation draws from (bootstrap)."""
+    collection_delays: np.ndarray  # months, per past customer payment plan
+    cost_overruns: np.ndarray      # actual / planned, per budget category with past plans
+
+
+def fit_collection_delays(db: Session, current_key: Optional[int] = None) -> np.ndarray:
+    """
+    Delay in months between each past customer payment plan and the
+    amount-weighted month its phase was actually collected. Plans that are
+    overdue and still uncollected count with their delay so far.
+    """
+    current_key = current_key or current_month_key()
+    current_idx = month_index(current_key)
+    ledger = get_ledger(db)
+
+    mask = (ledger.type_code == INCOME) & (ledger.phase_id != 0) & (ledger.month_key != 0)
+    projects, phases, months, sums = group_sum(
+        ledger.amount_cents[mask], ledger.project_id[mask], ledger.phase_id[mask], ledger.month_key[mask]
+    )
+    weighted = {}
+    month_idx = month_index(months.astype(np.int64))
+    for project_id, phase_id, idx, amount in zip(projects.tolist(), phases.tolist(), month_idx.tolist(), sums.tolist()):
+        totals = weighted.setdefault((project_id, phase_id), [0, 0])
+        totals[0] += idx * amount
+        totals[1] += amount
+
+    Plan = models.CustomerPaymentPlan
+    plans = db.query(Plan.project_id, Plan.phase_id, Plan.month_key).filter(
+        Plan.month_key < current_key, Plan.phase_id.isnot(None), Plan.value_cents > 0
+    ).all()
+
+    delays = []
+    for project_id, phase_id, plan_month in plans:
+        totals = weighted.get((project_id, phase_id))
+        if totals and totals[1] > 0:
+            collected_idx = totals[0] / totals[1]
+        else:
+            collected_idx = current_idx
+        delays.append(round(collected_idx - month_index(plan_month)))
+    return np.array(delays, dtype=np.int64)
+
+
+def fit_cost_overruns(db: Session, current_key: Optional[int] = None) -> np.ndarray:
+    """
+    actual / planned spend per budget category over the months already
+    planned. Underspend is treated as timing, not savings, so the ratio is
+    floored at 1 (and capped at MAX_OVERRUN against data errors).
+    """
+    current_key = current_key or current_month_key()
+    ledger = get_ledger(db)
+    mask = ledger.executed & (ledger.budget_item_id != 0) & (ledger.month_key != 0) & (ledger.month_key < current_key)
+    items, sums = group_sum(ledger.amount_cents[mask], ledger.budget_item_id[mask])
+    actual = dict(zip(items.tolist(), sums.tolist()))
+
+    BP = models.BudgetPlan
+    planned = db.query(BP.budget_category_id, sum_cents(BP.amount_cents)).filter(
+        BP.month_key < current_key
+    ).group_by(BP.budget_category_id).all()
+
+    ratios = [actual.get(cat_id, 0) / amount for cat_id, amount in planned if amount > 0]
+    return np.clip(np.array(ratios, dtype=np.float64), 1.0, MAX_OVERRUN)
+
+
+def fit_risk_history(db: Session, current_key: Optional[int] = None) -> RiskHistory:
+    return RiskHistory(
+        collection_delays=fit_collection_delays(db, current_key),
+        cost_overruns=fit_cost_overruns(db, current_key),
+    )
+
+
+# ---------------------------------------------------------
+# Simulation
+# ---------------------------------------------------------
+
+def simulate_breach_risk(inputs: ForecastInputs, buffer_cents: int, history: RiskHistory,
+                         paths: int = DEFAULT_PATHS, seed=None) -> Dict[str, Any]:
+    """
+    Simulate `paths` forecasts of one project. Every open collection gets
+    its own sampled delay; every budget category gets one sampled overrun
+    factor applied to all of its remaining plans.
+    """
+    rng = np.random.default_rng(seed)
+    delays = history.collection_delays if history.collection_delays.size else np.zeros(1, dtype=np.int64)
+    overruns = history.cost_overruns if history.cost_overruns.size else np.ones(1)
+
+    categories = np.array([c for c, _, _ in inputs.planned_expense], dtype=np.int64)
+    unique_categories, category_pos = np.unique(categories, return_inverse=True)
+    income_shift = rng.choice(delays, size=(paths, len(inputs.planned_income)))
+    expense_factor = rng.choice(overruns, size=(paths, len(unique_categories)))[:, category_pos.reshape(-1)]
+
+    first, _, _, _, cumulative = balance_paths(inputs, income_shift, 1.0, 0, expense_factor)
+
+    # Only the current month onward is uncertain; history is the opening balance
+    future = cumulative[:, month_index(inputs.current_month) - first:]
+    below = future < buffer_cents
+    bands = np.percentile(future, PERCENTILES, axis=0)
+    months = [month_label(month_from_index(month_index(inputs.current_month) + i)) for i in range(future.shape[1])]
+
+    return {
+        "months": months,
+        "breach_probability": [round(p, 4) for p in below.mean(axis=0).tolist()],
+        "any_breach_probability": round(float(below.any(axis=1).mean()), 4),
+        "balance_bands": {
+            f"p{pct}": [from_cents(int(round(v))) for v in band.tolist()]
+            for pct, band in zip(PERCENTILES, bands)
+        },
+    }
+
+
+def _simulate_job(job):
+    project_id, inputs, buffer_cents, history, paths, seed = job
+    return project_id, simulate_breach_risk(inputs, buffer_cents, history, paths, seed)
+
+
+def run_breach_risk(db: Session, projects: List[models.Project], paths: int = DEFAULT_PATHS,
+                    seed: Optional[int] = None, parallel: bool = True) -> Dict[str, Any]:
+    """
+    Breach risk for several projects. Inputs and history are loaded here,
+    the simulations run in the report process pool (inline for a single
+    project, or when it has no processes).
+    Each project's random stream derives from (seed, project_id), so a run
+    can be reproduced by passing back the returned seed.
+    """
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2**32)
+    current_key = current_month_key()
+    history = fit_risk_history(db, current_key)
+    buffers = load_cash_buffers(db, [p.id for p in projects])
+
+    jobs = [
+        (p.id, load_forecast_inputs(db, p.id, current_key), buffers[p.id], history, paths,
+         np.random.SeedSequence([seed, p.id]))
+        for p in projects
+    ]
+    if parallel:
+        results = dict(process_pool.map_reports(_simulate_job, jobs))
+    else:
+        results = dict(map(_simulate_job, jobs))
+
+    return {
+        "paths": paths,
+        "seed": seed,
+        "history": {
+            "collection_delay_samples": int(history.collection_delays.size),
+            "cost_overrun_samples": int(history.cost_overruns.size),
+        },
+        "projects": [
+            {"id": p.id, "name": p.name, "buffer": from_cents(buffers[p.id]), **results[p.id]}
+            for p in projects
+        ],
+    }
@@ -0,0 +1,61 @@
+"""
+Account -> budget category mappings (last category used per account).
+
+Mappings are upserted with a single INSERT ... ON CONFLICT DO UPDATE on the
+(account_id, budget_category_id) unique index, inside the caller's
+transaction, so a ledger write and its mapping commit together.
+"""
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from services.suggestion_index import record_mapping_uses
+
+_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+_statements = {}
+
+
+def _upsert_statement(dialect_name: str):
+    """Compiled-once upsert; rows are passed as executemany parameters."""
+    stmt = _statements.get(dialect_name)
+    if stmt is None:
+        insert = _INSERTS[dialect_name](models.AccountCategoryMapping)
+        stmt = _statements[dialect_name] = insert.on_conflict_do_update(
+            index_elements=["account_id", "budget_category_id"],
+            set_={"last_used": insert.excluded.last_used},
+        )
+    return stmt
+
+
+def upsert_account_category_mappings(db: Session, pairs: Iterable[Tuple[int, int]],
+                                     used_at: Optional[datetime] = None) -> int:
+    """
+    Upsert (account_id, budget_category_id) pairs in one executemany. Pairs
+    with a missing side are skipped. Does not commit. Returns the number of
+    distinct pairs written.
+    """
+    used_at = used_at or datetime.now()
+    rows = [
+        {"account_id": account_id, "budget_category_id": category_id, "last_used": used_at}
+        for account_id, category_id in dict.fromkeys(pairs)
+        if account_id and category_id
+    ]
+    if rows:
+        record_mapping_uses(db, [(r["account_id"], r["budget_category_id"]) for r in rows], used_at)
+        db.execute(_upsert_statement(db.get_bind().dialect.name), rows)
+    return len(rows)
+
+
+def upsert_account_category_mapping(db: Session, tx, used_at: Optional[datetime] = None):
+    """Upsert the mapping of one transaction (to_account_id -> budget_item_id). Does not commit."""
+    upsert_account_category_mappings(db, [(tx.to_account_id, tx.budget_item_id)], used_at)
+
+
+def mapping_pairs(transactions) -> Iterable[Tuple[int, int]]:
+    return ((tx.to_account_id, tx.budget_item_id) for tx in transactions)
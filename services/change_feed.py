@@ -0,0 +1,341 @@
+"""
+Change notifications for Server-Sent Events subscribers.
+
+Every worker writes change_events rows in the same transaction as the data
+(see services/change_log.py), so the table already is a shared, ordered
+log. Each process runs one ChangeFeed per engine that tails it by id while
+anyone is subscribed, and fans the new rows out to its local subscribers.
+Commits made in the same process wake the feed immediately; other workers'
+commits are seen within POLL_INTERVAL. No broker or socket is involved.
+
+A notification is compact: the change id (the new data version), project,
+entity, earliest month touched and the dashboard sections that read that
+entity, so clients refetch only what changed. Events for the same
+(project, entity) in one poll are coalesced into the latest one.
+
+The SSE id of each message is a resume point: every change up to it has
+been sent. A client reconnecting with Last-Event-ID gets what it missed,
+or a single `reset` event when that is more than REPLAY_LIMIT events or
+reaches past a change log compaction; it should then refetch everything.
+
+On SQLite ids are assigned and committed in order, so the resume point is
+simply the last id read. PostgreSQL sequences can commit out of order: a
+lower id may become visible after a higher one. There the feed keeps
+re-reading ids above its cursor, delivers each id once, and only moves the
+cursor past events older than CHANGE_FEED_SETTLE seconds, so a transaction
+that commits within that time after its flush is never skipped.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, sessionmaker
+
+import models
+from services import change_log
+from services.engine_registry import PerEngine
+
+POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL", "1.0"))  # seconds
+BATCH_SIZE = 500
+REPLAY_LIMIT = 500  # events replayed to a client reconnecting with Last-Event-ID; more means reset
+# Seconds a flushed change event may take to commit on databases with out-of-order ids
+CHANGE_FEED_SETTLE = float(os.getenv("CHANGE_FEED_SETTLE", "30"))
+HEARTBEAT_SECONDS = 15.0
+# Streams end after this long; EventSource reconnects with Last-Event-ID, which
+# keeps connections from outliving worker restarts and proxy idle limits
+STREAM_SECONDS = float(os.getenv("CHANGE_FEED_STREAM_SECONDS", "300"))
+RETRY_MS = 2000
+
+# Dashboard sections (services/dashboard_service.py) that read each entity
+ALL_SECTIONS = ["kpi", "cash_flow", "budget", "budget_timeline"]
+SECTIONS_BY_ENTITY = {
+    "transaction": ALL_SECTIONS,
+    "payment_plan": ["kpi", "cash_flow"],
+    "budget_category": ALL_SECTIONS,
+    "budget_plan": ["kpi", "cash_flow", "budget_timeline"],
+    "apartment": ["kpi"],
+    "customer_payment": ["kpi"],
+    "project_setting": [],
+    "project": ALL_SECTIONS,
+    "account": ["kpi", "cash_flow"],
+    "account_type": ["kpi", "cash_flow"],
+}
+
+
+def to_notification(row) -> Dict:
+    change_id, project_id, entity, month_key = row[:4]
+    return {
+        "id": change_id,
+        "project_id": project_id,
+        "entity": entity,
+        "month_key": month_key,
+        "sections": SECTIONS_BY_ENTITY.get(entity, ALL_SECTIONS),
+    }
+
+
+def coalesce(notifications: List[Dict]) -> List[Dict]:
+    """Keep the latest notification per (project, entity), in id order."""
+    latest = {}
+    for n in notifications:
+        latest[(n["project_id"], n["entity"])] = n
+    return sorted(latest.values(), key=lambda n: n["id"])
+
+
+def _rows_after(db: Session, after_id: int, limit: int):
+    Event = models.ChangeEvent
+    return db.query(Event.id, Event.project_id, Event.entity, Event.month_key, Event.created_at).filter(
+        Event.id > after_id
+    ).order_by(Event.id).limit(limit).all()
+
+
+def replay(db: Session, after_id: int, project_id: Optional[int] = None) -> Optional[List[Dict]]:
+    """
+    Notifications after a given change id (for reconnecting clients),
+    coalesced; None when they cannot all be replayed (too many, or some
+    were compacted away) and the client has to start over.
+    """
+    rows = _rows_after(db, after_id, REPLAY_LIMIT + 1)
+    if len(rows) > REPLAY_LIMIT or any(row[2] == change_log.COMPACTED for row in rows):
+        return None
+    notifications = [to_notification(row) for row in rows]
+    return coalesce([n for n in notifications if matches(n, project_id)])
+
+
+def matches(notification: Dict, project_id: Optional[int]) -> bool:
+    # Global changes (project_id NULL) concern every project
+    return project_id is None or notification["project_id"] in (project_id, None)
+
+
+class Subscription:
+    """One SSE client: an asyncio queue fed from the feed thread."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, project_id: Optional[int]):
+        self.loop = loop
+        self.project_id = project_id
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def deliver(self, notifications: List[Dict], resume_id: int):
+        wanted = [n for n in notifications if matches(n, self.project_id)]
+        if wanted:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (wanted, resume_id))
+
+
+class ChangeFeed:
+    """
+    Tails change_events while there are subscribers and fans rows out to
+    them. _last_id is the cursor: no event at or below it can still appear.
+    Events above it that were already delivered are remembered in _seen
+    until the cursor passes them (only with settle > 0).
+    """
+
+    def __init__(self, session_factory, interval: float = POLL_INTERVAL, settle: float = 0.0):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.settle = settle
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()  # one poll at a time keeps _seen consistent
+        self._subscribers: List[Subscription] = []
+        self._last_id: Optional[int] = None
+        self._seen: Set[int] = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _on_change(self, project_ids):
+        self._wake.set()
+
+    def subscribe(self, subscription: Subscription) -> int:
+        """Register a subscriber; returns the change id after which it receives every event."""
+        with self._lock:
+            if self._last_id is None or not self._subscribers:
+                # Idle until now: start from the present
+                self._last_id, self._seen = self._present()
+            self._subscribers.append(subscription)
+            if self._thread is None:
+                change_log.add_listener(self._on_change)
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+                self._thread.start()
+            return self._last_id
+
+    def open(self, subscription: Subscription, last_event_id: Optional[int]) -> Tuple[int, Optional[List[Dict]]]:
+        """
+        subscribe() plus the events a reconnecting client missed since
+        last_event_id ([] for a new client, None when it must reset).
+        """
+        start_id = self.subscribe(subscription)
+        if last_event_id is None:
+            return start_id, []
+        db = self.session_factory()
+        try:
+            return start_id, replay(db, last_event_id, subscription.project_id)
+        finally:
+            db.close()
+
+    def _present(self) -> Tuple[int, Set[int]]:
+        """(cursor, ids above it) for the events that exist now."""
+        db = self.session_factory()
+        try:
+            max_id = db.query(func.max(models.ChangeEvent.id)).scalar() or 0
+            if not self.settle:
+                return max_id, set()
+            E = models.ChangeEvent
+            recent = [i for (i,) in db.query(E.id).filter(E.created_at > self._settled_before())]
+            cursor = min(recent) - 1 if recent else max_id
+            return cursor, {i for (i,) in db.query(E.id).filter(E.id > cursor)}
+        finally:
+            db.close()
+
+    def _settled_before(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.settle)
+
+    def _advance(self, rows) -> int:
+        """Move the cursor over the leading rows nothing can still commit below."""
+        cursor = self._last_id
+        settled_before = self._settled_before() if self.settle else None
+        for row in rows:
+            created_at = row[4]
+            if settled_before is not None and created_at is not None and created_at > settled_before:
+                break
+            cursor = row[0]
+        return cursor
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def poll_once(self) -> List[Dict]:
+        """Read new change_events and deliver them; returns what was delivered."""
+        with self._poll_lock:
+            return self._poll()
+
+    def _poll(self) -> List[Dict]:
+        if not self.subscriber_count:
+            return []
+        db = self.session_factory()
+        try:
+            rows = _rows_after(db, self._last_id, BATCH_SIZE)
+        finally:
+            db.close()
+        if not rows:
+            return []
+        # Compaction markers only matter to replays; live clients missed nothing
+        fresh = [row for row in rows if row[0] not in self._seen and row[2] != change_log.COMPACTED]
+        notifications = coalesce([to_notification(row) for row in fresh])
+        with self._lock:
+            self._last_id = cursor = self._advance(rows)
+            if self.settle:
+                self._seen = {i for i in self._seen.union(row[0] for row in rows) if i > cursor}
+            subscribers = list(self._subscribers)
+        if notifications:
+            for subscription in subscribers:
+                subscription.deliver(notifications, cursor)
+        return notifications
+
+    def stop(self):
+        with self._lock:
+            self._subscribers.clear()
+        change_log.remove_listener(self._on_change)
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Change feed poll failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def sse_message(data: Dict, event: str = "change", event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(feed: ChangeFeed, subscription: Subscription, start_id: int, backlog: Optional[List[Dict]],
+                       is_disconnected=None, since: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    SSE body: a `ready` event carrying the current version, then the events
+    missed since `since` (or a `reset` event when backlog is None), then
+    live notifications and heartbeats until STREAM_SECONDS elapse or the
+    client goes away. Every change is sent once per stream.
+    """
+    deadline = time.monotonic() + STREAM_SECONDS
+    sent: Set[int] = set()
+
+    def send(notification: Dict, resume_id: int) -> Optional[str]:
+        if notification["id"] in sent:
+            return None
+        sent.add(notification["id"])
+        return sse_message(notification, event_id=min(notification["id"], resume_id))
+
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        if backlog is None:
+            yield sse_message({"version": start_id}, event="ready", event_id=start_id)
+            yield sse_message({"version": start_id}, event="reset", event_id=start_id)
+            backlog = []
+        else:
+            # Until the backlog is through, a reconnect must resume from where the client was
+            resume_from = since if backlog and since is not None else start_id
+            yield sse_message({"version": start_id}, event="ready", event_id=resume_from)
+        for notification in backlog:
+            message = send(notification, start_id)
+            if message:
+                yield message
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                batch, resume_id = await asyncio.wait_for(subscription.queue.get(), min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                if is_disconnected is not None and await is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for notification in batch:
+                message = send(notification, resume_id)
+                if message:
+                    yield message
+    finally:
+        feed.unsubscribe(subscription)
+
+
+def _new_feed(bind) -> ChangeFeed:
+    settle = 0.0 if bind.dialect.name == "sqlite" else CHANGE_FEED_SETTLE
+    return ChangeFeed(sessionmaker(bind=bind), settle=settle)
+
+
+# Dropped feeds are stopped, so their threads do not outlive them
+_feeds: PerEngine[ChangeFeed] = PerEngine(_new_feed, on_drop=ChangeFeed.stop)
+
+
+def get_feed(db: Session) -> ChangeFeed:
+    """The feed for the database behind this session (created on first use)."""
+    return _feeds.for_session(db)
+
+
+def stop_all():
+    for feed in _feeds.values():
+        feed.stop()
@@ -0,0 +1,215 @@
+"""
+Change log of report inputs.
+
+Every ORM flush that touches a forecast/report input writes one
+change_events row per (project, entity) in the same transaction, with the
+earliest month touched. The latest event id is a cheap data version:
+precomputed reports remember the version they were built from and are
+stale once a newer event exists for their project (or a global one, e.g.
+an account change, with project_id NULL).
+
+Events whose rows were all inserted are flagged inserts_only, so caches
+that can append new rows (the ledger snapshot) only rebuild on edits and
+deletes.
+
+Events older than CHANGE_LOG_RETENTION are compacted away, except the
+latest one per (project, entity), so the latest version of every project
+and entity is kept and the table stays small. Each compaction that removes
+rows logs a global "compacted" event: consumers holding a version older
+than the removed events see a newer global change and rebuild, the same
+as after any change they can no longer inspect.
+
+Rows written with raw SQL are not tracked; consumers should also expire
+their results by age.
+
+Settings (environment):
+    CHANGE_LOG_RETENTION_DAYS    days of events kept in full (default 7)
+    CHANGE_LOG_COMPACT_INTERVAL  seconds between compactions (default 3600, 0 = off)
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+import models
+
+CHANGE_LOG_RETENTION = timedelta(days=float(os.getenv("CHANGE_LOG_RETENTION_DAYS", "7")))
+CHANGE_LOG_COMPACT_INTERVAL = float(os.getenv("CHANGE_LOG_COMPACT_INTERVAL", "3600"))
+
+# Entity of the global event logged when older events were removed
+COMPACTED = "compacted"
+
+# model -> (entity name, how to find its project)
+_TRACKED = {
+    models.Transaction: ("transaction", "project_id"),
+    models.CustomerPaymentPlan: ("payment_plan", "project_id"),
+    models.BudgetCategory: ("budget_category", "project_id"),
+    models.BudgetPlan: ("budget_plan", "budget_category_id"),
+    models.Apartment: ("apartment", "project_id"),
+    models.CustomerPayment: ("customer_payment", "apartment_id"),
+    models.ProjectSetting: ("project_setting", "project_id"),
+    models.Project: ("project", "id"),
+    models.Account: ("account", None),
+    models.AccountType: ("account_type", None),
+}
+
+# Entities that can change the ledger's past actuals (accounts can flip an untyped row's direction;
+# a compaction may have removed such events)
+LEDGER_ENTITIES = ("transaction", "account", "account_type", COMPACTED)
+
+_listeners: List[Callable[[Set[Optional[int]]], None]] = []
+
+
+def add_listener(callback: Callable[[Set[Optional[int]]], None]):
+    """Call callback(project_ids) in this process after a commit that logged changes."""
+    _listeners.append(callback)
+
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def data_version(db: Session, project_id: Optional[int] = None) -> int:
+    """Latest change id affecting a project (or anything, without project_id)."""
+    query = db.query(func.max(models.ChangeEvent.id))
+    if project_id is not None:
+        query = query.filter(or_(
+            models.ChangeEvent.project_id == project_id,
+            models.ChangeEvent.project_id.is_(None),
+        ))
+    return query.scalar() or 0
+
+
+def latest_versions(db: Session) -> Tuple[Dict[int, int], int]:
+    """({project_id: latest change id}, latest global change id) in one query."""
+    rows = db.query(models.ChangeEvent.project_id, func.max(models.ChangeEvent.id)).group_by(
+        models.ChangeEvent.project_id
+    ).all()
+    versions = dict(rows)
+    return versions, versions.pop(None, 0) or 0
+
+
+def compact(db: Session, retention: timedelta = CHANGE_LOG_RETENTION, now: Optional[datetime] = None) -> int:
+    """Delete events older than retention except the latest per (project, entity); returns rows removed."""
+    E = models.ChangeEvent
+    cutoff = (now or datetime.utcnow()) - retention
+    latest = select(func.max(E.id)).group_by(E.project_id, E.entity)
+    removed = db.query(E).filter(E.created_at < cutoff, E.id.notin_(latest)).delete(synchronize_session=False)
+    if removed:
+        db.add(E(project_id=None, entity=COMPACTED))
+        db.info.setdefault("changed_projects", set()).add(None)
+    db.commit()
+    return removed
+
+
+class ChangeLogCompactor:
+    """Background thread that compacts the change log every `interval` seconds."""
+
+    def __init__(self, session_factory, interval: float = CHANGE_LOG_COMPACT_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="change-log-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def run_once(self) -> int:
+        db = self.session_factory()
+        try:
+            return compact(db)
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Change log compaction failed: {e}")
+            self._stop.wait(self.interval)
+
+
+def _loaded(obj, name):
+    # Never trigger a lazy load mid-flush (deleted rows may be gone already)
+    return inspect(obj).dict.get(name)
+
+
+def _current_and_previous(obj, name):
+    """Loaded value of an attribute plus any value it had before this flush."""
+    values = [_loaded(obj, name)]
+    values += list(inspect(obj).attrs[name].history.deleted)
+    return values
+
+
+@event.listens_for(Session, "after_flush")
+def _log_changes(session, flush_context):
+    touched = []  # (entity, owner attr, owner id, month key or None, inserted)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tracked = _TRACKED.get(type(obj))
+        if tracked is None:
+            continue
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        entity, owner = tracked
+        owner_ids = set(_current_and_previous(obj, owner)) if owner else {None}
+        if hasattr(type(obj), "month_key"):
+            months = [m for m in _current_and_previous(obj, "month_key") if m] or [None]
+        else:
+            months = [None]
+        inserted = obj in session.new
+        touched += [(entity, owner, owner_id, month, inserted) for owner_id in owner_ids for month in months]
+    if not touched:
+        return
+
+    # Budget plans and customer payments reach their project through a parent row
+    connection = session.connection()
+    parents = {
+        "budget_category_id": models.BudgetCategory,
+        "apartment_id": models.Apartment,
+    }
+    owners = {}
+    for owner, parent in parents.items():
+        ids = {oid for _, attr, oid, _, _ in touched if attr == owner and oid}
+        if ids:
+            owners[owner] = dict(connection.execute(
+                select(parent.id, parent.project_id).where(parent.id.in_(ids))
+            ).all())
+
+    months_by_slot = {}
+    inserts_by_slot = {}
+    for entity, owner, owner_id, month, inserted in touched:
+        project_id = owners[owner].get(owner_id) if owner in owners else owner_id
+        months_by_slot.setdefault((project_id, entity), []).append(month)
+        inserts_by_slot[(project_id, entity)] = inserts_by_slot.get((project_id, entity), True) and inserted
+
+    connection.execute(insert(models.ChangeEvent), [
+        # None means "not month-specific", which covers every month
+        {"project_id": project_id, "entity": entity, "month_key": None if None in months else min(months),
+         "inserts_only": inserts_by_slot[(project_id, entity)]}
+        for (project_id, entity), months in months_by_slot.items()
+    ])
+    session.info.setdefault("changed_projects", set()).update(p for p, _ in months_by_slot)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify(session):
+    projects = session.info.pop("changed_projects", None)
+    if projects:
+        for callback in list(_listeners):
+            callback(projects)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("changed_projects", None)
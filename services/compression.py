@@ -0,0 +1,132 @@
+"""
+Negotiated response compression (brotli / gzip).
+
+Responses of a compressible type (JSON, text) at or above COMPRESS_MIN_SIZE
+bytes are compressed with the best encoding the client accepts: brotli
+when the optional `brotli` package is installed, otherwise gzip. Levels
+are tuned for dynamic responses rather than maximum ratio. Responses that
+already carry a Content-Encoding (e.g. precompressed cached reports) and
+streamed responses pass through untouched.
+
+Settings (environment):
+    COMPRESS_MIN_SIZE  smallest body to compress, in bytes (default 1024)
+    GZIP_LEVEL         1-9 (default 6)
+    BROTLI_QUALITY     0-11 (default 5)
+"""
+import gzip
+import os
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+SKIPPED_TYPES = ("text/event-stream",)
+
+
+def supported_encodings():
+    """Encodings this process can produce, best first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type or content_type.startswith(SKIPPED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if not vary:
+        headers["vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete (non-streamed) response bodies."""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = COMPRESS_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending = {"start": None}
+
+        async def send_wrapper(message):
+            start = pending["start"]
+            if message["type"] == "http.response.start":
+                pending["start"] = message  # held until the body is known
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            pending["start"] = None
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+                or len(body) < self.minimum_size
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(compressed))
+            add_vary(headers)
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,417 @@
+"""
+Project dashboard sections: KPI summary, cash flow, budget and budget timeline.
+
+Each section used to be its own endpoint that reloaded the project's
+categories and transactions, and the KPI summary ran the full cash-flow
+forecast again. Here the data a set of sections needs is loaded once, in
+one session, into a DashboardData; the sections are then built from it as
+pure functions, concurrently when more than one is requested. The single
+section endpoints use the same builders, so their payloads are identical.
+
+Without the cash_flow section the KPI summary only loads next month's
+forecast row (forecast_service.forecast_months).
+
+The composite endpoint isolates failures per section: a section whose data
+failed to load or whose builder raised comes back as null, with its error
+message under "errors", and the other sections are served as usual. The
+single section endpoints still fail as a whole.
+"""
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+from services import budget_report_service, forecast_service
+from services.ledger_archive import ledger_rows
+from services.ledger_snapshot import LedgerColumns, executed_by_budget_item, get_ledger, group_sum
+from services.money import from_cents, sum_cents, to_cents
+from services.periods import add_months, current_month_key, month_label
+
+SECTIONS = ("kpi", "cash_flow", "budget", "budget_timeline")
+DASHBOARD_WORKERS = int(os.getenv("DASHBOARD_WORKERS", "4"))
+
+# Which loaded data each section reads
+_NEEDS = {
+    "kpi": {"apartments", "ledger", "next_month"},
+    "cash_flow": {"forecast"},
+    "budget": {"budget_actuals"},
+    "budget_timeline": {"ledger", "timeline"},
+}
+
+
+@dataclass
+class DashboardData:
+    """Everything the dashboard sections read, loaded once per request."""
+    project_id: int
+    # (id, category_name, planned_amount) in table order
+    categories: List[Tuple[int, Optional[str], Optional[float]]] = field(default_factory=list)
+    ledger: Optional[LedgerColumns] = None
+    forecast: Optional[List[Dict[str, Any]]] = None
+    # Next month's forecast row alone, when the full forecast is not needed
+    next_month: Optional[List[Dict[str, Any]]] = None
+    forecast_error: Optional[Exception] = None
+    # (sale price cents or None, paid cents) per apartment
+    apartments: List[Tuple[Optional[int], int]] = field(default_factory=list)
+    budget_actuals: list = field(default_factory=list)
+    # category id -> {month label: planned cents}
+    planned_by_month: Dict[int, Dict[str, int]] = field(default_factory=dict)
+    # lower(category) -> {month label: executed cents}, for categories matched by name
+    actual_by_name: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # need -> error raised while loading it (fails only the sections that read it)
+    load_errors: Dict[str, Exception] = field(default_factory=dict)
+
+
+def parse_sections(value: Optional[str]) -> List[str]:
+    """'kpi,cash_flow' -> ['kpi', 'cash_flow'] (all sections when empty); ValueError on unknown names."""
+    if not value:
+        return list(SECTIONS)
+    sections = []
+    for name in (part.strip() for part in value.split(",")):
+        if not name:
+            continue
+        if name not in SECTIONS:
+            raise ValueError(f"Unknown dashboard section '{name}'. Valid sections: {', '.join(SECTIONS)}")
+        if name not in sections:
+            sections.append(name)
+    return sections or list(SECTIONS)
+
+
+@contextmanager
+def _loading(data: DashboardData, need: str):
+    try:
+        yield
+    except Exception as e:
+        data.load_errors[need] = e
+
+
+def load_dashboard_data(db: Session, project_id: int, sections: Iterable[str]) -> DashboardData:
+    needs = set().union(*(_NEEDS[s] for s in sections))
+    data = DashboardData(project_id=project_id)
+    Cat = models.BudgetCategory
+    data.categories = db.query(Cat.id, Cat.category_name, Cat.planned_amount).filter(
+        Cat.project_id == project_id
+    ).all()
+
+    if "ledger" in needs:
+        with _loading(data, "ledger"):
+            data.ledger = get_ledger(db)
+
+    if "forecast" in needs:
+        try:
+            data.forecast = forecast_service.generate_cash_flow_forecast(db, project_id)
+        except Exception as e:  # the KPI summary tolerates a failed forecast
+            data.forecast_error = e
+    elif "next_month" in needs:
+        next_key = add_months(current_month_key(), 1)
+        try:
+            data.next_month = forecast_service.forecast_months(db, project_id, next_key, next_key)
+        except Exception as e:
+            data.forecast_error = e
+
+    if "apartments" in needs:
+        with _loading(data, "apartments"):
+            _load_apartments(db, data)
+
+    if "budget_actuals" in needs:
+        with _loading(data, "budget_actuals"):
+            data.budget_actuals = budget_report_service.load_budget_actuals(db, project_id)
+
+    if "timeline" in needs and data.categories:
+        with _loading(data, "timeline"):
+            _load_timeline(db, data)
+
+    return data
+
+
+def _load_apartments(db: Session, data: DashboardData):
+    Apt, Pay = models.Apartment, models.CustomerPayment
+    paid = db.query(Pay.apartment_id, sum_cents(Pay.amount_cents).label("paid")).group_by(
+        Pay.apartment_id
+    ).subquery()
+    rows = db.query(Apt.sale_price, func.coalesce(paid.c.paid, 0)).outerjoin(
+        paid, paid.c.apartment_id == Apt.id
+    ).filter(Apt.project_id == data.project_id).order_by(Apt.id).all()
+    data.apartments = [(to_cents(price), paid_cents) for price, paid_cents in rows]
+
+
+def _load_timeline(db: Session, data: DashboardData):
+    BP = models.BudgetPlan
+    planned_rows = db.query(BP.budget_category_id, BP.month_key, sum_cents(BP.amount_cents)).filter(
+        BP.budget_category_id.in_([c[0] for c in data.categories]),
+        BP.month_key.isnot(None),
+    ).group_by(BP.budget_category_id, BP.month_key).all()
+    planned_by_month = defaultdict(dict)
+    for cat_id, month, amount in planned_rows:
+        planned_by_month[cat_id][month_label(month)] = amount
+    data.planned_by_month = dict(planned_by_month)
+
+    # Name-matched actuals for the fallback, for every category name at once
+    names = {name.strip().lower() for _, name, _ in data.categories if name}
+    if names:
+        rows = ledger_rows().c
+        lowered = func.lower(rows.category)
+        name_rows = db.query(lowered, rows.month_key, sum_cents(rows.amount_cents)).filter(
+            rows.project_id == data.project_id,
+            rows.transaction_type == 1,
+            rows.month_key.isnot(None),
+            lowered.in_(names),
+        ).group_by(lowered, rows.month_key).all()
+        actual_by_name = defaultdict(dict)
+        for name, month, amount in name_rows:
+            actual_by_name[name][month_label(month)] = amount
+        data.actual_by_name = dict(actual_by_name)
+
+
+# --- Section builders (pure functions of DashboardData) ---
+
+def build_kpi_summary(data: DashboardData, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Collection, budget health and next month projection."""
+    total_revenue = 0  # cents
+    total_collected = 0  # cents
+    fully_paid = 0
+    outstanding = 0
+    for sale_price, paid in data.apartments:
+        sale_price = sale_price or 0
+        total_revenue += sale_price
+        total_collected += paid
+        if sale_price > 0 and paid >= sale_price:
+            fully_paid += 1
+        elif sale_price > 0:
+            outstanding += 1
+
+    collection_percent = (total_collected / total_revenue * 100) if total_revenue > 0 else 0
+
+    # Budget health: every executed transaction booked to one of the project's
+    # categories counts, whatever its own project_id (as in the portfolio summary)
+    executed_by_item = executed_by_budget_item(data.ledger)
+
+    categories_ok = 0
+    categories_warning = 0
+    categories_over = 0
+    worst_category = None
+    worst_overrun = 0
+    total_budget = 0
+    total_actual_spent = 0
+
+    for cat_id, cat_name, planned in data.categories:
+        planned = float(planned) if planned else 0
+        total_budget += planned
+        if planned <= 0:
+            continue
+        cat_actual = from_cents(executed_by_item.get(cat_id, 0))
+        total_actual_spent += cat_actual
+        cat_progress = (cat_actual / planned * 100) if planned > 0 else 0
+
+        if cat_progress > 100:
+            categories_over += 1
+            overrun = cat_actual - planned
+            if overrun > worst_overrun:
+                worst_overrun = overrun
+                worst_category = {"name": cat_name, "progress": round(cat_progress, 1), "overrun": round(overrun, 2)}
+        elif cat_progress > 90:
+            categories_warning += 1
+        else:
+            categories_ok += 1
+
+    total_cats = categories_ok + categories_warning + categories_over
+    budget_health = round(max(0, 100 - (categories_over * 20) - (categories_warning * 5)), 0) if total_cats > 0 else 100
+
+    # Next month projection from cash flow
+    now = now or datetime.now()
+    next_month = now.month + 1
+    next_year = now.year
+    if next_month > 12:
+        next_month = 1
+        next_year += 1
+    next_month_key = f"{next_year}-{next_month:02d}"
+
+    next_month_data = None
+    forecast = data.forecast if data.forecast is not None else data.next_month
+    if forecast is not None:
+        next_month_data = next((row for row in forecast if row["date"] == next_month_key), None)
+
+    next_month_income = 0
+    next_month_expense = 0
+    if next_month_data:
+        next_month_income = next_month_data.get("actual_income", 0) + next_month_data.get("planned_income", 0)
+        next_month_expense = next_month_data.get("actual_expense", 0) + next_month_data.get("planned_expense", 0)
+
+    return {
+        "collection": {
+            "total_revenue": from_cents(total_revenue),
+            "total_collected": from_cents(total_collected),
+            "collection_percent": round(collection_percent, 1),
+            "fully_paid": fully_paid,
+            "outstanding": outstanding,
+            "total_apartments": len(data.apartments),
+        },
+        "budget_health": {
+            "score": budget_health,
+            "categories_ok": categories_ok,
+            "categories_warning": categories_warning,
+            "categories_over": categories_over,
+            "worst_category": worst_category,
+            "total_budget": round(total_budget, 2),
+            "total_spent": round(total_actual_spent, 2),
+        },
+        "next_month": {
+            "month": next_month_key,
+            "projected_income": round(next_month_income, 2),
+            "projected_expense": round(next_month_expense, 2),
+            "gap": round(next_month_income - next_month_expense, 2),
+        }
+    }
+
+
+def build_cash_flow(data: DashboardData) -> List[Dict[str, Any]]:
+    if data.forecast_error is not None:
+        raise data.forecast_error
+    return data.forecast
+
+
+def build_budget(data: DashboardData) -> List[Dict[str, Any]]:
+    return budget_report_service.build_budget_report(data.categories, data.budget_actuals)
+
+
+def build_budget_timeline(data: DashboardData) -> List[Dict[str, Any]]:
+    """Monthly planned vs actual spending per category."""
+    if not data.categories:
+        return []
+
+    # Executed transactions per category and month, from the ledger snapshot (cents)
+    ledger = data.ledger
+    category_ids = [c[0] for c in data.categories]
+    mask = ledger.executed & (ledger.month_key != 0) & np.isin(ledger.budget_item_id, category_ids)
+    actual_by_cat = defaultdict(dict)
+    for cat_id, month, amount in zip(*(col.tolist() for col in group_sum(
+        ledger.amount_cents[mask], ledger.budget_item_id[mask], ledger.month_key[mask]
+    ))):
+        actual_by_cat[cat_id][month_label(month)] = amount
+
+    result = []
+
+    for cat_id, cat_name, planned in data.categories:
+        planned = float(planned) if planned else 0
+        planned_by_month = data.planned_by_month.get(cat_id, {})
+        actual_by_month = dict(actual_by_cat.get(cat_id, {}))
+        total_actual = sum(actual_by_month.values())
+
+        # Fallback: match by category name if no budget_item_id matches
+        if total_actual == 0 and cat_name:
+            for key, amount in data.actual_by_name.get(cat_name.strip().lower(), {}).items():
+                actual_by_month[key] = actual_by_month.get(key, 0) + amount
+                total_actual += amount
+
+        # Collect all months
+        all_months = sorted(set(list(planned_by_month.keys()) + list(actual_by_month.keys())))
+
+        monthly = []
+        cumulative_planned = 0
+        cumulative_actual = 0
+        for month in all_months:
+            p = planned_by_month.get(month, 0)
+            a = actual_by_month.get(month, 0)
+            cumulative_planned += p
+            cumulative_actual += a
+            monthly.append({
+                "month": month,
+                "planned": from_cents(p),
+                "actual": from_cents(a),
+                "cumulative_planned": from_cents(cumulative_planned),
+                "cumulative_actual": from_cents(cumulative_actual),
+            })
+
+        total_actual = from_cents(total_actual)
+        progress = (total_actual / planned * 100) if planned > 0 else 0
+
+        result.append({
+            "id": cat_id,
+            "name": cat_name,
+            "budget": round(planned, 2),
+            "total_actual": round(total_actual, 2),
+            "progress": round(progress, 1),
+            "variance": round(planned - total_actual, 2),
+            "monthly": monthly,
+            "start_month": all_months[0] if all_months else None,
+            "end_month": all_months[-1] if all_months else None,
+        })
+
+    return result
+
+
+_BUILDERS = {
+    "kpi": build_kpi_summary,
+    "cash_flow": build_cash_flow,
+    "budget": build_budget,
+    "budget_timeline": build_budget_timeline,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+        return _executor
+
+
+def _build_section(name: str, data: DashboardData):
+    for need in _NEEDS[name]:
+        if need in data.load_errors:
+            raise data.load_errors[need]
+    return _BUILDERS[name](data)
+
+
+def _isolated(name: str, data: DashboardData):
+    """(section, None) or (None, error message)."""
+    try:
+        return _build_section(name, data), None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
+
+def build_sections(data: DashboardData, sections: List[str], isolate_errors: bool = False) -> Dict[str, Any]:
+    """
+    Build the requested sections from shared data, concurrently when there
+    are several. With isolate_errors a failed section is None and its
+    message is listed under "errors"; otherwise the first failure raises.
+    """
+    build = _isolated if isolate_errors else _build_section
+    if len(sections) == 1 or DASHBOARD_WORKERS <= 1:
+        built = {name: build(name, data) for name in sections}
+    else:
+        futures = {name: _get_executor().submit(build, name, data) for name in sections}
+        built = {name: futures[name].result() for name in sections}
+    if not isolate_errors:
+        return built
+    result = {name: section for name, (section, _) in built.items()}
+    errors = {name: error for name, (_, error) in built.items() if error is not None}
+    if errors:
+        result["errors"] = errors
+    return result
+
+
+def project_dashboard(db: Session, project_id: int, sections: Optional[List[str]] = None,
+                      isolate_errors: bool = False) -> Dict[str, Any]:
+    sections = sections or list(SECTIONS)
+    return build_sections(load_dashboard_data(db, project_id, sections), sections, isolate_errors)
+
+
+def kpi_summary(db: Session, project_id: int) -> Dict[str, Any]:
+    return project_dashboard(db, project_id, ["kpi"])["kpi"]
+
+
+def budget_timeline(db: Session, project_id: int) -> List[Dict[str, Any]]:
+    return project_dashboard(db, project_id, ["budget_timeline"])["budget_timeline"]
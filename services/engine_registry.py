@@ -0,0 +1,70 @@
+"""
+Per-engine registries for process-local report state.
+
+Snapshots, caches, indexes and change feeds are kept per database engine
+(the session's bind), so sessions on another engine (a test database, the
+read-only report engine) never see each other's data. Each module holds
+one PerEngine with the factory of its state object; the object is created
+on first use.
+
+Most of this state is versioned by change_events (services/change_log.py)
+and refreshed by ORM hooks. Writes made with raw SQL reach neither, so
+caches whose validity rests on those also expire after their module's
+MAX_AGE.
+
+reset_all() drops the state of every registry, for when the schema is
+recreated (e.g. between tests).
+"""
+import threading
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+_registries: List["PerEngine"] = []
+
+
+class PerEngine(Generic[T]):
+    """bind -> state object, created by factory(bind) on first use."""
+
+    def __init__(self, factory: Callable[[object], T], on_drop: Optional[Callable[[T], None]] = None):
+        self.factory = factory
+        self.on_drop = on_drop
+        self._lock = threading.Lock()
+        self._items: Dict[object, T] = {}
+        _registries.append(self)
+
+    def get(self, bind) -> T:
+        with self._lock:
+            item = self._items.get(bind)
+            if item is None:
+                item = self._items[bind] = self.factory(bind)
+            return item
+
+    def for_session(self, db: Session) -> T:
+        """The state for the database behind this session."""
+        return self.get(db.get_bind())
+
+    def existing(self, bind) -> Optional[T]:
+        """The state for bind if it was created already."""
+        with self._lock:
+            return self._items.get(bind)
+
+    def values(self) -> List[T]:
+        with self._lock:
+            return list(self._items.values())
+
+    def clear(self):
+        with self._lock:
+            items = list(self._items.values())
+            self._items.clear()
+        if self.on_drop is not None:
+            for item in items:
+                self.on_drop(item)
+
+
+def reset_all():
+    """Drop every registry's state."""
+    for registry in list(_registries):
+        registry.clear()
@@ -0,0 +1,80 @@
+"""
+Fast JSON serialization for large API responses.
+
+Report endpoints return plain dicts and lists. FastAPI would walk them with
+jsonable_encoder and then json.dumps them; returning a FastJSONResponse
+instead serializes the payload once with orjson (stdlib json when orjson is
+not installed). Decimals are encoded the way jsonable_encoder does.
+
+List endpoints with a response_model build their items from selected column
+tuples with model_construct, so no ORM objects are hydrated and Pydantic
+does not re-validate trusted rows before dumping them.
+"""
+import json
+from decimal import Decimal
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Type
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        # Same rule as FastAPI's decimal_encoder
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):  # numpy scalars and arrays (stdlib fallback)
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; return it directly to skip jsonable_encoder."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _shape(names: Sequence[str], rows: Iterable[tuple], converters: Optional[Dict[str, Callable]]):
+    conversions = [(names.index(name), fn) for name, fn in (converters or {}).items()]
+    for row in rows:
+        if conversions:
+            row = list(row)
+            for i, fn in conversions:
+                if row[i] is not None:
+                    row[i] = fn(row[i])
+        yield dict(zip(names, row))
+
+
+def row_dicts(names: Sequence[str], rows: Iterable[tuple], converters: Optional[Dict[str, Callable]] = None) -> List[dict]:
+    """Selected column tuples as dicts, with per-column converters (e.g. {"amount": float})."""
+    return list(_shape(names, rows, converters))
+
+
+def construct_all(schema: Type[BaseModel], names: Sequence[str], rows: Iterable[tuple],
+                  converters: Optional[Dict[str, Callable]] = None) -> List[BaseModel]:
+    """Schema instances from trusted column tuples, without validation.
+
+    Converted values must already have the schema's types (floats, not Decimals).
+    """
+    fields_set = set(names)
+    return [schema.model_construct(fields_set, **values) for values in _shape(names, rows, converters)]
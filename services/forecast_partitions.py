@@ -0,0 +1,74 @@
+"""
+Per-process cache of the frozen (historical) part of cash-flow forecasts.
+
+Forecast rows before the current month only hold actuals, because past-due
+plans roll into the current month, so they only change when someone
+back-dates a write. Each process keeps those rows per project (None = all
+projects) together with the change_events version they were built from and
+the closing balance of every past month. An entry is valid while no
+newer ledger change is dated before the current month (see
+services/balance_checkpoints.py), whatever happens to the current and
+future months; it is rebuilt when the month turns.
+
+Entries also expire after MAX_AGE seconds (see services/engine_registry.py).
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from services import balance_checkpoints
+from services.engine_registry import PerEngine
+from services.periods import add_months
+
+MAX_AGE = 3600  # seconds
+
+
+@dataclass
+class FrozenPartition:
+    current_month: int
+    version: int
+    rows: List[Dict[str, Any]]
+    closings: List[Tuple[int, int]]  # (month_key, closing cents) per row
+    checkpointed: bool = False  # closings stored in balance_checkpoints
+    created: float = field(default_factory=time.monotonic)
+
+    @property
+    def closing_cents(self) -> int:
+        return self.closings[-1][1] if self.closings else 0
+
+
+class PartitionCache:
+    """project_id -> FrozenPartition for one database."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Optional[int], FrozenPartition] = {}
+
+    def get(self, db: Session, project_id: Optional[int], current_key: int) -> Optional[FrozenPartition]:
+        with self._lock:
+            entry = self._entries.get(project_id)
+        if entry is None or entry.current_month != current_key or time.monotonic() - entry.created > MAX_AGE:
+            return None
+        if balance_checkpoints.ledger_changed(db, project_id, entry.version, add_months(current_key, -1)):
+            with self._lock:
+                if self._entries.get(project_id) is entry:
+                    del self._entries[project_id]
+            return None
+        return entry
+
+    def put(self, project_id: Optional[int], entry: FrozenPartition):
+        with self._lock:
+            current = self._entries.get(project_id)
+            # Keep whichever was built from newer data when two requests race
+            if current is None or current.current_month != entry.current_month or current.version <= entry.version:
+                self._entries[project_id] = entry
+
+
+_caches: PerEngine[PartitionCache] = PerEngine(lambda bind: PartitionCache())
+
+
+def cache_for(db: Session) -> PartitionCache:
+    return _caches.for_session(db)
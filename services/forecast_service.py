@@ -1,237 +1,348 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import extract
-from typing import List, Dict, Optional, Any
-from datetime import datetime
-from decimal import Decimal
+from sqlalchemy import case, false
+from typing import List, Dict, Optional, Any, Tuple
 from collections import defaultdict
+from dataclasses import dataclass, field
 import models
+from services.money import from_cents, scale_cents, sum_cents
+from services import balance_checkpoints, change_log
+from services.forecast_partitions import FrozenPartition, cache_for
+from services.periods import add_months, current_month_key, month_label, parse_month_label
+from services.ledger_snapshot import get_versioned_ledger, group_sum, group_sum_dict, executed_by_budget_item, INCOME
 
-def generate_cash_flow_forecast(db: Session, project_id: Optional[int] = None) -> List[Dict[str, Any]]:
+
+def rolled_month(column, current_key: int):
+    """SQL expression: month keys before the current month roll into it."""
+    return case((column < current_key, current_key), else_=column)
+
+
+def rolled_into(column, current_key: int, window: Tuple[int, int]):
+    """SQL filter: rows whose rolled month falls in window, on the raw (indexed) month key."""
+    from_key, to_key = window
+    if to_key < current_key:
+        return false()  # past months only hold actuals
+    if from_key <= current_key:
+        return column <= to_key  # includes everything past-due
+    return column.between(from_key, to_key)
+
+
+@dataclass
+class ForecastInputs:
     """
-    Generates a Cash Flow Forecast report.
-    
+    Compact, ORM-free inputs of a cash-flow forecast (all amounts in cents).
+
+    actual:           month_key -> [income, expense] of executed transactions
+    planned_income:   (effective month_key, remainder) per open customer payment plan
+    planned_expense:  (budget_category_id, effective month_key, amount) after
+                      proportional scaling by actual spend
+    ledger_version:   change_events version of the ledger snapshot the actuals
+                      were read from
+    """
+    current_month: int
+    actual: Dict[int, List[int]] = field(default_factory=dict)
+    planned_income: List[Tuple[int, int]] = field(default_factory=list)
+    planned_expense: List[Tuple[int, int, int]] = field(default_factory=list)
+    ledger_version: int = 0
+
+
+def load_forecast_inputs(db: Session, project_id: Optional[int] = None, current_key: Optional[int] = None,
+                         actual_from: Optional[int] = None,
+                         window: Optional[Tuple[int, int]] = None) -> ForecastInputs:
+    """
+    Fetch and reconcile everything the forecast needs.
+
     Logic:
     1. Fetch Executed Transactions (Actuals).
     2. Fetch Customer Payment Plans (Planned).
     3. Apply Rolling Logic: Unpaid past plans are moved to the current month.
-    4. Aggregate by Month: Sum Income vs Expenses.
-    5. Return JSON structure.
+
+    With actual_from, monthly actuals are only grouped from that month on.
+    With window=(from_key, to_key), only months in that range are loaded:
+    actuals dated in it and plans whose rolled month falls in it, filtered in
+    SQL. Reconciliation totals always cover all history.
     """
-    
+    current_key = current_key or current_month_key()
+    inputs = ForecastInputs(current_month=current_key)
+    ledger, inputs.ledger_version = get_versioned_ledger(db)
+    ledger = ledger.for_project(project_id)
+
     # ---------------------------------------------------------
-    # 1. Fetch Data
+    # 1. Reconciliation totals (vectorized over the ledger snapshot)
     # ---------------------------------------------------------
-    
-    # Transactions
-    tx_query = db.query(models.Transaction)
-    if project_id:
-        tx_query = tx_query.filter(models.Transaction.project_id == project_id)
-    # Filter for meaningful transactions (e.g., exclude non-financial if any)
-    # Assuming all transactions in table are financial.
-    transactions = tx_query.all()
-    
-    # Payment Plans (Planned Income mainly, but could be expenses if modeled that way? 
-    # Usually CustomerPaymentPlan is Income).
-    plan_query = db.query(models.CustomerPaymentPlan)
-    if project_id:
-        plan_query = plan_query.filter(models.CustomerPaymentPlan.project_id == project_id)
-    plans = plan_query.all()
-
-    # Pre-fetch Account Types for fast lookup
-    # We need to determine if an account is "Project/Income" or "Supplier/Expense"
-    # We'll create a mapping of account_id -> account_type_name (or similar)
-    accounts = db.query(models.Account).all()
-    account_map = {acc.id: acc for acc in accounts}
-    
-    # helper to check account type
-    def get_account_type_name(acc_id):
-        if not acc_id or acc_id not in account_map:
-            return None
-        acc = account_map[acc_id]
-        if acc.account_type:
-            return acc.account_type.name
-        return None
+
+    # Partial reconciliation: phase_id -> total actual income (cents)
+    income_with_phase = (ledger.phase_id != 0) & (ledger.type_code == INCOME)
+    actual_by_phase = group_sum_dict(ledger.amount_cents[income_with_phase], ledger.phase_id[income_with_phase])
+
+    # Actual spending per budget_category_id for proportional scaling
+    actual_by_budget_cat = executed_by_budget_item(ledger)
 
     # ---------------------------------------------------------
     # 2. Rolling Logic & Processing Plans
     # ---------------------------------------------------------
-    
-    current_date = datetime.now()
-    current_month_start = datetime(current_date.year, current_date.month, 1)
-    
-    # Partial reconciliation: map phase_id -> total actual income amount
-    actual_by_phase = defaultdict(Decimal)
-    for tx in transactions:
-        if tx.phase_id and tx.type and tx.type.strip().lower() == 'income':
-            amount = tx.amount if tx.amount else Decimal(0)
-            actual_by_phase[tx.phase_id] += amount
-
-    monthly_data = defaultdict(lambda: {"actual_income": Decimal(0), "actual_expense": Decimal(0), "planned_income": Decimal(0), "planned_expense": Decimal(0)})
 
-    # Process Plans with partial reconciliation
-    for plan in plans:
-        plan_value = plan.value if plan.value else Decimal(0)
-        if plan_value <= 0:
-            continue
+    Plan = models.CustomerPaymentPlan
+    plan_query = db.query(
+        Plan.phase_id, Plan.value_cents, rolled_month(Plan.month_key, current_key)
+    ).filter(Plan.month_key.isnot(None), Plan.value_cents > 0)
+    if window:
+        plan_query = plan_query.filter(rolled_into(Plan.month_key, current_key, window))
+    if project_id:
+        plan_query = plan_query.filter(Plan.project_id == project_id)
 
+    # Process Plans with partial reconciliation
+    for phase_id, plan_value, effective_month in plan_query.all():
         # Check partial fulfillment: if actual >= planned, skip entirely
-        actual_for_phase = actual_by_phase.get(plan.phase_id, Decimal(0))
+        actual_for_phase = actual_by_phase.get(phase_id, 0)
         if actual_for_phase >= plan_value:
             continue  # Fully covered by actuals
 
         # Remainder = planned - actual (show only what's still expected)
-        remainder = plan_value - actual_for_phase
-
-        # Determine Date
-        plan_date = plan.manual_date if plan.manual_date else None
-        if not plan_date:
-            continue
-
-        # Rolling Logic
-        if plan_date < current_month_start:
-            effective_date = current_month_start
-        else:
-            effective_date = plan_date
-
-        month_key = effective_date.strftime("%Y-%m")
-        monthly_data[month_key]["planned_income"] += remainder
+        inputs.planned_income.append((effective_month, plan_value - actual_for_phase))
 
     # ---------------------------------------------------------
     # 2b. Process BudgetPlan entries (Planned Expenses)
     # ---------------------------------------------------------
 
-    budget_plan_query = db.query(models.BudgetPlan).join(
+    BP = models.BudgetPlan
+    budget_plan_query = db.query(
+        BP.budget_category_id,
+        rolled_month(BP.month_key, current_key).label("effective_month"),
+        sum_cents(BP.amount_cents),
+    ).join(
         models.BudgetCategory,
-        models.BudgetPlan.budget_category_id == models.BudgetCategory.id
-    )
+        BP.budget_category_id == models.BudgetCategory.id
+    ).filter(BP.month_key.isnot(None))
     if project_id:
         budget_plan_query = budget_plan_query.filter(models.BudgetCategory.project_id == project_id)
-    budget_plans = budget_plan_query.all()
-
-    # Compute actual spending per budget_category_id for proportional scaling
-    actual_by_budget_cat = defaultdict(Decimal)
-    for tx in transactions:
-        if tx.budget_item_id and tx.transaction_type == 1:
-            amt = tx.amount if tx.amount else Decimal(0)
-            actual_by_budget_cat[tx.budget_item_id] += amt
+    if window:
+        budget_plan_query = budget_plan_query.filter(rolled_into(BP.month_key, current_key, window))
+    budget_plan_rows = budget_plan_query.group_by(BP.budget_category_id, "effective_month").all()
 
     # Compute total planned per budget_category_id
-    planned_by_budget_cat = defaultdict(Decimal)
-    for bp in budget_plans:
-        amt = bp.amount if bp.amount else Decimal(0)
-        planned_by_budget_cat[bp.budget_category_id] += amt
-
-    for bp in budget_plans:
-        bp_date = bp.planned_date
-        if not bp_date:
-            continue
-
-        # Rolling logic: if planned_date is in the past, roll to current month
-        if bp_date < current_month_start:
-            effective_date = current_month_start
-        else:
-            effective_date = bp_date
-
-        month_key = effective_date.strftime("%Y-%m")
-        amount = bp.amount if bp.amount else Decimal(0)
+    planned_by_budget_cat = defaultdict(int)
+    if window:
+        # Scaling uses each category's plan over all months
+        window_cats = {cat_id for cat_id, _, _ in budget_plan_rows}
+        if window_cats:
+            planned_by_budget_cat.update(db.query(BP.budget_category_id, sum_cents(BP.amount_cents)).filter(
+                BP.budget_category_id.in_(window_cats), BP.month_key.isnot(None)
+            ).group_by(BP.budget_category_id).all())
+    else:
+        for cat_id, _, amount in budget_plan_rows:
+            planned_by_budget_cat[cat_id] += amount
 
+    for cat_id, effective_month, amount in budget_plan_rows:
         # Proportional scaling: reduce planned by actual spending ratio
-        cat_id = bp.budget_category_id
-        total_planned_cat = planned_by_budget_cat.get(cat_id, Decimal(0))
-        total_actual_cat = actual_by_budget_cat.get(cat_id, Decimal(0))
+        total_planned_cat = planned_by_budget_cat.get(cat_id, 0)
+        total_actual_cat = actual_by_budget_cat.get(cat_id, 0)
 
         if total_planned_cat > 0 and total_actual_cat > 0:
-            remaining_ratio = max(Decimal(0), (total_planned_cat - total_actual_cat) / total_planned_cat)
-            amount = amount * remaining_ratio
+            remaining = max(0, total_planned_cat - total_actual_cat)
+            amount = scale_cents(amount, remaining, total_planned_cat)
 
-        monthly_data[month_key]["planned_expense"] += amount
+        inputs.planned_expense.append((cat_id, effective_month, amount))
 
     # ---------------------------------------------------------
     # 3. Process Transactions (Actuals)
     # ---------------------------------------------------------
-    
-    for tx in transactions:
-        if not tx.date:
-            continue
-            
-        month_key = tx.date.strftime("%Y-%m")
-        amount = tx.amount if tx.amount else Decimal(0)
-        
-        # Determine Direction (Income vs Expense)
-        # Primary check: use the transaction's 'type' field (set by import script)
-        is_income = False
-        is_expense = False
-
-        if tx.type and tx.type.strip().lower() == 'income':
-            is_income = True
-        elif tx.type and tx.type.strip().lower() == 'expense':
-            is_expense = True
-
-        # Secondary check: if type field is missing, try account-type based classification
-        if not is_income and not is_expense:
-            to_acc = account_map.get(tx.to_account_id)
-            from_acc = account_map.get(tx.from_account_id)
-
-            to_type = ""
-            if to_acc and to_acc.account_type:
-                to_type = to_acc.account_type.name if hasattr(to_acc.account_type, 'name') else str(to_acc.account_type)
-
-            from_type = ""
-            if from_acc and from_acc.account_type:
-                from_type = from_acc.account_type.name if hasattr(from_acc.account_type, 'name') else str(from_acc.account_type)
-
-            if to_type and ("project" in to_type.lower() or "income" in to_type.lower()):
-                is_income = True
-            elif to_type and ("supplier" in to_type.lower() or "expense" in to_type.lower()):
-                is_expense = True
-            elif from_type and ("project" in from_type.lower()):
-                is_expense = True
-            else:
-                # Default to expense if no classification could be determined
-                is_expense = True
-
-        if is_income:
-            monthly_data[month_key]["actual_income"] += amount
-        else:
-            monthly_data[month_key]["actual_expense"] += amount
 
-    # ---------------------------------------------------------
-    # 4. Final Aggregation & Formatting
-    # ---------------------------------------------------------
-    
+    dated = ledger.month_key != 0
+    if actual_from:
+        dated &= ledger.month_key >= actual_from
+    if window:
+        dated &= (ledger.month_key >= window[0]) & (ledger.month_key <= window[1])
+    months, directions, sums = group_sum(
+        ledger.amount_cents[dated], ledger.month_key[dated], ledger.direction[dated]
+    )
+    for month, direction, amount in zip(months.tolist(), directions.tolist(), sums.tolist()):
+        totals = inputs.actual.setdefault(month, [0, 0])
+        totals[0 if direction == INCOME else 1] += amount
+
+    return inputs
+
+
+def build_forecast_report(inputs: ForecastInputs, opening_cents: int = 0) -> List[Dict[str, Any]]:
+    """
+    4. Aggregate by Month: Sum Income vs Expenses.
+    5. Return JSON structure.
+
+    opening_cents is the balance carried into the first month.
+    """
+    monthly_data = defaultdict(lambda: {"actual_income": 0, "actual_expense": 0, "planned_income": 0, "planned_expense": 0})
+    for month, (income, expense) in inputs.actual.items():
+        monthly_data[month]["actual_income"] += income
+        monthly_data[month]["actual_expense"] += expense
+    for month, amount in inputs.planned_income:
+        monthly_data[month]["planned_income"] += amount
+    for _, month, amount in inputs.planned_expense:
+        monthly_data[month]["planned_expense"] += amount
+
     # Get all unique months from both
     all_months = sorted(monthly_data.keys())
-    
+
     report = []
-    cumulative_balance = Decimal(0)
-    
+    cumulative_balance = opening_cents
+
     for month in all_months:
         data = monthly_data[month]
-        
+
         actual_net = data["actual_income"] - data["actual_expense"]
         planned_net = data["planned_income"] - data["planned_expense"]
-        
-        # Forecast for this month could be Actuals + Planned? 
-        # Usually, if a month is in the past, verified actuals are used. 
-        # If in future, planned is used.
-        # The prompt says: "Generate a report that merges...".
-        # Typically: Forecast = Actuals (if happened) + Planned (if not happened yet for that item).
-        # Since we filtered out "fulfilled" plans, "Planned" here contains ONLY unfulfilled plans.
-        # So it is safe to sum them? 
-        # Yes, "Actuals" = what happened. "Planned" = what IS GOING TO happen (rolled over or future).
-        # So Total Net Flow = Actual Net + Planned Net.
-        
+
+        # "Actuals" = what happened. "Planned" = what IS GOING TO happen
+        # (rolled over or future). Fulfilled plans were filtered out above,
+        # so Total Net Flow = Actual Net + Planned Net.
         net_flow = actual_net + planned_net
         cumulative_balance += net_flow
-        
+
         report.append({
-            "date": month,
-            "actual_income": float(data["actual_income"]),
-            "actual_expense": float(data["actual_expense"]),
-            "planned_income": float(data["planned_income"]),
-            "planned_expense": float(data["planned_expense"]),
-            "net_flow": float(net_flow),
-            "cumulative_balance": float(cumulative_balance)
+            "date": month_label(month),
+            "actual_income": from_cents(data["actual_income"]),
+            "actual_expense": from_cents(data["actual_expense"]),
+            "planned_income": from_cents(data["planned_income"]),
+            "planned_expense": from_cents(data["planned_expense"]),
+            "net_flow": from_cents(net_flow),
+            "cumulative_balance": from_cents(cumulative_balance)
         })
-        
+
+    return report
+
+
+def generate_cash_flow_forecast(db: Session, project_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Generates a Cash Flow Forecast report.
+
+    All sums are kept in integer cents and converted to floats only when the
+    report rows are built. Plan bucketing and rolling run in SQL over the
+    indexed month_key columns; actuals are grouped over the in-memory ledger
+    snapshot.
+
+    Rows before the current month come from the frozen partition cache
+    (services/forecast_partitions.py) while it is valid; only the current
+    and future months are computed, starting from its closing balance.
+    """
+    parts = prepare_forecast(db, project_id)
+    return complete_forecast(db, parts, build_forecast_report(parts.inputs, parts.opening_cents))
+
+
+@dataclass
+class ForecastParts:
+    """
+    A forecast split for computing elsewhere (e.g. in a worker process):
+    build_forecast_report(inputs, opening_cents) gives the rows after `frozen`.
+    version is set when there was no frozen partition and the built rows
+    should become one.
+    """
+    project_id: Optional[int]
+    inputs: ForecastInputs
+    frozen: List[Dict[str, Any]] = field(default_factory=list)
+    opening_cents: int = 0
+    version: Optional[int] = None
+
+
+def prepare_forecast(db: Session, project_id: Optional[int] = None) -> ForecastParts:
+    """Load what is left to compute of a project's forecast."""
+    current_key = current_month_key()
+    frozen = cache_for(db).get(db, project_id, current_key)
+    if frozen is not None:
+        inputs = load_forecast_inputs(db, project_id, current_key, actual_from=current_key)
+        return ForecastParts(project_id, inputs, frozen.rows, frozen.closing_cents)
+    # Read the version first so changes made while we compute stay pending
+    version = change_log.data_version(db, project_id)
+    return ForecastParts(project_id, load_forecast_inputs(db, project_id, current_key), version=version)
+
+
+def complete_forecast(db: Session, parts: ForecastParts, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Full report from prepared parts and their computed rows; stores a new frozen partition."""
+    if parts.version is None:
+        return parts.frozen + rows
+    closings = past_closings(parts.inputs)
+    cache_for(db).put(parts.project_id, FrozenPartition(
+        current_month=parts.inputs.current_month,
+        version=source_version(parts.version, parts.inputs),
+        rows=rows[:len(closings)],
+        closings=closings,
+    ))
+    return rows
+
+
+def forecast_months(db: Session, project_id: Optional[int], from_key: int, to_key: int) -> List[Dict[str, Any]]:
+    """
+    Forecast rows for months from_key..to_key without cumulative_balance,
+    loading only that window (see load_forecast_inputs). Income, expense and
+    net flow match the full report's rows for the same months.
+    """
+    report = build_forecast_report(load_forecast_inputs(db, project_id, window=(from_key, to_key)))
+    for row in report:
+        del row["cumulative_balance"]
     return report
+
+
+def source_version(version: int, inputs: ForecastInputs) -> int:
+    """
+    Version to store past-month results under: the one read before loading,
+    unless the ledger snapshot the actuals came from had not caught up to it.
+    A lower version only makes the result expire sooner.
+    """
+    return min(version, inputs.ledger_version)
+
+
+def past_closings(inputs: ForecastInputs, opening_cents: int = 0) -> List[Tuple[int, int]]:
+    """(month_key, closing cents) of every month before the current one with actuals."""
+    closings = []
+    balance = opening_cents
+    for month in sorted(m for m in inputs.actual if m < inputs.current_month):
+        income, expense = inputs.actual[month]
+        balance += income - expense
+        closings.append((month, balance))
+    return closings
+
+
+def _in_window(report: List[Dict[str, Any]], from_key: Optional[int], to_key: Optional[int]) -> List[Dict[str, Any]]:
+    return [
+        row for row in report
+        if (from_key is None or parse_month_label(row["date"]) >= from_key)
+        and (to_key is None or parse_month_label(row["date"]) <= to_key)
+    ]
+
+
+def generate_cash_flow_window(db: Session, project_id: Optional[int], from_key: Optional[int] = None,
+                              to_key: Optional[int] = None, checkpoint_db: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """
+    Forecast rows for months from_key..to_key (either end open), with the
+    same values as the full report.
+
+    A cached frozen partition is used as is (its closing balances are
+    stored as checkpoints once). Otherwise the cumulative
+    balance starts from the latest valid closing-balance checkpoint before
+    the window (services/balance_checkpoints.py), so only months after it
+    are grouped and walked. Closing balances of past months computed on the
+    way are stored through checkpoint_db, a writable session.
+    """
+    current_key = current_month_key()
+    frozen = cache_for(db).get(db, project_id, current_key)
+    if frozen is not None:
+        if checkpoint_db is not None and not frozen.checkpointed:
+            balance_checkpoints.save_checkpoints(checkpoint_db, project_id, frozen.version, frozen.closings)
+            frozen.checkpointed = True
+        past = _in_window(frozen.rows, from_key, to_key)
+        if to_key is not None and to_key < current_key:
+            return past
+        inputs = load_forecast_inputs(db, project_id, current_key, actual_from=current_key)
+        return past + _in_window(build_forecast_report(inputs, frozen.closing_cents), from_key, to_key)
+
+    # Read the version first so changes made while we compute stay pending
+    version = change_log.data_version(db, project_id)
+    anchor = balance_checkpoints.latest_checkpoint(db, project_id, min(from_key, current_key)) if from_key else None
+    anchor_month, opening = anchor or (None, 0)
+
+    inputs = load_forecast_inputs(
+        db, project_id, current_key, actual_from=add_months(anchor_month, 1) if anchor_month else None
+    )
+    if checkpoint_db is not None:
+        balance_checkpoints.save_checkpoints(
+            checkpoint_db, project_id, source_version(version, inputs), past_closings(inputs, opening)
+        )
+
+    return _in_window(build_forecast_report(inputs, opening), from_key, to_key)
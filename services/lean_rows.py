@@ -0,0 +1,36 @@
+"""
+Lean, column-projected reads for report loaders.
+
+Reports need a handful of numeric columns of wide tables: transactions also
+carry the legacy category, description, supplier and remarks Text columns.
+Querying entities hydrates every column and sets up identity-map entries
+and relationship loaders for each row, and `.all()` keeps all of them alive
+at once. The helpers here run a select of only the needed columns and
+stream it from the cursor in batches of YIELD_PER rows (yield_per). They
+hand out Row tuples, so a loader's peak memory is one batch plus what it
+keeps.
+
+Settings (environment):
+    LEAN_YIELD_PER  rows fetched per batch (default 10000)
+"""
+import os
+from typing import Iterator, List, Optional
+
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+
+YIELD_PER = int(os.getenv("LEAN_YIELD_PER", "10000"))
+
+
+def batches(db: Session, statement: Select, size: Optional[int] = None) -> Iterator[List[tuple]]:
+    """The statement's rows as lists of at most `size` (default YIELD_PER) rows, fetched lazily."""
+    size = size or YIELD_PER
+    # Core execution on the session's connection: no ORM result processing per row
+    result = db.connection().execute(statement.execution_options(yield_per=size))
+    yield from result.partitions(size)
+
+
+def stream(db: Session, statement: Select, size: Optional[int] = None) -> Iterator[tuple]:
+    """The statement's rows one at a time, fetched in batches."""
+    for rows in batches(db, statement, size):
+        yield from rows
@@ -0,0 +1,201 @@
+"""
+Yearly archival of closed-period transactions.
+
+Months of prior years never change, yet every report scanned them. A closed
+year's transactions are moved, with their ids, into a separate SQLite file
+(ARCHIVE_DB_PATH) attached to the connection as `archive`, and replaced in
+the hot database by transaction_summaries rows: one row per month and per
+combination of the dimensions reports filter or group by (project, type,
+transaction_type, category, budget item, phase and the resolved income /
+expense direction), carrying the summed cents and the row count.
+
+Reports aggregate ledger_rows() (SQL) or the ledger snapshot, both of which
+combine detail rows of open periods with summary rows of archived ones, so
+their totals are unchanged by archiving. The transactions list reads the
+archive only when its date range reaches into an archived year.
+
+Transactions entered later for an archived year simply stay hot (reports
+still add them up) until that year is archived again. Archived rows can no
+longer be edited or deleted through the API.
+
+Archived rows keep their ids, so the transactions table is AUTOINCREMENT
+and its sequence is kept above the archive's highest id: a new transaction
+never takes the id of an archived one.
+"""
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, MetaData, Table, delete, func, insert, select, text, union_all
+from sqlalchemy.orm import Session
+
+import models
+from database import DB_NAME
+from services import ledger_snapshot
+from services.ledger_snapshot import EXPENSE, INCOME, is_income_transaction, load_account_types
+
+ARCHIVE_DB_PATH = os.getenv("ARCHIVE_DB_PATH") or os.path.splitext(DB_NAME)[0] + "_archive.db"
+ARCHIVE_SCHEMA = "archive"
+# Most recent years kept hot (1 = only the current year)
+OPEN_YEARS = int(os.getenv("ARCHIVE_OPEN_YEARS", "1"))
+
+# The archive keeps the transactions table's columns, without foreign keys
+_archive_metadata = MetaData()
+archived_transactions = Table(
+    "transactions", _archive_metadata,
+    *(Column(c.name, c.type, primary_key=c.primary_key) for c in models.Transaction.__table__.columns),
+    schema=ARCHIVE_SCHEMA,
+)
+_archive_indexes = (
+    ("ix_transactions_date", "date"),
+    ("ix_transactions_project_month", "project_id, month_key"),
+)
+
+# Columns shared by transactions and transaction_summaries
+LEDGER_COLUMNS = (
+    "project_id", "month_key", "transaction_type", "type", "category", "budget_item_id", "phase_id", "amount_cents",
+)
+
+# ledger_rows() for raw sqlite3 queries
+LEDGER_ROWS_SQL = "({})".format(" UNION ALL ".join(
+    f"SELECT {', '.join(LEDGER_COLUMNS)} FROM {table}" for table in ("transactions", "transaction_summaries")
+))
+
+
+def ledger_rows():
+    """Hot transactions plus archived-period summaries, as one subquery for report aggregations."""
+    return union_all(*(
+        select(*(getattr(model, name) for name in LEDGER_COLUMNS))
+        for model in (models.Transaction, models.TransactionSummary)
+    )).subquery("ledger_rows")
+
+
+def archived_years(db: Session) -> List[int]:
+    return [year for (year,) in db.query(models.ArchivedYear.year).order_by(models.ArchivedYear.year)]
+
+
+def attach(connection):
+    """Attach the archive database to this DBAPI-level connection, once."""
+    path = os.path.abspath(ARCHIVE_DB_PATH)
+    attached = {row[1]: row[2] for row in connection.exec_driver_sql("PRAGMA database_list")}
+    if ARCHIVE_SCHEMA in attached:
+        if os.path.abspath(attached[ARCHIVE_SCHEMA] or "") == path:
+            return
+        connection.exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+    connection.exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+
+
+def reserve_archived_ids(connection):
+    """Move the transactions id sequence past every archived id (archive attached)."""
+    top = connection.execute(select(func.max(archived_transactions.c.id))).scalar()
+    if top is None:
+        return
+    connection.execute(text("UPDATE sqlite_sequence SET seq = :top WHERE name = 'transactions' AND seq < :top"),
+                       {"top": top})
+    connection.execute(text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'transactions', :top "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'transactions')"
+    ), {"top": top})
+
+
+def years_overlap(years: List[int], date_from: Optional[datetime], date_to: Optional[datetime]) -> bool:
+    """Whether a (possibly open-ended) date range touches any of the given years."""
+    return any(
+        (date_from is None or date_from.year <= year) and (date_to is None or year <= date_to.year)
+        for year in years
+    )
+
+
+def closed_years(db: Session, now: Optional[datetime] = None) -> List[int]:
+    """Years with hot transactions that are old enough to archive."""
+    first_open = (now or datetime.now()).year - OPEN_YEARS + 1
+    Tx = models.Transaction
+    rows = db.query((Tx.month_key // 100).label("year")).filter(
+        Tx.month_key.isnot(None), Tx.month_key < first_open * 100 + 1
+    ).distinct().order_by("year").all()
+    return [int(year) for (year,) in rows]
+
+
+def _summarize(db: Session, connection, in_year) -> List[Dict]:
+    """Summary rows for the selected transactions, directions resolved as the ledger does."""
+    Tx = models.Transaction.__table__
+    dimensions = (Tx.c.project_id, Tx.c.month_key, Tx.c.transaction_type, Tx.c.type, Tx.c.category,
+                  Tx.c.budget_item_id, Tx.c.phase_id)
+    rows = connection.execute(
+        select(*dimensions, Tx.c.to_account_id, func.sum(Tx.c.amount_cents), func.count())
+        .where(in_year).group_by(*dimensions, Tx.c.to_account_id)
+    ).all()
+    account_types = load_account_types(db)
+    totals = defaultdict(lambda: [0, 0])
+    for *key, to_account_id, amount_cents, count in rows:
+        tx_type = key[3]
+        direction = INCOME if is_income_transaction(tx_type, account_types.get(to_account_id)) else EXPENSE
+        total = totals[(*key, direction)]
+        total[0] += amount_cents or 0
+        total[1] += count
+    names = [c.name for c in dimensions] + ["direction"]
+    return [
+        dict(zip(names, key), amount_cents=amount_cents, transaction_count=count)
+        for key, (amount_cents, count) in totals.items()
+    ]
+
+
+def archive_year(db: Session, year: int) -> int:
+    """
+    Move one year's transactions to the archive and summarize them in the
+    hot database. Returns how many rows were moved.
+
+    Commits across attached databases are not atomic in WAL mode, so this
+    runs two transactions: the rows are first copied and committed to the
+    archive, then deleted and summarized in the hot database. Until the
+    second commit the year is not recorded as archived and reads ignore the
+    copies. A copy whose id is already archived fails rather than being
+    skipped; an interrupted run has to be cleaned up by hand.
+    """
+    Tx = models.Transaction.__table__
+    in_year = Tx.c.month_key.between(year * 100 + 1, year * 100 + 12)
+    connection = db.connection()
+    # ATTACH and DDL must run before the first write opens the transaction
+    attach(connection)
+    archived_transactions.create(connection, checkfirst=True)
+    for name, columns in _archive_indexes:
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.{name} ON transactions ({columns})"
+        )
+
+    summaries = _summarize(db, connection, in_year)
+    if not summaries:
+        return 0
+    moved = sum(s["transaction_count"] for s in summaries)
+
+    columns = [c.name for c in Tx.columns]
+    connection.execute(insert(archived_transactions).from_select(columns, select(*Tx.columns).where(in_year)))
+    db.commit()
+
+    connection = db.connection()
+    reserve_archived_ids(connection)
+    connection.execute(insert(models.TransactionSummary), [dict(s, year=year) for s in summaries])
+    connection.execute(delete(Tx).where(in_year))
+
+    record = db.get(models.ArchivedYear, year)
+    if record is None:
+        record = models.ArchivedYear(year=year, transaction_count=0)
+        db.add(record)
+    record.transaction_count += moved
+    record.archived_at = datetime.utcnow()
+    # Core deletes bypass the change log; record them so versioned caches rebuild
+    project_ids = {s["project_id"] for s in summaries}
+    connection.execute(insert(models.ChangeEvent), [
+        {"project_id": project_id, "entity": "transaction", "month_key": year * 100 + 1}
+        for project_id in sorted(project_ids, key=lambda p: p or 0)
+    ])
+    db.info.setdefault("changed_projects", set()).update(project_ids)
+    db.commit()
+    ledger_snapshot.invalidate_all()
+    return moved
+
+
+def archive_closed_years(db: Session, now: Optional[datetime] = None) -> Dict[int, int]:
+    """Archive every closed year still in the hot database; returns {year: rows moved}."""
+    return {year: archive_year(db, year) for year in closed_years(db, now)}
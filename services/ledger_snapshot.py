@@ -0,0 +1,320 @@
+"""
+In-memory columnar snapshot of the transactions ledger.
+
+Reports only need a handful of numeric fields per transaction, so instead of
+hydrating ORM objects on every request each process keeps NumPy arrays of
+(id, project_id, month_key, amount_cents, direction, type_code,
+budget_item_id, phase_id, executed) and answers report aggregations as
+vectorized group-bys. direction is the resolved income/expense flow used by
+the forecast; type_code is what the transaction's own type field says.
+
+The snapshot is built lazily on first use and refreshed incrementally: new
+rows are appended by reading only ids above the last one seen. It remembers
+the change_events version of the ledger it was built from (see
+services/change_log.py): newer events that only inserted transactions are
+appended, any other ledger event (an edit or delete of a transaction, an
+account change, which can change the direction of untyped rows) rebuilds
+it, whichever process wrote it. ORM writes in this process also invalidate
+it right away, and a row count check catches deletes made with raw SQL.
+
+Archived years (services/ledger_archive.py) contribute their summary rows
+instead of detail, with id 0; every aggregation here is a sum, so the
+results are the same.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, object_session
+
+import models
+from services import lean_rows
+from services.engine_registry import PerEngine
+from services.change_log import LEDGER_ENTITIES
+
+INCOME = 1
+EXPENSE = -1
+
+_COLUMNS = (
+    "ids", "project_id", "month_key", "amount_cents", "direction", "type_code",
+    "budget_item_id", "phase_id", "executed",
+)
+_DTYPES = {
+    "ids": np.int64,
+    "project_id": np.int64,
+    "month_key": np.int32,
+    "amount_cents": np.int64,
+    "direction": np.int8,
+    "type_code": np.int8,
+    "budget_item_id": np.int64,
+    "phase_id": np.int64,
+    "executed": np.bool_,
+}
+
+
+class LedgerColumns:
+    """Immutable set of equally sized column arrays. Missing ids/months are 0."""
+
+    __slots__ = _COLUMNS
+
+    def __init__(self, **arrays):
+        for name in _COLUMNS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def empty(cls):
+        return cls(**{name: np.empty(0, dtype=_DTYPES[name]) for name in _COLUMNS})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, other: "LedgerColumns") -> "LedgerColumns":
+        return LedgerColumns.concat([self, other])
+
+    @classmethod
+    def concat(cls, parts) -> "LedgerColumns":
+        parts = list(parts)
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        return cls(**{name: np.concatenate([getattr(p, name) for p in parts]) for name in _COLUMNS})
+
+    def select(self, mask) -> "LedgerColumns":
+        return LedgerColumns(**{name: getattr(self, name)[mask] for name in _COLUMNS})
+
+    def for_project(self, project_id: Optional[int]) -> "LedgerColumns":
+        if not project_id:
+            return self
+        return self.select(self.project_id == project_id)
+
+
+def normalized_type(column):
+    """SQL expression: lower(trim(type)) for income/expense matching."""
+    return func.lower(func.trim(column))
+
+
+def load_account_types(db: Session) -> Dict[int, str]:
+    """account_id -> account type name, for direction classification."""
+    rows = db.query(models.Account.id, models.AccountType.name).outerjoin(
+        models.AccountType, models.Account.account_type_id == models.AccountType.id
+    ).all()
+    return {acc_id: type_name for acc_id, type_name in rows if type_name}
+
+
+def is_income_transaction(tx_type: Optional[str], to_type: Optional[str]) -> bool:
+    """
+    Determine direction of a transaction.
+    Primary check: the transaction's 'type' field (set by import script).
+    Secondary check: if type is missing, money going into a project/income
+    account is income. Everything else (supplier accounts, payments out of a
+    project account, unclassified rows) counts as expense.
+    """
+    tx_type = (tx_type or "").strip().lower()
+    if tx_type == 'income':
+        return True
+    if tx_type == 'expense':
+        return False
+
+    to_type = (to_type or "").lower()
+    return "project" in to_type or "income" in to_type
+
+
+def group_sum(values, *keys):
+    """
+    Exact int64 group-by sum. Returns (unique key arrays..., sums), sorted by key.
+    Rows are sorted once and summed with np.add.reduceat, so no float rounding.
+    """
+    if len(values) == 0:
+        return tuple(np.empty(0, dtype=k.dtype) for k in keys) + (np.empty(0, dtype=np.int64),)
+    order = np.lexsort(keys[::-1])
+    sorted_keys = [k[order] for k in keys]
+    boundary = np.zeros(len(values), dtype=bool)
+    boundary[0] = True
+    for k in sorted_keys:
+        boundary[1:] |= k[1:] != k[:-1]
+    starts = np.flatnonzero(boundary)
+    sums = np.add.reduceat(values[order].astype(np.int64), starts)
+    return tuple(k[starts] for k in sorted_keys) + (sums,)
+
+
+def group_sum_dict(values, key) -> Dict[int, int]:
+    """Single-key group-by sum as a plain {key: cents} dict."""
+    keys, sums = group_sum(values, key)
+    return dict(zip(keys.tolist(), sums.tolist()))
+
+
+def executed_by_budget_item(ledger: LedgerColumns) -> Dict[int, int]:
+    """budget_item_id -> executed (transaction_type == 1) total in cents."""
+    mask = (ledger.budget_item_id != 0) & ledger.executed
+    return group_sum_dict(ledger.amount_cents[mask], ledger.budget_item_id[mask])
+
+
+def _load_rows(db: Session, after_id: int) -> LedgerColumns:
+    """Transactions above after_id, streamed in batches (services/lean_rows.py) into column arrays."""
+    Tx = models.Transaction
+    statement = select(
+        Tx.id,
+        Tx.project_id,
+        Tx.month_key,
+        Tx.amount_cents,
+        normalized_type(Tx.type),
+        Tx.to_account_id,
+        Tx.budget_item_id,
+        Tx.phase_id,
+        Tx.transaction_type,
+    ).where(Tx.id > after_id).order_by(Tx.id)
+    account_types = None
+    parts = []
+    for rows in lean_rows.batches(db, statement):
+        if account_types is None and any(r[4] not in ("income", "expense") for r in rows):
+            account_types = load_account_types(db)
+        parts.append(_detail_columns(rows, account_types or {}))
+    return LedgerColumns.concat(parts)
+
+
+def _column(name, values, count):
+    return np.fromiter((v or 0 for v in values), dtype=_DTYPES[name], count=count)
+
+
+def _type_codes(tx_types):
+    return np.array([
+        INCOME if tx_type == "income" else EXPENSE if tx_type == "expense" else 0 for tx_type in tx_types
+    ], dtype=_DTYPES["type_code"])
+
+
+def _detail_columns(rows, account_types: Dict[int, str]) -> LedgerColumns:
+    ids, project_ids, month_keys, amounts, tx_types, to_accounts, budget_items, phases, tx_kinds = zip(*rows)
+    direction = [
+        INCOME if is_income_transaction(tx_type, account_types.get(to_acc)) else EXPENSE
+        for tx_type, to_acc in zip(tx_types, to_accounts)
+    ]
+    count = len(rows)
+    return LedgerColumns(
+        ids=_column("ids", ids, count),
+        project_id=_column("project_id", project_ids, count),
+        month_key=_column("month_key", month_keys, count),
+        amount_cents=_column("amount_cents", amounts, count),
+        direction=np.array(direction, dtype=_DTYPES["direction"]),
+        type_code=_type_codes(tx_types),
+        budget_item_id=_column("budget_item_id", budget_items, count),
+        phase_id=_column("phase_id", phases, count),
+        executed=np.fromiter((k == 1 for k in tx_kinds), dtype=np.bool_, count=count),
+    )
+
+
+def _load_summaries(db: Session) -> LedgerColumns:
+    S = models.TransactionSummary
+    statement = select(
+        S.project_id, S.month_key, S.amount_cents, S.direction, normalized_type(S.type),
+        S.budget_item_id, S.phase_id, S.transaction_type,
+    ).order_by(S.id)
+    parts = []
+    for rows in lean_rows.batches(db, statement):
+        project_ids, month_keys, amounts, directions, tx_types, budget_items, phases, tx_kinds = zip(*rows)
+        count = len(rows)
+        parts.append(LedgerColumns(
+            ids=np.zeros(count, dtype=_DTYPES["ids"]),
+            project_id=_column("project_id", project_ids, count),
+            month_key=_column("month_key", month_keys, count),
+            amount_cents=_column("amount_cents", amounts, count),
+            direction=_column("direction", directions, count),
+            type_code=_type_codes(tx_types),
+            budget_item_id=_column("budget_item_id", budget_items, count),
+            phase_id=_column("phase_id", phases, count),
+            executed=np.fromiter((k == 1 for k in tx_kinds), dtype=np.bool_, count=count),
+        ))
+    return LedgerColumns.concat(parts)
+
+
+class LedgerSnapshot:
+    """Per-process, per-engine snapshot with lazy build and incremental refresh."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._summaries = LedgerColumns.empty()
+        self._detail: Optional[LedgerColumns] = None
+        self._columns: Optional[LedgerColumns] = None
+        self._last_id = 0
+        self._version = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._detail = None
+            self._columns = None
+            self._last_id = 0
+            self._version = 0
+
+    def get(self, db: Session) -> LedgerColumns:
+        return self.get_versioned(db)[0]
+
+    def get_versioned(self, db: Session) -> Tuple[LedgerColumns, int]:
+        """Current columns and the ledger version they include (all ledger events up to it)."""
+        E = models.ChangeEvent
+        ledger_events = E.entity.in_(LEDGER_ENTITIES)
+        summary_count = db.query(func.count(models.TransactionSummary.id)).scalar_subquery()
+        version = db.query(func.max(E.id)).filter(ledger_events).scalar_subquery()
+        # Latest event that may have changed or removed rows already loaded
+        rewritten = db.query(func.max(E.id)).filter(
+            ledger_events, ~((E.entity == "transaction") & E.inserts_only.is_(True))
+        ).scalar_subquery()
+        max_id, row_count, summary_rows, version, rewritten = db.query(
+            func.max(models.Transaction.id), func.count(models.Transaction.id), summary_count, version, rewritten
+        ).one()
+        max_id = max_id or 0
+        with self._lock:
+            detail = self._detail
+            if (detail is None or (rewritten or 0) > self._version or max_id < self._last_id
+                    or summary_rows != len(self._summaries)):
+                self._summaries = _load_summaries(db)
+                detail = _load_rows(db, 0)
+            elif max_id > self._last_id:
+                detail = detail.append(_load_rows(db, self._last_id))
+            if len(detail) != row_count:
+                # Rows were deleted (or ids reused) behind our back
+                detail = _load_rows(db, 0)
+            if detail is not self._detail:
+                self._detail = detail
+                self._columns = self._summaries.append(detail) if len(self._summaries) else detail
+            self._last_id = int(detail.ids[-1]) if len(detail) else 0
+            self._version = version or 0
+            return self._columns, self._version
+
+
+_snapshots: PerEngine[LedgerSnapshot] = PerEngine(lambda bind: LedgerSnapshot())
+
+
+def get_ledger(db: Session) -> LedgerColumns:
+    """Current ledger columns for the database behind this session."""
+    return _snapshots.for_session(db).get(db)
+
+
+def get_versioned_ledger(db: Session) -> Tuple[LedgerColumns, int]:
+    """get_ledger() plus the change_events version of the ledger it reflects."""
+    return _snapshots.for_session(db).get_versioned(db)
+
+
+def invalidate_all():
+    for snapshot in _snapshots.values():
+        snapshot.invalidate()
+
+
+def _mark_changed(mapper, connection, target):
+    # Invalidate now for the writing session, and again after commit so a
+    # concurrent rebuild between flush and commit cannot keep stale rows.
+    session = object_session(target)
+    if session is not None:
+        session.info["ledger_changed"] = True
+    invalidate_all()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("ledger_changed", False):
+        invalidate_all()
+
+
+event.listen(models.Transaction, "after_update", _mark_changed)
+event.listen(models.Transaction, "after_delete", _mark_changed)
+event.listen(models.Account, "after_update", _mark_changed)
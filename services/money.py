@@ -0,0 +1,47 @@
+"""
+Integer minor-unit (cents) helpers.
+
+Monetary columns are stored as Numeric(18, 2), which SQLite keeps as REAL.
+Every money table also carries an indexed integer *_cents shadow column,
+kept in sync by the ORM listeners in models.py, so reports can sum exactly
+in SQL and in Python ints and only convert to float when building the
+response.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+from sqlalchemy import func
+
+_CENT = Decimal(1)
+
+
+def to_cents(value) -> Optional[int]:
+    """Convert an amount (Decimal, float, int or numeric string) to integer cents."""
+    if value is None or value == "":
+        return None
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * 100).quantize(_CENT, rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents) -> float:
+    """Convert integer cents back to a float amount for JSON responses."""
+    if not cents:
+        return 0.0
+    return int(cents) / 100
+
+
+def scale_cents(cents: int, numerator: int, denominator: int) -> int:
+    """Return cents * numerator / denominator, rounded half-up, in integer arithmetic."""
+    if denominator == 0:
+        return 0
+    product = cents * numerator
+    quotient, remainder = divmod(abs(product), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return quotient if product >= 0 else -quotient
+
+
+def sum_cents(column):
+    """SQL expression: SUM of a cents column, 0 when there are no rows."""
+    return func.coalesce(func.sum(column), 0)
@@ -0,0 +1,49 @@
+"""
+Integer month keys (yyyymm) for time bucketing.
+
+Transactions, budget plans and customer payment plans carry an indexed
+month_key column, kept in sync by the ORM listeners in models.py, so
+reports can group, filter and roll months in SQL instead of parsing every
+DateTime in Python.
+"""
+from datetime import datetime
+from typing import Optional
+
+
+def month_key(value) -> Optional[int]:
+    """Return the yyyymm key of a date/datetime (None for missing dates)."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.year * 100 + value.month
+
+
+def current_month_key(now: Optional[datetime] = None) -> int:
+    return month_key(now or datetime.now())
+
+
+def month_label(key: int) -> str:
+    """202503 -> '2025-03' (the label used in report rows)."""
+    return f"{key // 100}-{key % 100:02d}"
+
+
+def parse_month_label(label: str) -> int:
+    """'2025-03' -> 202503."""
+    year, month = label.split("-")[:2]
+    return int(year) * 100 + int(month)
+
+
+def add_months(key: int, months: int) -> int:
+    """Shift a month key by a (possibly negative) number of months."""
+    return month_from_index(month_index(key) + months)
+
+
+def month_index(key: int) -> int:
+    """Absolute month number, so the distance between two keys is a subtraction."""
+    return (key // 100) * 12 + (key % 100 - 1)
+
+
+def month_from_index(index: int) -> int:
+    """Inverse of month_index."""
+    return (index // 12) * 100 + index % 12 + 1
@@ -0,0 +1,222 @@
+"""
+Portfolio summary across active and completed projects.
+
+Loading and computing are split: load_portfolio_inputs reads everything in
+a fixed number of grouped queries (plus the forecast plans per project)
+into compact, picklable ProjectInputs (ints, NumPy arrays and
+ForecastInputs, no ORM objects), and summarize_project turns one of them
+into its summary row with pure Python. The summaries are computed through
+services/process_pool.py, so with REPORT_PROCESSES set they are spread
+over worker processes. Totals, frozen forecast rows and buffer alerts are
+merged back in the request worker.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+from services import buffer_alerts, forecast_service
+from services.forecast_service import ForecastParts
+from services.ledger_archive import ledger_rows
+from services.ledger_snapshot import executed_by_budget_item, get_ledger
+from services.money import from_cents, sum_cents, to_cents
+from services.process_pool import map_reports
+
+PORTFOLIO_STATUSES = ("Active", "Completed")
+
+
+@dataclass
+class ProjectInputs:
+    """Everything one project's summary needs, as plain data (amounts in cents unless noted)."""
+    id: int
+    name: Optional[str]
+    status: Optional[str]
+    total_budget: float  # sum of category planned amounts
+    actual_spent: int
+    sale_cents: np.ndarray  # per apartment, 0 when unpriced
+    paid_cents: np.ndarray  # per apartment
+    category_names: List[Optional[str]] = field(default_factory=list)
+    planned: np.ndarray = field(default_factory=lambda: np.zeros(0))  # per category, float amounts
+    executed_cents: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))  # per category
+    forecast: Optional[ForecastParts] = None  # None when loading the forecast failed
+
+
+def load_portfolio_inputs(db: Session) -> List[ProjectInputs]:
+    P = models.Project
+    projects = db.query(P.id, P.name, P.status).filter(P.status.in_(PORTFOLIO_STATUSES)).all()
+    if not projects:
+        return []
+    project_ids = [pid for pid, _, _ in projects]
+
+    Cat = models.BudgetCategory
+    budgets = dict(db.query(Cat.project_id, func.sum(Cat.planned_amount)).filter(
+        Cat.project_id.in_(project_ids)
+    ).group_by(Cat.project_id).all())
+    categories: Dict[int, list] = {pid: [] for pid in project_ids}
+    for cat_id, project_id, name, planned in db.query(Cat.id, Cat.project_id, Cat.category_name, Cat.planned_amount).filter(
+        Cat.project_id.in_(project_ids)
+    ).order_by(Cat.id):
+        categories[project_id].append((cat_id, name, float(planned) if planned else 0))
+
+    # Actual spending: expense transactions (executed only), plus archived-year summaries
+    ledger = ledger_rows().c
+    spent = dict(db.query(ledger.project_id, sum_cents(ledger.amount_cents)).filter(
+        ledger.project_id.in_(project_ids), ledger.transaction_type == 1, ledger.type == "expense"
+    ).group_by(ledger.project_id).all())
+
+    Apt, Pay = models.Apartment, models.CustomerPayment
+    paid = db.query(Pay.apartment_id, sum_cents(Pay.amount_cents).label("paid")).group_by(Pay.apartment_id).subquery()
+    apartments: Dict[int, list] = {pid: [] for pid in project_ids}
+    for project_id, sale_price, paid_cents in db.query(Apt.project_id, Apt.sale_price, func.coalesce(paid.c.paid, 0)).outerjoin(
+        paid, paid.c.apartment_id == Apt.id
+    ).filter(Apt.project_id.in_(project_ids)).order_by(Apt.id):
+        apartments[project_id].append((to_cents(sale_price) or 0, paid_cents))
+
+    executed_by_item = executed_by_budget_item(get_ledger(db))
+
+    inputs = []
+    for pid, name, status in projects:
+        try:
+            forecast = forecast_service.prepare_forecast(db, pid)
+        except Exception:
+            forecast = None
+        cats = categories[pid]
+        apts = apartments[pid]
+        inputs.append(ProjectInputs(
+            id=pid,
+            name=name,
+            status=status,
+            total_budget=float(budgets.get(pid) or 0),
+            actual_spent=spent.get(pid, 0),
+            sale_cents=np.array([s for s, _ in apts], dtype=np.int64),
+            paid_cents=np.array([p for _, p in apts], dtype=np.int64),
+            category_names=[n for _, n, _ in cats],
+            planned=np.array([p for _, _, p in cats], dtype=np.float64),
+            executed_cents=np.array([executed_by_item.get(c, 0) for c, _, _ in cats], dtype=np.int64),
+            forecast=forecast,
+        ))
+    return inputs
+
+
+def summarize_project(p: ProjectInputs) -> Dict[str, Any]:
+    """One project's summary row; cash_flow holds only the rows computed from p.forecast."""
+    total_revenue = int(p.sale_cents.sum())
+    total_collected = int(p.paid_cents.sum())
+    priced = p.sale_cents > 0
+    fully_paid = int((priced & (p.paid_cents >= p.sale_cents)).sum())
+
+    collection_rate = (total_collected / total_revenue * 100) if total_revenue > 0 else 0
+    budget_progress = (from_cents(p.actual_spent) / p.total_budget * 100) if p.total_budget > 0 else 0
+
+    # Budget health: count categories by status
+    categories_ok = 0
+    categories_warning = 0
+    categories_over = 0
+    worst_category = None
+    worst_overrun = 0
+
+    for name, planned, executed in zip(p.category_names, p.planned.tolist(), p.executed_cents.tolist()):
+        if planned <= 0:
+            continue
+        cat_actual = from_cents(executed)
+        cat_progress = (cat_actual / planned * 100) if planned > 0 else 0
+
+        if cat_progress > 100:
+            categories_over += 1
+            overrun = cat_actual - planned
+            if overrun > worst_overrun:
+                worst_overrun = overrun
+                worst_category = {"name": name, "progress": round(cat_progress, 1), "overrun": round(overrun, 2)}
+        elif cat_progress > 90:
+            categories_warning += 1
+        else:
+            categories_ok += 1
+
+    total_cats = categories_ok + categories_warning + categories_over
+    budget_health = round(max(0, 100 - (categories_over * 20) - (categories_warning * 5)), 0) if total_cats > 0 else 100
+
+    # Cash flow for this project
+    cash_flow = []
+    if p.forecast is not None:
+        try:
+            cash_flow = forecast_service.build_forecast_report(p.forecast.inputs, p.forecast.opening_cents)
+        except Exception:
+            cash_flow = None
+
+    return {
+        "id": p.id,
+        "name": p.name,
+        "status": p.status,
+        "total_budget": round(p.total_budget, 2),
+        "actual_spent": from_cents(p.actual_spent),
+        "budget_progress": round(budget_progress, 1),
+        "total_revenue": from_cents(total_revenue),
+        "total_collected": from_cents(total_collected),
+        "collection_rate": round(collection_rate, 1),
+        "apartments_count": len(p.sale_cents),
+        "fully_paid": fully_paid,
+        "net_cash_flow": 0,  # set when the forecast is merged
+        "budget_health": budget_health,
+        "categories_ok": categories_ok,
+        "categories_warning": categories_warning,
+        "categories_over": categories_over,
+        "worst_category": worst_category,
+        "cash_flow": cash_flow,
+    }
+
+
+def portfolio_summary(db: Session, alerts_db: Optional[Session] = None) -> Dict[str, Any]:
+    """Aggregated portfolio summary across all active projects."""
+    # Stale buffer alerts are re-evaluated (written) through alerts_db when db is read-only
+    buffer_alerts.refresh_stale(alerts_db or db)
+    inputs = load_portfolio_inputs(db)
+    project_summaries = map_reports(summarize_project, inputs)
+
+    total_budget_all = 0
+    total_spent_all = 0  # cents
+    total_collected_all = 0  # cents
+    total_revenue_all = 0  # cents
+
+    for p, summary in zip(inputs, project_summaries):
+        rows = summary["cash_flow"]
+        if p.forecast is None or rows is None:
+            rows = []
+        else:
+            rows = forecast_service.complete_forecast(db, p.forecast, rows)
+        summary["cash_flow"] = rows
+        summary["net_cash_flow"] = round(sum(row.get("net_flow", 0) for row in rows), 2)
+
+        total_budget_all += p.total_budget
+        total_spent_all += p.actual_spent
+        total_collected_all += int(p.paid_cents.sum())
+        total_revenue_all += int(p.sale_cents.sum())
+
+    overall_collection = (total_collected_all / total_revenue_all * 100) if total_revenue_all > 0 else 0
+    overall_budget_progress = (from_cents(total_spent_all) / total_budget_all * 100) if total_budget_all > 0 else 0
+
+    # Feature 4: Buffer alerts (precomputed, see services/buffer_alerts.py)
+    alerts = buffer_alerts.read_alerts(db, [p["id"] for p in project_summaries], refresh=False)
+    alerts_by_project = {}
+    for alert in alerts:
+        alerts_by_project.setdefault(alert["project_id"], []).append({
+            k: v for k, v in alert.items() if k not in ("project_id", "project_name")
+        })
+    for proj_summary in project_summaries:
+        proj_summary["buffer_alerts"] = alerts_by_project.get(proj_summary["id"], [])
+
+    return {
+        "projects": project_summaries,
+        "totals": {
+            "project_count": len(project_summaries),
+            "total_budget": round(total_budget_all, 2),
+            "total_spent": from_cents(total_spent_all),
+            "budget_progress": round(overall_budget_progress, 1),
+            "total_revenue": from_cents(total_revenue_all),
+            "total_collected": from_cents(total_collected_all),
+            "collection_rate": round(overall_collection, 1),
+        },
+        "buffer_alerts": alerts,
+    }
@@ -0,0 +1,66 @@
+"""
+Optional process pool for CPU-bound report computation.
+
+Forecast bucketing and per-project scoring are pure Python, so extra
+threads only queue on the GIL. With REPORT_PROCESSES > 0, map_reports runs
+such functions in a ProcessPoolExecutor so one large report can use every
+core; with 0 (the default, e.g. on small single-core hosts) they run in
+the calling thread. Functions and their inputs must be picklable: module
+level functions over plain data (ints, lists, dicts, NumPy arrays), never
+ORM objects or sessions.
+
+Workers are started with "spawn" so they do not inherit the server's
+threads, sockets or database connections.
+
+Settings (environment):
+    REPORT_PROCESSES  worker processes (default 0 = compute in-process)
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+REPORT_PROCESSES = int(os.getenv("REPORT_PROCESSES", "0"))
+
+_processes = REPORT_PROCESSES
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    with _lock:
+        if _pool is None and _processes > 0:
+            _pool = ProcessPoolExecutor(max_workers=_processes, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def map_reports(fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+    """[fn(item) for item in items], spread over the worker processes when there are any."""
+    items = list(items)
+    pool = _get_pool() if len(items) > 1 else None
+    if pool is None:
+        return [fn(item) for item in items]
+    # One chunk per process keeps pickling round trips to a minimum
+    chunksize = -(-len(items) // _processes)
+    return list(pool.map(fn, items, chunksize=chunksize))
+
+
+def configure(processes: int):
+    """Change the number of worker processes (0 = compute in-process)."""
+    global _processes
+    shutdown()
+    with _lock:
+        _processes = processes
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,119 @@
+"""
+Project list queries and cached project-level rollups.
+
+The project list is served from one query that joins budget totals
+pre-grouped per project. Rollups (executed spend, customer collections,
+apartment count) are computed with one grouped query each for all
+projects that need them, and cached per process keyed by the project's
+change_events version. The number of queries stays constant at any
+portfolio size.
+"""
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+from services import change_log
+from services.engine_registry import PerEngine
+from services.ledger_archive import ledger_rows
+from services.money import from_cents, sum_cents
+
+MAX_AGE = 300  # seconds (see services/engine_registry.py)
+
+
+def list_projects(db: Session, skip: int = 0, limit: int = 100) -> List[Dict]:
+    """Project rows with total_budget (sum of category planned amounts), one query."""
+    budgets = db.query(
+        models.BudgetCategory.project_id.label("project_id"),
+        func.sum(models.BudgetCategory.planned_amount).label("total_budget"),
+    ).group_by(models.BudgetCategory.project_id).subquery()
+
+    P = models.Project
+    rows = db.query(
+        P.id, P.name, P.status, P.project_account_val, P.property_cost, P.remarks, P.account_balance,
+        budgets.c.total_budget,
+    ).outerjoin(budgets, budgets.c.project_id == P.id).order_by(P.id).offset(skip).limit(limit).all()
+
+    return [
+        {
+            "id": project_id,
+            "name": name,
+            "status": status,
+            "project_account_val": float(account_val) if account_val else 0,
+            "property_cost": float(property_cost) if property_cost else None,
+            "remarks": remarks,
+            "account_balance": float(balance) if balance else 0,
+            "total_budget": float(total_budget) if total_budget else None,
+        }
+        for project_id, name, status, account_val, property_cost, remarks, balance, total_budget in rows
+    ]
+
+
+def compute_rollups(db: Session, project_ids: List[int]) -> Dict[int, Dict]:
+    """Rollups for the given projects in three grouped queries (amounts in cents)."""
+    rollups = {pid: {"actual_spent": 0, "total_collected": 0, "apartments_count": 0} for pid in project_ids}
+    if not project_ids:
+        return rollups
+
+    rows = ledger_rows().c
+    spent = db.query(rows.project_id, sum_cents(rows.amount_cents)).filter(
+        rows.project_id.in_(project_ids), rows.transaction_type == 1, rows.type == "expense"
+    ).group_by(rows.project_id)
+
+    Apt = models.Apartment
+    collected = db.query(Apt.project_id, sum_cents(models.CustomerPayment.amount_cents)).join(
+        models.CustomerPayment, models.CustomerPayment.apartment_id == Apt.id
+    ).filter(Apt.project_id.in_(project_ids)).group_by(Apt.project_id)
+
+    apartments = db.query(Apt.project_id, func.count(Apt.id)).filter(
+        Apt.project_id.in_(project_ids)
+    ).group_by(Apt.project_id)
+
+    for key, query in (("actual_spent", spent), ("total_collected", collected), ("apartments_count", apartments)):
+        for project_id, value in query:
+            rollups[project_id][key] = value
+    return rollups
+
+
+class RollupCache:
+    """project_id -> (change version, computed at, rollup), per process and engine."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, tuple] = {}
+
+    def get(self, db: Session, project_ids: List[int]) -> Dict[int, Dict]:
+        versions, _ = change_log.latest_versions(db)
+        now = time.monotonic()
+        wanted = {pid: versions.get(pid, 0) for pid in project_ids}
+        with self._lock:
+            stale = [
+                pid for pid, version in wanted.items()
+                if pid not in self._entries
+                or self._entries[pid][0] != version
+                or now - self._entries[pid][1] > MAX_AGE
+            ]
+        fresh = compute_rollups(db, stale)
+        with self._lock:
+            for pid in stale:
+                self._entries[pid] = (wanted[pid], now, fresh[pid])
+            return {pid: self._entries[pid][2] for pid in project_ids}
+
+
+_caches: PerEngine[RollupCache] = PerEngine(lambda bind: RollupCache())
+
+
+def get_rollups(db: Session, project_ids: List[int]) -> Dict[int, Dict]:
+    """Cached rollups as response dicts (amounts in currency units)."""
+    rollups = _caches.for_session(db).get(db, project_ids)
+    return {
+        pid: {
+            "actual_spent": from_cents(r["actual_spent"]),
+            "total_collected": from_cents(r["total_collected"]),
+            "apartments_count": r["apartments_count"],
+        }
+        for pid, r in rollups.items()
+    }
@@ -0,0 +1,108 @@
+"""
+Per-process cache of rendered report responses.
+
+Entries are keyed by route path and query parameters and remember the data
+version they were built from: the latest change_events id for the project
+(or for anything, for portfolio-wide reports) plus today's date, since
+forecasts roll with the calendar. The JSON body is rendered once; each
+compressed variant is produced on the first request that negotiates it
+and stored next to the body, so cache hits never recompress.
+
+Entries also expire after MAX_AGE seconds (see services/engine_registry.py).
+
+Misses are rendered through services/single_flight.py, keyed on the
+database, route, parameters and data version, so concurrent identical
+requests share one computation.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+from services import change_log, single_flight
+from services.engine_registry import PerEngine
+from services.compression import COMPRESS_MIN_SIZE, choose_encoding, compress
+from services.fast_json import dumps
+
+MAX_ENTRIES = 128
+MAX_AGE = 600  # seconds
+
+
+class CachedReport:
+    """A rendered JSON body plus its compressed variants."""
+
+    __slots__ = ("version", "created", "body", "_encoded", "_lock")
+
+    def __init__(self, version, body: bytes):
+        self.version = version
+        self.created = time.monotonic()
+        self.body = body
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        with self._lock:
+            body = self._encoded.get(encoding)
+            if body is None:
+                body = self._encoded[encoding] = compress(self.body, encoding)
+            return body
+
+    def response(self, accept_encoding: Optional[str]) -> Response:
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = choose_encoding(accept_encoding) if len(self.body) >= COMPRESS_MIN_SIZE else None
+        if encoding is None:
+            return Response(self.body, media_type="application/json", headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(self.encoded(encoding), media_type="application/json", headers=headers)
+
+
+class ReportCache:
+    """LRU of (path, params) -> CachedReport."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, CachedReport]" = OrderedDict()
+
+    def get(self, key, version) -> Optional[CachedReport]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version or time.monotonic() - entry.created > MAX_AGE:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: CachedReport):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_caches: PerEngine[ReportCache] = PerEngine(lambda bind: ReportCache())
+
+
+def report_version(db: Session, project_id: Optional[int] = None):
+    return change_log.data_version(db, project_id), date.today().toordinal()
+
+
+def cached_report(request: Request, db: Session, project_id: Optional[int], compute: Callable[[], object]) -> Response:
+    """Serve compute()'s JSON from the cache while the data version is unchanged."""
+    cache = _caches.for_session(db)
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    version = report_version(db, project_id)
+    entry = cache.get(key, version)
+    if entry is None:
+        flight = (str(db.get_bind().url), key, version)
+        entry = single_flight.coalesce(flight, lambda: dumps(compute()), lambda body: CachedReport(version, body))
+        cache.put(key, entry)
+    return entry.response(request.headers.get("accept-encoding"))
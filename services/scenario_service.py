@@ -0,0 +1,147 @@
+"""
+What-if scenarios over the cash-flow forecast.
+
+A scenario shifts and scales the planned (not yet happened) side of a
+project's forecast: customer collections, budget-plan expenses, and
+individual budget categories. Nothing is written to the database. All
+scenarios of a request are evaluated together as (scenario x month)
+matrices, so dozens of variants cost about the same as one.
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+
+from services.forecast_service import ForecastInputs
+from services.money import from_cents
+from services.periods import month_index, month_from_index, month_label
+
+BASELINE_NAME = "Baseline"
+
+
+def _param(scenario, name, default):
+    value = scenario.get(name) if isinstance(scenario, dict) else getattr(scenario, name, None)
+    return default if value is None else value
+
+
+def _overrides(scenario):
+    overrides = _param(scenario, "category_overrides", []) or []
+    return [o if isinstance(o, dict) else o.model_dump() for o in overrides]
+
+
+def _place(matrix, month_idx, amounts):
+    """Add amounts[s, i] into matrix[s, month_idx[s, i]] in one vectorized call."""
+    scenarios, months = matrix.shape
+    rows = np.arange(scenarios)[:, None] * months
+    np.add.at(matrix.reshape(-1), (rows + month_idx).reshape(-1), amounts.reshape(-1))
+
+
+def balance_paths(inputs: ForecastInputs, income_shift, income_factor, expense_shift, expense_factor):
+    """
+    Cumulative balance of many forecast variants at once.
+
+    The shift/factor arguments are (path, item) arrays aligned with
+    inputs.planned_income and inputs.planned_expense (or broadcastable to
+    them). Returns (first month index, planned_in, planned_out, net,
+    cumulative), each matrix shaped (path, month) in cents.
+    """
+    current_idx = month_index(inputs.current_month)
+    income_idx = np.array([month_index(m) for m, _ in inputs.planned_income], dtype=np.int64)
+    income_amt = np.array([a for _, a in inputs.planned_income], dtype=np.float64)
+    expense_idx = np.array([month_index(m) for _, m, _ in inputs.planned_expense], dtype=np.int64)
+    expense_amt = np.array([a for _, _, a in inputs.planned_expense], dtype=np.float64)
+
+    count = max(len(np.atleast_2d(a)) for a in (income_shift, income_factor, expense_shift, expense_factor))
+    shape_in = (count, len(income_idx))
+    shape_out = (count, len(expense_idx))
+    income_months = np.maximum(np.broadcast_to(income_idx[None, :] + income_shift, shape_in), current_idx)
+    expense_months = np.maximum(np.broadcast_to(expense_idx[None, :] + expense_shift, shape_out), current_idx)
+    income_values = np.rint(np.broadcast_to(income_amt[None, :] * income_factor, shape_in)).astype(np.int64)
+    expense_values = np.rint(np.broadcast_to(expense_amt[None, :] * expense_factor, shape_out)).astype(np.int64)
+
+    # Dense month axis covering history and every shifted plan
+    actual_idx = np.array([month_index(m) for m in inputs.actual], dtype=np.int64)
+    candidates = [np.array([current_idx]), actual_idx, income_months.reshape(-1), expense_months.reshape(-1)]
+    first = int(min(c.min() for c in candidates if c.size))
+    last = int(max(c.max() for c in candidates if c.size))
+    span = last - first + 1
+
+    actual_net = np.zeros(span, dtype=np.int64)
+    for month, (income, expense) in inputs.actual.items():
+        actual_net[month_index(month) - first] += income - expense
+
+    planned_in = np.zeros((count, span), dtype=np.int64)
+    planned_out = np.zeros((count, span), dtype=np.int64)
+    _place(planned_in, income_months - first, income_values)
+    _place(planned_out, expense_months - first, expense_values)
+
+    net = actual_net[None, :] + planned_in - planned_out
+    return first, planned_in, planned_out, net, np.cumsum(net, axis=1)
+
+
+def evaluate_scenarios(inputs: ForecastInputs, scenarios: List[Any], buffer_cents: int) -> Dict[str, Any]:
+    """
+    Evaluate scenarios against the same forecast inputs.
+
+    Each scenario may set income_shift_months / income_factor (collections),
+    expense_shift_months / expense_factor (budget plans) and
+    category_overrides [{budget_category_id, shift_months, factor}] that
+    replace the expense settings for one category. Shifts never move money
+    before the current month. A baseline scenario is always evaluated first.
+    """
+    scenarios = [{"name": BASELINE_NAME}] + list(scenarios)
+    expense_cat = np.array([c for c, _, _ in inputs.planned_expense], dtype=np.int64)
+
+    # Per-scenario parameters as (scenario, item) matrices
+    income_shift = np.array([[_param(s, "income_shift_months", 0)] for s in scenarios], dtype=np.int64)
+    income_factor = np.array([[_param(s, "income_factor", 1.0)] for s in scenarios], dtype=np.float64)
+    expense_shift = np.repeat(
+        np.array([[_param(s, "expense_shift_months", 0)] for s in scenarios], dtype=np.int64), len(expense_cat), axis=1
+    )
+    expense_factor = np.repeat(
+        np.array([[_param(s, "expense_factor", 1.0)] for s in scenarios], dtype=np.float64), len(expense_cat), axis=1
+    )
+    for row, scenario in enumerate(scenarios):
+        for override in _overrides(scenario):
+            mask = expense_cat == override["budget_category_id"]
+            if override.get("shift_months") is not None:
+                expense_shift[row, mask] = override["shift_months"]
+            if override.get("factor") is not None:
+                expense_factor[row, mask] = override["factor"]
+
+    first, planned_in, planned_out, net, cumulative = balance_paths(
+        inputs, income_shift, income_factor, expense_shift, expense_factor
+    )
+    span = cumulative.shape[1]
+    below = cumulative < buffer_cents
+
+    months = [month_label(month_from_index(first + i)) for i in range(span)]
+    min_pos = cumulative.argmin(axis=1)
+    results = []
+    for row, scenario in enumerate(scenarios):
+        breach_positions = np.flatnonzero(below[row])
+        results.append({
+            "name": _param(scenario, "name", f"Scenario {row}"),
+            "planned_income": [from_cents(v) for v in planned_in[row].tolist()],
+            "planned_expense": [from_cents(v) for v in planned_out[row].tolist()],
+            "net_flow": [from_cents(v) for v in net[row].tolist()],
+            "cumulative_balance": [from_cents(v) for v in cumulative[row].tolist()],
+            "end_balance": from_cents(int(cumulative[row, -1])),
+            "min_balance": from_cents(int(cumulative[row, min_pos[row]])),
+            "min_balance_month": months[min_pos[row]],
+            "breach_count": int(breach_positions.size),
+            "first_breach_month": months[breach_positions[0]] if breach_positions.size else None,
+            "breaches": [
+                {
+                    "month": months[pos],
+                    "balance": from_cents(int(cumulative[row, pos])),
+                    "shortfall": from_cents(int(buffer_cents - cumulative[row, pos])),
+                }
+                for pos in breach_positions.tolist()
+            ],
+            "vs_baseline": {
+                "end_balance": from_cents(int(cumulative[row, -1] - cumulative[0, -1])),
+                "min_balance": from_cents(int(cumulative[row, min_pos[row]] - cumulative[0, min_pos[0]])),
+            },
+        })
+
+    return {"months": months, "buffer": from_cents(buffer_cents), "scenarios": results}
@@ -0,0 +1,185 @@
+"""
+Single-flight coalescing of identical report computations.
+
+When several requests need the same report at the same data version (a
+dashboard opened by many managers at once, a frontend double-firing on
+mount), the first one computes it and the others wait for its result
+instead of each holding a worker thread and database connections.
+
+Within a process, SingleFlight keeps one in-flight call per key. Across
+gunicorn workers, SharedResults coordinates through files in
+SINGLE_FLIGHT_DIR (off when unset): the worker that creates
+<key>.lock (O_EXCL) computes and writes the body to <key>.body; the others
+poll for that file while the lock is held. Keys include the data version,
+so a stored body is never stale; files older than RESULT_MAX_AGE are
+removed. A lock older than LEASE_SECONDS was left by a crashed worker and
+is taken over, and a follower that waits longer than WAIT_TIMEOUT computes
+the report itself.
+
+Followers wait inside a report_pool thread (services/bulkhead.py), so
+WAIT_TIMEOUT is capped at REPORT_QUEUE_TIMEOUT: a stuck leader cannot tie
+up the pool's few threads for longer than a request may queue for one.
+
+Settings (environment):
+    SINGLE_FLIGHT_DIR      directory shared by the workers (default: off)
+    SINGLE_FLIGHT_TIMEOUT  seconds a follower waits for a leader
+                           (default and maximum: REPORT_QUEUE_TIMEOUT)
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from services.bulkhead import REPORT_QUEUE_TIMEOUT
+
+SINGLE_FLIGHT_DIR = os.getenv("SINGLE_FLIGHT_DIR")
+WAIT_TIMEOUT = min(float(os.getenv("SINGLE_FLIGHT_TIMEOUT", REPORT_QUEUE_TIMEOUT)), REPORT_QUEUE_TIMEOUT)
+LEASE_SECONDS = 300
+RESULT_MAX_AGE = 600  # seconds
+POLL_INTERVAL = 0.05
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one fn per key at a time in this process; callers of a running key share its result."""
+
+    def __init__(self, timeout: float = WAIT_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            if not call.done.wait(self.timeout):
+                return fn()  # the leader is stuck; do not hang with it
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def waiters(self, key: Hashable) -> int:
+        """How many callers are waiting on the in-flight call for key."""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call else 0
+
+
+class SharedResults:
+    """Lock-file lease plus stored result, so one worker computes for all."""
+
+    def __init__(self, directory: str, timeout: float = WAIT_TIMEOUT, lease_seconds: float = LEASE_SECONDS):
+        self.directory = directory
+        self.timeout = timeout
+        self.lease_seconds = lease_seconds
+
+    def _paths(self, key: Hashable):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        base = os.path.join(self.directory, name)
+        return base + ".lock", base + ".body"
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _acquire(self, lock_path: str) -> bool:
+        try:
+            if time.time() - os.path.getmtime(lock_path) > self.lease_seconds:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def run(self, key: Hashable, render: Callable[[], bytes]) -> bytes:
+        """render()'s body for key, computed by whichever worker takes the lease first."""
+        os.makedirs(self.directory, exist_ok=True)
+        lock_path, body_path = self._paths(key)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            body = self._read(body_path)
+            if body is not None:
+                return body
+            if self._acquire(lock_path):
+                break
+            if time.monotonic() > deadline:
+                return render()
+            time.sleep(POLL_INTERVAL)
+        try:
+            body = render()
+            partial = f"{body_path}.{os.getpid()}.{threading.get_ident()}"
+            with open(partial, "wb") as f:
+                f.write(body)
+            os.replace(partial, body_path)
+            self._prune()
+            return body
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _prune(self):
+        oldest = time.time() - RESULT_MAX_AGE
+        for name in os.listdir(self.directory):
+            if not name.endswith(".body"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < oldest:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+_flights = SingleFlight()
+_shared: Optional[SharedResults] = SharedResults(SINGLE_FLIGHT_DIR) if SINGLE_FLIGHT_DIR else None
+
+
+def configure(directory: Optional[str]):
+    """Switch cross-worker coalescing on (with a shared directory) or off."""
+    global _shared
+    _shared = SharedResults(directory) if directory else None
+
+
+def coalesce(key: Hashable, render: Callable[[], bytes], wrap: Callable[[bytes], Any] = lambda body: body) -> Any:
+    """
+    wrap(render()) for key, computed once for all concurrent callers in this
+    process and, with SINGLE_FLIGHT_DIR, across workers.
+    """
+    shared = _shared
+    if shared is None:
+        return _flights.run(key, lambda: wrap(render()))
+    return _flights.run(key, lambda: wrap(shared.run(key, render)))
@@ -0,0 +1,260 @@
+"""
+In-memory account -> budget category suggestion index.
+
+Every time an account is booked against a budget category counts as a use.
+Uses come from historical transactions (at their date) and from the
+account_category_mappings rows (one per row, at last_used). A pair's weight is the sum
+of 2 ** ((use time - EPOCH) / HALF_LIFE) over its uses: recent uses count
+more, frequent ones add up, and because every weight is measured against
+the same fixed epoch a new use is a single addition, with no decay pass.
+Dividing by the current time's factor gives the readable score (uses
+"worth" one today). Future-dated uses count as of now, so a typo'd year
+cannot dominate the ranking.
+
+Alongside the weight every pair keeps its integer use count. Removing a
+use subtracts its weight, which leaves float residue, so a pair is dropped
+when its count reaches zero rather than when its weight looks like zero.
+
+Each process keeps one index per engine. It is built lazily, updated
+incrementally after commits of this process, and rebuilt after MAX_AGE
+to pick up writes from other processes. Incremental updates mirror what a
+rebuild would count: a transaction write changes its own use, a mapping
+upsert adds a use only for a new row and otherwise moves the row's use to
+the new last_used. A rebuild reads into new dicts outside the index lock
+and swaps them in, so suggestions keep being served from the previous
+index meanwhile; uses committed during the rebuild may be missed until the
+next one.
+"""
+import threading
+import time
+from itertools import chain
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+import models
+from services import lean_rows
+from services.engine_registry import PerEngine
+
+EPOCH = datetime(2020, 1, 1).timestamp()
+HALF_LIFE = 90 * 24 * 3600  # seconds
+MAX_AGE = 60  # seconds before a rebuild picks up other processes' writes
+
+
+def use_weight(when) -> float:
+    """Weight of one use at `when` (a datetime; missing dates count at the epoch, future ones as now)."""
+    seconds = min(when.timestamp(), time.time()) if when is not None else EPOCH
+    return 2.0 ** ((seconds - EPOCH) / HALF_LIFE)
+
+
+def _now_factor() -> float:
+    return use_weight(datetime.now())
+
+
+class SuggestionIndex:
+    """account_id -> {budget_category_id: weight} and use counts, plus category -> project."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._weights: Dict[int, Dict[int, float]] = {}
+        self._counts: Dict[int, Dict[int, int]] = {}
+        self._projects: Dict[int, Optional[int]] = {}
+        self._ranked: Dict[int, List[int]] = {}
+        self._built_at: Optional[float] = None
+        self._build_lock = threading.Lock()  # one rebuild at a time
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _build(self, db: Session):
+        """(weights, counts, category projects) read from the database."""
+        weights: Dict[int, Dict[int, float]] = {}
+        counts: Dict[int, Dict[int, int]] = {}
+        Tx = models.Transaction
+        rows = select(Tx.to_account_id, Tx.budget_item_id, Tx.date).where(
+            Tx.to_account_id.isnot(None), Tx.budget_item_id.isnot(None)
+        )
+        Map = models.AccountCategoryMapping
+        mappings = select(Map.account_id, Map.budget_category_id, Map.last_used)
+        for account_id, category_id, when in chain(lean_rows.stream(db, rows), lean_rows.stream(db, mappings)):
+            per_account = weights.setdefault(account_id, {})
+            per_account[category_id] = per_account.get(category_id, 0.0) + use_weight(when)
+            uses = counts.setdefault(account_id, {})
+            uses[category_id] = uses.get(category_id, 0) + 1
+
+        projects = dict(db.query(models.BudgetCategory.id, models.BudgetCategory.project_id))
+        return weights, counts, projects
+
+    def _fresh(self) -> bool:
+        return self._built_at is not None and time.monotonic() - self._built_at <= MAX_AGE
+
+    def ensure(self, db: Session):
+        with self._lock:
+            if self._fresh():
+                return
+            have_index = self._built_at is not None
+        # Only the first build makes readers wait; later ones run while the old index serves
+        if not self._build_lock.acquire(blocking=not have_index):
+            return
+        try:
+            with self._lock:
+                if self._fresh():
+                    return  # built by another request meanwhile
+            weights, counts, projects = self._build(db)
+            with self._lock:
+                self._weights, self._counts, self._projects, self._ranked = weights, counts, projects, {}
+                self._built_at = time.monotonic()
+        finally:
+            self._build_lock.release()
+
+    def apply(self, uses, categories):
+        """uses: [(account_id, category_id, weight delta, count delta)]; categories: {id: project_id or None to drop}."""
+        with self._lock:
+            if self._built_at is None:
+                return  # next read rebuilds anyway
+            for category_id, project_id in categories.items():
+                if project_id is None:
+                    self._projects.pop(category_id, None)
+                else:
+                    self._projects[category_id] = project_id
+            for account_id, category_id, delta, count_delta in uses:
+                per_account = self._weights.setdefault(account_id, {})
+                counts = self._counts.setdefault(account_id, {})
+                count = counts.get(category_id, 0) + count_delta
+                if count > 0:
+                    counts[category_id] = count
+                    per_account[category_id] = max(per_account.get(category_id, 0.0) + delta, 0.0)
+                else:
+                    counts.pop(category_id, None)
+                    per_account.pop(category_id, None)
+                self._ranked.pop(account_id, None)
+            if categories:
+                self._ranked.clear()
+
+    def ranked(self, account_id: int) -> List[int]:
+        ranked = self._ranked.get(account_id)
+        if ranked is None:
+            weights = self._weights.get(account_id, {})
+            ranked = sorted(
+                (c for c in weights if c in self._projects),
+                key=lambda c: (-weights[c], c),
+            )
+            self._ranked[account_id] = ranked
+        return ranked
+
+    def suggest(self, account_ids, project_id: Optional[int] = None, limit: int = 3):
+        """{account_id: [(budget_category_id, score), ...]} best first."""
+        factor = _now_factor()
+        result = {}
+        with self._lock:
+            for account_id in account_ids:
+                weights = self._weights.get(account_id, {})
+                candidates = [
+                    c for c in self.ranked(account_id)
+                    if project_id is None or self._projects.get(c) == project_id
+                ]
+                result[account_id] = [(c, round(weights[c] / factor, 4)) for c in candidates[:limit]]
+        return result
+
+
+_indexes: PerEngine[SuggestionIndex] = PerEngine(lambda bind: SuggestionIndex())
+
+
+def suggest_categories(db: Session, account_ids, project_id: Optional[int] = None, limit: int = 3):
+    index = _indexes.for_session(db)
+    index.ensure(db)
+    return index.suggest(account_ids, project_id, limit)
+
+
+def record_mapping_uses(db: Session, pairs, used_at: datetime):
+    """
+    Queue the index change of upserting these mapping pairs at used_at;
+    applied after commit. Call before the upsert: an existing row's use
+    moves from its current last_used, a new row adds one.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return
+    Map = models.AccountCategoryMapping
+    existing = {
+        (account_id, category_id): last_used
+        for account_id, category_id, last_used in db.query(Map.account_id, Map.budget_category_id, Map.last_used).filter(
+            Map.account_id.in_({a for a, _ in pairs}), Map.budget_category_id.in_({c for _, c in pairs})
+        )
+    }
+    weight = use_weight(used_at)
+    uses = []
+    for pair in pairs:
+        if pair in existing:
+            uses.append((*pair, weight - use_weight(existing[pair]), 0))
+        else:
+            uses.append((*pair, weight, 1))
+    db.info.setdefault("suggestion_uses", []).extend(uses)
+
+
+# --- Incremental updates from ORM writes ---
+
+def _pair_and_date(obj, previous: bool):
+    state = inspect(obj)
+    values = []
+    for name in ("to_account_id", "budget_item_id", "date"):
+        if previous:
+            history = state.attrs[name].history
+            values.append(history.deleted[0] if history.deleted else state.dict.get(name))
+        else:
+            values.append(state.dict.get(name))
+    return values
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_uses(session, flush_context):
+    uses = []
+    categories = {}
+    for obj in session.new:
+        if isinstance(obj, models.Transaction):
+            account_id, category_id, when = _pair_and_date(obj, previous=False)
+            if account_id and category_id:
+                uses.append((account_id, category_id, use_weight(when), 1))
+        elif isinstance(obj, models.BudgetCategory):
+            categories[obj.id] = obj.project_id
+    for obj in session.dirty:
+        if isinstance(obj, models.Transaction) and session.is_modified(obj, include_collections=False):
+            old = _pair_and_date(obj, previous=True)
+            new = _pair_and_date(obj, previous=False)
+            if old != new:
+                if old[0] and old[1]:
+                    uses.append((old[0], old[1], -use_weight(old[2]), -1))
+                if new[0] and new[1]:
+                    uses.append((new[0], new[1], use_weight(new[2]), 1))
+        elif isinstance(obj, models.BudgetCategory):
+            categories[obj.id] = obj.project_id
+    for obj in session.deleted:
+        if isinstance(obj, models.Transaction):
+            account_id, category_id, when = _pair_and_date(obj, previous=True)
+            if account_id and category_id:
+                uses.append((account_id, category_id, -use_weight(when), -1))
+        elif isinstance(obj, models.BudgetCategory):
+            categories[obj.id] = None
+    if uses:
+        session.info.setdefault("suggestion_uses", []).extend(uses)
+    if categories:
+        session.info.setdefault("suggestion_categories", {}).update(categories)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_uses(session):
+    uses = session.info.pop("suggestion_uses", None)
+    categories = session.info.pop("suggestion_categories", None)
+    if uses or categories:
+        index = _indexes.existing(session.get_bind())
+        if index is not None:
+            index.apply(uses or [], categories or {})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_uses(session):
+    session.info.pop("suggestion_uses", None)
+    session.info.pop("suggestion_categories", None)
@@ -0,0 +1,113 @@
+"""
+Opt-in traffic capture for building realistic load tests.
+
+When the TRAFFIC_CAPTURE_FILE environment variable is set, every HTTP request
+is appended to that file as one JSON line: timestamp, method, path, route
+template, sanitized query string, status code and server-side duration.
+Request bodies and headers are never recorded. Lines are queued and
+appended by a background writer thread, so requests never wait on the
+file. The file can be replayed against a local instance with
+replay_traffic.py.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+# Query parameters that may carry free text (customer names, remarks) are
+# replaced with a placeholder so captures can be shared safely.
+REDACTED_PARAMS = {"search", "q"}
+REDACTED_VALUE = "redacted"
+
+
+def sanitize_query(query_string: str) -> str:
+    """Return the query string with free-text parameter values redacted."""
+    if not query_string:
+        return ""
+    pairs = parse_qsl(query_string, keep_blank_values=True)
+    cleaned = [
+        (key, REDACTED_VALUE if key.lower() in REDACTED_PARAMS and value else value)
+        for key, value in pairs
+    ]
+    return urlencode(cleaned)
+
+
+class TrafficCaptureMiddleware:
+    """ASGI middleware that appends one JSON line per HTTP request."""
+
+    def __init__(self, app, capture_path: str):
+        self.app = app
+        self.capture_path = capture_path
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            self.write({
+                "ts": round(started_at, 3),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None) or scope["path"],
+                "query": sanitize_query(scope.get("query_string", b"").decode("latin-1")),
+                "status": status["code"],
+                "duration_ms": round(duration_ms, 2),
+            })
+
+    def write(self, record: dict):
+        """Queue one record for the writer thread (started on first use)."""
+        self._queue.put(json.dumps(record, ensure_ascii=False) + "\n")
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+                    self._thread.start()
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            lines = [self._queue.get()]
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.capture_path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except OSError:
+                pass  # capture is best effort; never take the server down for it
+            finally:
+                for _ in lines:
+                    self._queue.task_done()
+
+
+def install_traffic_capture(app, capture_path: str = None):
+    """Add the capture middleware if a capture file is configured."""
+    capture_path = capture_path or os.environ.get("TRAFFIC_CAPTURE_FILE")
+    if not capture_path:
+        return False
+    app.add_middleware(TrafficCaptureMiddleware, capture_path=capture_path)
+    return True
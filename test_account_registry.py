@@ -0,0 +1,99 @@
+"""
+Tests for the cached system/role account registry.
+"""
+import pytest
+from sqlalchemy import event
+
+import models
+from conftest import engine, TestingSessionLocal
+from services import account_registry
+from services.account_registry import check_accounts, get_account_roles
+
+
+@pytest.fixture
+def account_queries():
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM accounts" in statement:
+            statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_execute)
+
+
+def _role_accounts(db, direct_system=1):
+    direct = models.Account(name="Direct Payments", is_system_account=direct_system)
+    owner = models.Account(name="Owner Account", is_system_account=0)
+    db.add_all([direct, owner])
+    db.commit()
+    return direct, owner
+
+
+def test_vat_writes_use_cached_registry(client, sample_project, sample_accounts, account_queries):
+    payload = {"project_id": sample_project["id"], "date": "2025-01-01T00:00:00", "amount": 10,
+               "to_account_id": sample_accounts["system"].id, "vat_rate": 0.24}
+    assert client.post("/transactions/", json=payload).json()["vat_rate"] == 0
+    assert len(account_queries) == 1  # first use loads the registry
+
+    for _ in range(3):
+        assert client.post("/transactions/", json=payload).json()["vat_rate"] == 0
+    assert len(account_queries) == 1
+
+
+def test_account_change_invalidates_registry(db, client, sample_project, sample_accounts):
+    regular = sample_accounts["regular"]
+    payload = {"project_id": sample_project["id"], "date": "2025-01-01T00:00:00", "amount": 10,
+               "to_account_id": regular.id, "vat_rate": 0.24}
+    assert client.post("/transactions/", json=payload).json()["vat_rate"] == 0.24
+
+    regular.is_system_account = 1
+    db.commit()
+    assert client.post("/transactions/", json=payload).json()["vat_rate"] == 0
+
+
+def test_other_process_changes_picked_up_on_revalidation(db, sample_accounts, monkeypatch):
+    roles = get_account_roles(db)
+    assert sample_accounts["regular"].id not in roles.system_ids
+
+    # Simulate another worker: change the row and log the event without our ORM listeners
+    with engine.begin() as conn:
+        conn.execute(models.Account.__table__.update().values(is_system_account=1))
+        conn.execute(models.ChangeEvent.__table__.insert().values(entity="account"))
+    assert get_account_roles(db) is roles  # within the revalidation window
+
+    monkeypatch.setattr(account_registry, "REVALIDATE_SECONDS", 0)
+    assert sample_accounts["regular"].id in get_account_roles(db).system_ids
+
+
+def test_direct_to_owner_uses_registry(db, client, sample_apartment, account_queries):
+    direct, owner = _role_accounts(db, direct_system=0)
+    url = f"/apartments/{sample_apartment['id']}/payments/direct-to-owner"
+    payment = {"date": "2025-02-01T00:00:00", "amount": 1000, "payment_method": "Direct to Owner"}
+
+    response = client.post(url, json=payment)
+    assert response.status_code == 400
+    assert "is_system_account is not set" in response.json()["detail"]
+
+    direct.is_system_account = 1
+    db.commit()
+    account_queries.clear()
+    response = client.post(url, json=payment)
+    assert response.status_code == 200
+    assert len(account_queries) == 1  # reload after the change, no ILIKE scans
+
+    txs = db.query(models.Transaction).order_by(models.Transaction.id).all()
+    assert [(t.from_account_id, t.to_account_id) for t in txs] == [(None, direct.id), (direct.id, owner.id)]
+
+
+def test_diagnostics_and_startup_check(db, client, capsys):
+    assert client.get("/diagnostics/system-accounts").json()["status"] == "misconfigured"
+    roles = check_accounts(TestingSessionLocal)
+    assert not roles.ok
+    assert "No account with 'Direct' in the name exists" in capsys.readouterr().out
+
+    _role_accounts(db)
+    data = client.get("/diagnostics/system-accounts").json()
+    assert data["status"] == "ok" and data["issues"] == []
+    assert [a["role"] for a in data["accounts"]] == ["Direct Account candidate", "Owner Account candidate"]
+    assert check_accounts(TestingSessionLocal).ok
@@ -0,0 +1,112 @@
+"""
+Tests for online database backups.
+"""
+import os
+import sqlite3
+
+import pytest
+
+import main
+from services.backup_service import BackupInProgress, BackupScheduler, BackupService, copy_database
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "live.db"
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE payments (id INTEGER PRIMARY KEY, note TEXT)")
+    conn.executemany("INSERT INTO payments (note) VALUES (?)", [("x" * 500,)] * 400)
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_copy_in_paced_steps(source, tmp_path):
+    steps = []
+    dest = str(tmp_path / "copy.db")
+    restarts = copy_database(source, dest, pages=8, progress=lambda remaining, total: steps.append(remaining))
+    assert restarts == 0
+    assert len(steps) > 5 and steps[-1] == 0
+    assert _count(dest) == 400
+
+
+def test_concurrent_write_restarts_the_snapshot(source, tmp_path):
+    writer = sqlite3.connect(source)
+
+    def write_once(remaining, total):
+        if not writer.in_transaction and _count(source) == 400:
+            writer.execute("INSERT INTO payments (note) VALUES ('late')")
+            writer.commit()
+
+    dest = str(tmp_path / "copy.db")
+    restarts = copy_database(source, dest, pages=8, progress=write_once)
+    writer.close()
+    assert restarts == 1
+    assert _count(dest) == 401
+
+
+def test_backup_keeps_newest_per_database(source, tmp_path):
+    backup_dir = tmp_path / "backups"
+    backup_dir.mkdir()
+    for stamp in ("20240101-000000", "20240102-000000", "20240103-000000"):
+        (backup_dir / f"live-{stamp}.db").write_bytes(b"")
+    service = BackupService([source, str(tmp_path / "missing.db")], str(backup_dir), retention=2, pages_per_step=16)
+
+    job = service.run()
+    assert job.status == "done" and job.to_dict()["progress"] == 1.0
+    assert [os.path.basename(p) for p in service.backups()] == [
+        os.path.basename(job.files[0]), "live-20240103-000000.db",
+    ]
+    assert _count(job.files[0]) == 400
+    assert not (backup_dir / "backup.lock").exists()
+
+
+def test_lock_blocks_a_second_backup(source, tmp_path):
+    service = BackupService([source], str(tmp_path / "backups"))
+    os.makedirs(service.backup_dir)
+    open(os.path.join(service.backup_dir, "backup.lock"), "w").close()
+    with pytest.raises(BackupInProgress):
+        service.run()
+    assert BackupScheduler(service, interval=60).run_once() is False
+
+
+def test_scheduler_skips_when_recent(source, tmp_path):
+    scheduler = BackupScheduler(BackupService([source], str(tmp_path / "backups")), interval=3600)
+    assert scheduler.run_once() is True
+    assert scheduler.run_once() is False
+
+
+def test_admin_endpoint_reports_progress(client, source, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "backups", BackupService([source], str(tmp_path / "backups"), pages_per_step=16))
+    assert client.get("/admin/backups").json() == {"job": None, "backups": []}
+
+    response = client.post("/admin/backups")
+    assert response.status_code == 202
+    assert response.json()["status"] in ("running", "done")
+    main.backups.wait(5)
+
+    status = client.get("/admin/backups").json()
+    assert status["job"]["status"] == "done" and status["job"]["progress"] == 1.0
+    assert [b["file"] for b in status["backups"]] == [os.path.basename(status["job"]["files"][0])]
+
+
+def test_listing_skips_files_pruned_meanwhile(client, source, tmp_path, monkeypatch):
+    service = BackupService([source], str(tmp_path / "backups"))
+    monkeypatch.setattr(main, "backups", service)
+    service.start()
+    service.wait(5)
+    kept = service.backups()
+    # A backup finishing now prunes a file between the listing and the stat
+    monkeypatch.setattr(service, "backups", lambda: [str(tmp_path / "backups" / "pruned.db")] + kept)
+    response = client.get("/admin/backups")
+    assert response.status_code == 200
+    assert [b["file"] for b in response.json()["backups"]] == [os.path.basename(p) for p in kept]
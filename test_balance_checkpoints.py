@@ -0,0 +1,119 @@
+"""
+Tests for closing-balance checkpoints and the windowed cash-flow forecast.
+"""
+from datetime import datetime
+
+import pytest
+
+import models
+from services import balance_checkpoints, forecast_service, ledger_snapshot
+from services.periods import add_months, current_month_key, month_label
+
+CURRENT = current_month_key()
+
+
+def _date(key, day=10):
+    return datetime(key // 100, key % 100, day)
+
+
+@pytest.fixture
+def history(db, sample_project):
+    pid = sample_project["id"]
+    rows = []
+    for back in range(36, 0, -1):
+        month = add_months(CURRENT, -back)
+        rows.append(models.Transaction(project_id=pid, date=_date(month), amount=1000 + back,
+                                       transaction_type=1, type="income"))
+        rows.append(models.Transaction(project_id=pid, date=_date(month, 20), amount=400,
+                                       transaction_type=1, type="expense"))
+    rows.append(models.CustomerPaymentPlan(project_id=pid, phase_id=1, manual_date=_date(add_months(CURRENT, -2)), value=700))
+    rows.append(models.CustomerPaymentPlan(project_id=pid, phase_id=2, manual_date=_date(add_months(CURRENT, 3)), value=900))
+    db.add_all(rows)
+    db.commit()
+    return pid
+
+
+def _window(full, from_key=None, to_key=None):
+    return [
+        r for r in full
+        if (from_key is None or r["date"] >= month_label(from_key))
+        and (to_key is None or r["date"] <= month_label(to_key))
+    ]
+
+
+def test_windows_match_the_full_report(db, history):
+    full = forecast_service.generate_cash_flow_forecast(db, history)
+    windows = [
+        (add_months(CURRENT, -30), add_months(CURRENT, -20)),
+        (CURRENT, add_months(CURRENT, 11)),
+        (add_months(CURRENT, -5), None),
+        (None, add_months(CURRENT, -10)),
+        (add_months(CURRENT, 2), add_months(CURRENT, 6)),
+    ]
+    for _ in range(2):  # cold, then from stored checkpoints
+        for from_key, to_key in windows:
+            assert forecast_service.generate_cash_flow_window(
+                db, history, from_key, to_key, checkpoint_db=db
+            ) == _window(full, from_key, to_key)
+
+    stored = db.query(models.BalanceCheckpoint).filter_by(project_id=history).count()
+    assert stored == 36
+    assert balance_checkpoints.latest_checkpoint(db, history, CURRENT)[0] == add_months(CURRENT, -1)
+
+
+def test_forward_view_skips_history(db, history, monkeypatch):
+    forecast_service.generate_cash_flow_window(db, history, add_months(CURRENT, -40), checkpoint_db=db)
+
+    grouped = []
+    real = forecast_service.build_forecast_report
+
+    def spy(inputs, opening_cents=0):
+        grouped.extend(inputs.actual)
+        return real(inputs, opening_cents)
+    monkeypatch.setattr(forecast_service, "build_forecast_report", spy)
+
+    rows = forecast_service.generate_cash_flow_window(db, history, CURRENT, add_months(CURRENT, 11), checkpoint_db=db)
+    assert grouped == []  # no past month is regrouped
+    assert rows[0]["date"] == month_label(CURRENT)
+
+
+def test_back_dated_write_invalidates_from_its_month(client, db, history):
+    forecast_service.generate_cash_flow_window(db, history, add_months(CURRENT, -40), checkpoint_db=db)
+    back_dated = add_months(CURRENT, -12)
+    client.post("/transactions/", json={
+        "project_id": history, "date": _date(back_dated).isoformat(), "amount": 5000,
+        "transaction_type": 1, "type": "expense",
+    })
+
+    assert balance_checkpoints.latest_checkpoint(db, history, CURRENT)[0] == add_months(back_dated, -1)
+    window = (add_months(CURRENT, -6), add_months(CURRENT, 6))
+    rows = forecast_service.generate_cash_flow_window(db, history, *window, checkpoint_db=db)
+    assert rows == _window(forecast_service.generate_cash_flow_forecast(db, history), *window)
+    assert balance_checkpoints.latest_checkpoint(db, history, CURRENT)[0] == add_months(CURRENT, -1)
+
+
+def test_endpoint_from_to(client, history):
+    full = client.get(f"/reports/cash-flow/{history}").json()
+    from_key, to_key = add_months(CURRENT, -3), add_months(CURRENT, 3)
+    response = client.get(
+        f"/reports/cash-flow/{history}?from={month_label(from_key)}&to={month_label(to_key)}"
+    )
+    assert response.json() == _window(full, from_key, to_key)
+    assert client.get(f"/reports/cash-flow/{history}?from=2025-13").status_code == 400
+    assert client.get(f"/reports/cash-flow/{history}?to=soon").status_code == 400
+
+
+def test_checkpoints_from_a_stale_snapshot_expire(client, db, history, monkeypatch):
+    stale = ledger_snapshot.get_versioned_ledger(db)
+    client.post("/transactions/", json={
+        "project_id": history, "date": _date(add_months(CURRENT, -5)).isoformat(), "amount": 5000,
+        "transaction_type": 1, "type": "expense",
+    })
+    # A snapshot that has not caught up with the write yet
+    with monkeypatch.context() as m:
+        m.setattr(forecast_service, "get_versioned_ledger", lambda db: stale)
+        forecast_service.generate_cash_flow_window(db, history, add_months(CURRENT, -12), None, checkpoint_db=db)
+
+    full = forecast_service.build_forecast_report(forecast_service.load_forecast_inputs(db, history))
+    from_key = add_months(CURRENT, -3)
+    assert forecast_service.generate_cash_flow_window(db, history, from_key, None) == _window(full, from_key)
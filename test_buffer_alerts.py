@@ -0,0 +1,138 @@
+"""
+Tests for the change log and the precomputed buffer-alert table.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import models
+from conftest import TestingSessionLocal
+from services import balance_checkpoints, buffer_alerts, change_log
+from services.periods import current_month_key, month_label
+
+
+def _expense(project_id, amount, when=None):
+    return models.Transaction(
+        project_id=project_id, date=when or datetime.now(), amount=Decimal(amount),
+        transaction_type=1, type="expense",
+    )
+
+
+def _events(db):
+    return [
+        (e.project_id, e.entity, e.month_key)
+        for e in db.query(models.ChangeEvent).order_by(models.ChangeEvent.id)
+    ]
+
+
+def test_change_log_records_project_and_month(db, sample_project, sample_budget_category):
+    pid = sample_project["id"]
+    tx = _expense(pid, "10", datetime(2025, 5, 3))
+    db.add(tx)
+    db.add(models.BudgetPlan(
+        budget_category_id=sample_budget_category.id, planned_date=datetime(2025, 7, 1), amount=Decimal("5"),
+    ))
+    db.commit()
+    assert (pid, "transaction", 202505) in _events(db)
+    assert (pid, "budget_plan", 202507) in _events(db)
+    last = db.query(models.ChangeEvent).order_by(models.ChangeEvent.id.desc()).first
+    assert last().inserts_only is True
+
+    # Back-dating reports the earlier of the old and new month
+    tx.date = datetime(2024, 11, 1)
+    db.commit()
+    assert _events(db)[-1] == (pid, "transaction", 202411)
+    assert last().inserts_only is False
+
+    tx.date = datetime(2025, 2, 1)
+    db.commit()
+    assert _events(db)[-1] == (pid, "transaction", 202411)
+
+    db.add(models.Account(name="Bank"))
+    db.commit()
+    assert _events(db)[-1] == (None, "account", None)
+    assert change_log.data_version(db, pid) == change_log.data_version(db)
+
+
+def test_change_log_listener_called_after_commit(db, sample_project):
+    seen = []
+    change_log.add_listener(seen.append)
+    try:
+        db.add(_expense(sample_project["id"], "1"))
+        db.flush()
+        assert seen == []
+        db.commit()
+    finally:
+        change_log.remove_listener(seen.append)
+    assert seen == [{sample_project["id"]}]
+
+
+def test_change_log_compaction_keeps_latest_per_slot(db, sample_project):
+    pid = sample_project["id"]
+    for month in (1, 2, 3):
+        db.add(_expense(pid, "1", datetime(2025, month, 1)))
+        db.commit()
+    before = change_log.data_version(db, pid)
+    versions, _ = change_log.latest_versions(db)
+    assert change_log.compact(db, now=datetime.utcnow() + timedelta(days=30)) == 2
+
+    assert _events(db)[-2:] == [(pid, "transaction", 202503), (None, change_log.COMPACTED, None)]
+    assert change_log.latest_versions(db)[0] == versions
+    # A version older than the removed events no longer proves "nothing changed"
+    assert change_log.data_version(db, pid) > before
+    assert balance_checkpoints.ledger_changed(db, pid, before, 202412)
+    assert change_log.compact(db, now=datetime.utcnow() + timedelta(days=30)) == 0
+
+
+def test_alerts_are_stored_and_served_from_table(db, client, sample_project, monkeypatch):
+    pid = sample_project["id"]
+    db.add(_expense(pid, "500"))
+    db.commit()
+
+    alerts = buffer_alerts.read_alerts(db)
+    assert alerts == [{
+        "project_id": pid,
+        "project_name": "Test Project",
+        "month": month_label(current_month_key()),
+        "balance": -500.0,
+        "buffer": 200000.0,
+        "shortfall": 200500.0,
+    }]
+    assert db.query(models.BufferAlert).count() == 1
+
+    # Fresh alerts are read without recomputing the forecast
+    def fail(*args, **kwargs):
+        raise AssertionError("recomputed fresh alerts")
+    monkeypatch.setattr(buffer_alerts, "compute_alerts", fail)
+    assert client.get("/alerts/buffer").json() == alerts
+    assert client.get("/reports/portfolio-summary").json()["buffer_alerts"] == alerts
+
+
+def test_alerts_go_stale_on_changes(db, client, sample_project):
+    pid = sample_project["id"]
+    assert buffer_alerts.refresh_stale(db) == 1
+    assert buffer_alerts.stale_project_ids(db) == []
+    assert client.get(f"/alerts/buffer?project_id={pid}").json() == []  # no forecast rows yet
+
+    db.add(_expense(pid, "100"))
+    db.commit()
+    assert buffer_alerts.stale_project_ids(db) == [pid]
+    assert client.get("/alerts/buffer").json()[0]["balance"] == -100.0
+
+    client.put(f"/projects/{pid}/settings", json={"project_id": pid, "cash_buffer_amount": -1000})
+    assert buffer_alerts.stale_project_ids(db) == [pid]
+    assert client.get("/alerts/buffer").json() == []
+
+    # A new month rolls overdue plans forward, so alerts are re-evaluated
+    state = db.get(models.BufferAlertState, pid)
+    state.month_key = 200001
+    db.commit()
+    assert buffer_alerts.stale_project_ids(db) == [pid]
+
+
+def test_background_evaluator_run_once(db, sample_project):
+    db.add(_expense(sample_project["id"], "1"))
+    db.commit()
+    evaluator = buffer_alerts.BufferAlertEvaluator(TestingSessionLocal, interval=60)
+    assert evaluator.run_once() == 1
+    assert evaluator.run_once() == 0
+    assert db.query(models.BufferAlert).count() == 1
@@ -0,0 +1,77 @@
+"""
+Tests for the report bulkhead pool.
+"""
+import threading
+import time
+
+import pytest
+
+from services import bulkhead, forecast_service
+from services.bulkhead import report_pool
+
+
+@pytest.fixture
+def slow_forecast(monkeypatch):
+    """Cash-flow forecasts that block until released; records their thread names."""
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    threads = []
+
+    def forecast(db, project_id=None):
+        threads.append(threading.current_thread().name)
+        started.release()
+        release.wait(5)
+        return []
+    monkeypatch.setattr(forecast_service, "generate_cash_flow_forecast", forecast)
+    yield started, release, threads
+    release.set()
+
+
+@pytest.fixture
+def small_pool():
+    def configure(workers, queue, queue_timeout=10):
+        report_pool.configure(workers, queue, queue_timeout, retry_after=7)
+    yield configure
+    report_pool.configure(bulkhead.REPORT_WORKERS, bulkhead.REPORT_QUEUE,
+                          bulkhead.REPORT_QUEUE_TIMEOUT, bulkhead.REPORT_RETRY_AFTER)
+
+
+def _in_background(client, url):
+    responses = []
+    thread = threading.Thread(target=lambda: responses.append(client.get(url)))
+    thread.start()
+    return thread, responses
+
+
+def test_full_pool_returns_503(client, slow_forecast, small_pool):
+    started, release, threads = slow_forecast
+    small_pool(workers=1, queue=0)
+
+    thread, responses = _in_background(client, "/reports/cash-flow/1")
+    assert started.acquire(timeout=5)
+    response = client.get("/reports/cash-flow/2")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+    # CRUD is served from its own threads meanwhile
+    assert client.get("/projects/").status_code == 200
+
+    release.set()
+    thread.join()
+    assert responses[0].status_code == 200
+    assert threads[0].startswith("reports")
+    assert client.get("/reports/cash-flow/2").status_code == 200
+
+
+def test_queue_timeout(client, slow_forecast, small_pool):
+    started, release, _ = slow_forecast
+    small_pool(workers=1, queue=1, queue_timeout=0.05)
+
+    first, _ = _in_background(client, "/reports/cash-flow/1")
+    assert started.acquire(timeout=5)
+    queued, responses = _in_background(client, "/reports/cash-flow/2")
+    time.sleep(0.2)
+    release.set()
+    first.join()
+    queued.join()
+    assert responses[0].status_code == 503
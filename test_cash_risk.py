@@ -0,0 +1,140 @@
+"""
+Tests for the Monte Carlo cash-buffer breach probability.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+
+import models
+from services import process_pool
+from services.cash_risk_service import (
+    RiskHistory, fit_collection_delays, fit_cost_overruns, load_cash_buffers,
+    run_breach_risk, simulate_breach_risk,
+)
+from services.forecast_service import ForecastInputs
+
+
+def _inputs():
+    # Opening balance 4000, one collection of 3000 next month, 5000 of costs in two months
+    return ForecastInputs(
+        current_month=202503,
+        actual={202501: [400000, 0]},
+        planned_income=[(202504, 300000)],
+        planned_expense=[(7, 202505, 500000)],
+    )
+
+
+def _history(delays=(0,), overruns=(1.0,)):
+    return RiskHistory(np.array(delays, dtype=np.int64), np.array(overruns, dtype=np.float64))
+
+
+def test_degenerate_history_matches_deterministic_forecast():
+    result = simulate_breach_risk(_inputs(), 150000, _history(), paths=200, seed=1)
+    assert result["months"] == ["2025-03", "2025-04", "2025-05"]
+    # Balances: 4000, 7000, 2000 -> never below 1500
+    assert result["breach_probability"] == [0.0, 0.0, 0.0]
+    assert result["balance_bands"]["p5"] == result["balance_bands"]["p95"] == [4000.0, 7000.0, 2000.0]
+
+
+def test_sampled_delays_and_overruns_produce_probabilities():
+    history = _history(delays=(0, 3), overruns=(1.0, 1.5))
+    result = simulate_breach_risk(_inputs(), 150000, history, paths=4000, seed=7)
+    months = result["months"]
+    assert months[-1] == "2025-07"
+    may = months.index("2025-05")
+    # May breaches when the collection is late (p=.5) or costs overrun (p=.5): 1 - .25
+    assert abs(result["breach_probability"][may] - 0.75) < 0.05
+    assert abs(result["any_breach_probability"] - 0.75) < 0.05
+    bands = result["balance_bands"]
+    assert bands["p5"][may] <= bands["p50"][may] <= bands["p95"][may]
+
+
+def test_same_seed_is_reproducible():
+    history = _history(delays=(0, 1, 2), overruns=(1.0, 1.2))
+    a = simulate_breach_risk(_inputs(), 150000, history, paths=500, seed=3)
+    b = simulate_breach_risk(_inputs(), 150000, history, paths=500, seed=3)
+    assert a == b
+
+
+def _tx(project_id, when, amount, **kwargs):
+    return models.Transaction(
+        project_id=project_id, date=when, amount=Decimal(amount), transaction_type=1, **kwargs,
+    )
+
+
+def test_fit_collection_delays(db, sample_project):
+    pid = sample_project["id"]
+    db.add_all([
+        models.CustomerPaymentPlan(project_id=pid, phase_id=1, manual_date=datetime(2024, 1, 1), value=Decimal("100")),
+        models.CustomerPaymentPlan(project_id=pid, phase_id=2, manual_date=datetime(2024, 6, 1), value=Decimal("100")),
+        _tx(pid, datetime(2024, 3, 5), "50", type="income", phase_id=1),
+        _tx(pid, datetime(2024, 3, 20), "50", type="income", phase_id=1),
+    ])
+    db.commit()
+
+    delays = fit_collection_delays(db, current_key=202410)
+    # Phase 1 collected two months late; phase 2 still open, four months overdue
+    assert sorted(delays.tolist()) == [2, 4]
+
+
+def test_fit_cost_overruns(db, sample_project):
+    pid = sample_project["id"]
+    steel = models.BudgetCategory(project_id=pid, category_name="Steel", planned_amount=1000)
+    paint = models.BudgetCategory(project_id=pid, category_name="Paint", planned_amount=1000)
+    db.add_all([steel, paint])
+    db.flush()
+    db.add_all([
+        models.BudgetPlan(budget_category_id=steel.id, planned_date=datetime(2024, 2, 1), amount=Decimal("1000")),
+        models.BudgetPlan(budget_category_id=paint.id, planned_date=datetime(2024, 2, 1), amount=Decimal("1000")),
+        _tx(pid, datetime(2024, 2, 10), "1250", type="expense", budget_item_id=steel.id),
+        _tx(pid, datetime(2024, 2, 10), "400", type="expense", budget_item_id=paint.id),
+    ])
+    db.commit()
+
+    ratios = fit_cost_overruns(db, current_key=202410)
+    assert sorted(ratios.tolist()) == [1.0, 1.25]
+
+
+def test_load_cash_buffers_defaults(db, sample_project):
+    pid = sample_project["id"]
+    assert load_cash_buffers(db, [pid]) == {pid: 20000000}
+    db.add(models.ProjectSetting(project_id=pid, cash_buffer_amount=Decimal("5000")))
+    db.commit()
+    assert load_cash_buffers(db, [pid]) == {pid: 500000}
+    db.query(models.ProjectSetting).update({"cash_buffer_amount": 0})
+    db.commit()
+    assert load_cash_buffers(db, [pid]) == {pid: 0}
+    db.query(models.ProjectSetting).update({"cash_buffer_amount": None})
+    db.commit()
+    assert load_cash_buffers(db, [pid]) == {pid: 20000000}
+
+
+def test_parallel_run_matches_inline(db, client):
+    for name in ("A", "B"):
+        client.post("/projects/", json={"name": name, "status": "Active"})
+    projects = db.query(models.Project).order_by(models.Project.id).all()
+    inline = run_breach_risk(db, projects, paths=300, seed=11, parallel=False)
+    process_pool.configure(2)
+    try:
+        pooled = run_breach_risk(db, projects, paths=300, seed=11, parallel=True)
+    finally:
+        process_pool.configure(0)
+    assert inline == pooled
+    assert [p["name"] for p in pooled["projects"]] == ["A", "B"]
+
+
+def test_cash_risk_endpoint(client, sample_project):
+    response = client.get("/reports/cash-risk", params={"paths": 200, "seed": 5})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["paths"] == 200 and data["seed"] == 5
+    project = data["projects"][0]
+    assert project["id"] == sample_project["id"]
+    assert project["buffer"] == 200000.0
+    assert set(project["balance_bands"]) == {"p5", "p25", "p50", "p75", "p95"}
+    assert len(project["breach_probability"]) == len(project["months"])
+
+    assert client.get("/reports/cash-risk", params={"project_id": 9999}).status_code == 404
+    assert client.get("/reports/cash-risk", params={"paths": 5}).status_code == 422
+    assert client.get("/reports/cash-risk", params={"seed": -5}).status_code == 422
@@ -0,0 +1,106 @@
+"""
+Tests for account -> budget category mapping upserts.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+import models
+from conftest import engine
+from services.category_mappings import upsert_account_category_mappings
+
+
+@pytest.fixture
+def commits():
+    count = []
+
+    def on_commit(conn):
+        count.append(1)
+    event.listen(engine, "commit", on_commit)
+    yield count
+    event.remove(engine, "commit", on_commit)
+
+
+def _tx_payload(project_id, account_id, category_id, **extra):
+    return {
+        "project_id": project_id, "date": "2025-03-01T00:00:00", "amount": 100,
+        "to_account_id": account_id, "budget_item_id": category_id, **extra,
+    }
+
+
+def test_unique_constraint(db, sample_accounts, sample_budget_category):
+    account_id = sample_accounts["regular"].id
+    for _ in range(2):
+        db.add(models.AccountCategoryMapping(account_id=account_id, budget_category_id=sample_budget_category.id))
+    with pytest.raises(IntegrityError):
+        db.commit()
+
+
+def test_create_transaction_upserts_in_one_commit(client, db, sample_project, sample_accounts, sample_budget_category, commits):
+    account_id = sample_accounts["regular"].id
+    payload = _tx_payload(sample_project["id"], account_id, sample_budget_category.id)
+
+    assert client.post("/transactions/", json=payload).status_code == 200
+    assert len(commits) == 1
+    first_used = db.query(models.AccountCategoryMapping).one().last_used
+
+    tx_id = client.post("/transactions/", json=payload).json()["id"]
+    assert len(commits) == 2
+    mapping = db.query(models.AccountCategoryMapping).one()
+    assert mapping.last_used >= first_used
+
+    assert client.put(f"/transactions/{tx_id}", json=payload).status_code == 200
+    assert len(commits) == 3
+    assert db.query(models.AccountCategoryMapping).count() == 1
+    assert client.get(f"/accounts/{account_id}/suggested-category").json() == {
+        "budget_category_id": sample_budget_category.id
+    }
+
+
+def test_system_account_zeroes_vat(client, sample_project, sample_accounts):
+    payload = _tx_payload(sample_project["id"], sample_accounts["system"].id, None, vat_rate=0.24)
+    assert client.post("/transactions/", json=payload).json()["vat_rate"] == 0
+    payload = _tx_payload(sample_project["id"], sample_accounts["regular"].id, None, vat_rate=0.24)
+    assert client.post("/transactions/", json=payload).json()["vat_rate"] == 0.24
+
+
+def test_bulk_create_batches_mappings(client, db, sample_project, sample_accounts, sample_budget_category, commits):
+    transaction_reads = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM transactions" in statement:
+            transaction_reads.append(statement)
+    event.listen(engine, "before_cursor_execute", on_execute)
+    pid = sample_project["id"]
+    regular, system = sample_accounts["regular"].id, sample_accounts["system"].id
+    payload = [
+        _tx_payload(pid, regular, sample_budget_category.id, vat_rate=0.24),
+        _tx_payload(pid, regular, sample_budget_category.id),
+        _tx_payload(pid, system, sample_budget_category.id, vat_rate=0.24),
+        _tx_payload(pid, regular, None),
+    ]
+    try:
+        response = client.post("/transactions/bulk", json=payload)
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    assert response.status_code == 200
+    assert len(transaction_reads) == 1  # one IN reload, not a refresh per row
+    created = response.json()
+    assert len(created) == 4 and all(t["id"] for t in created)
+    assert [t["vat_rate"] for t in created] == [0.24, 0, 0, 0]
+    assert len(commits) == 1
+
+    pairs = {(m.account_id, m.budget_category_id) for m in db.query(models.AccountCategoryMapping)}
+    assert pairs == {(regular, sample_budget_category.id), (system, sample_budget_category.id)}
+
+
+def test_batched_upsert_updates_last_used(db, sample_accounts, sample_budget_category):
+    account_id = sample_accounts["regular"].id
+    pairs = [(account_id, sample_budget_category.id)] * 3 + [(None, sample_budget_category.id)]
+    assert upsert_account_category_mappings(db, pairs, datetime(2024, 1, 1)) == 1
+    assert upsert_account_category_mappings(db, pairs, datetime(2025, 1, 1)) == 1
+    db.commit()
+    mapping = db.query(models.AccountCategoryMapping).one()
+    assert mapping.last_used == datetime(2025, 1, 1)
@@ -0,0 +1,191 @@
+"""
+Tests for the SSE change feed.
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+import models
+from conftest import engine, TestingSessionLocal
+from services import change_feed
+from services.change_feed import ChangeFeed
+
+
+class _Collector:
+    def __init__(self, project_id=None):
+        self.project_id = project_id
+        self.received = []
+
+    def deliver(self, notifications, resume_id):
+        self.received += [n for n in notifications if change_feed.matches(n, self.project_id)]
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], fields.get("id"), json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def short_streams(monkeypatch):
+    monkeypatch.setattr(change_feed, "STREAM_SECONDS", 0.6)
+    monkeypatch.setattr(change_feed, "HEARTBEAT_SECONDS", 0.2)
+
+
+@contextmanager
+def _raw_write(feed):
+    """engine.begin() outside the feed's polls: the in-memory test DB is one connection shared by all threads."""
+    with feed._poll_lock, engine.begin() as conn:
+        yield conn
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_coalesce_keeps_latest_per_project_and_entity():
+    rows = [(1, 5, "transaction", 202501), (2, 5, "apartment", None), (3, 5, "transaction", 202412), (4, 6, "transaction", None)]
+    coalesced = change_feed.coalesce([change_feed.to_notification(row) for row in rows])
+    assert [(n["id"], n["project_id"], n["entity"]) for n in coalesced] == [
+        (2, 5, "apartment"), (3, 5, "transaction"), (4, 6, "transaction")
+    ]
+
+
+def test_feed_delivers_commits_filtered_by_project(db, sample_project):
+    pid = sample_project["id"]
+    other = models.Project(name="Other", status="Active")
+    db.add(other)
+    db.commit()
+
+    # The feed thread is woken by these commits; nothing is polled by hand
+    feed = ChangeFeed(TestingSessionLocal, interval=60)
+    mine, everyone = _Collector(pid), _Collector()
+    start_id = feed.subscribe(mine)
+    feed.subscribe(everyone)
+    try:
+        db.add(models.Transaction(project_id=pid, date=datetime(2025, 3, 1), amount=10, transaction_type=1))
+        db.add(models.Apartment(project_id=other.id, name="B1"))
+        db.add(models.Account(name="Bank"))
+        db.commit()
+        assert _wait_for(lambda: len(everyone.received) == 3)
+    finally:
+        feed.stop()
+
+    assert all(n["id"] > start_id for n in everyone.received)
+    assert {(n["project_id"], n["entity"]) for n in mine.received} == {(pid, "transaction"), (None, "account")}
+    tx = next(n for n in mine.received if n["entity"] == "transaction")
+    assert tx["month_key"] == 202503 and "cash_flow" in tx["sections"]
+    assert feed.subscriber_count == 0
+
+
+def test_other_workers_events_are_picked_up(db):
+    feed = ChangeFeed(TestingSessionLocal, interval=0.05)
+    collector = _Collector()
+    feed.subscribe(collector)
+    try:
+        # Another worker's commit: a change_events row this process never saw through the ORM,
+        # so only the poll interval finds it
+        with _raw_write(feed) as conn:
+            conn.execute(models.ChangeEvent.__table__.insert().values(project_id=7, entity="customer_payment"))
+        assert _wait_for(lambda: collector.received)
+    finally:
+        feed.stop()
+    assert [(n["project_id"], n["entity"], n["sections"]) for n in collector.received] == [
+        (7, "customer_payment", ["kpi"])
+    ]
+
+
+def test_stream_replays_missed_events(client, sample_project, short_streams):
+    pid = sample_project["id"]
+    first = client.get(f"/events/changes?project_id={pid}")
+    assert first.headers["content-type"].startswith("text/event-stream")
+    (kind, ready_id, ready), = _events(first.text)
+    assert kind == "ready" and ready["version"] == int(ready_id)
+
+    client.post("/transactions/", json={"project_id": pid, "date": "2025-04-01T00:00:00", "amount": 5})
+    replayed = _events(client.get(f"/events/changes?project_id={pid}", headers={"Last-Event-ID": ready_id}).text)
+    assert [e[0] for e in replayed] == ["ready", "change"]
+    change = replayed[1][2]
+    assert change["entity"] == "transaction" and change["id"] == int(replayed[1][1]) > int(ready_id)
+
+
+def test_stream_resets_when_too_much_was_missed(client, sample_project, short_streams, monkeypatch):
+    pid = sample_project["id"]
+    (_, ready_id, _), = _events(client.get(f"/events/changes?project_id={pid}").text)
+    monkeypatch.setattr(change_feed, "REPLAY_LIMIT", 2)
+    for day in (1, 2, 3):
+        client.post("/transactions/", json={"project_id": pid, "date": f"2025-04-0{day}T00:00:00", "amount": 5})
+
+    events = _events(client.get(f"/events/changes?project_id={pid}", headers={"Last-Event-ID": ready_id}).text)
+    assert [e[0] for e in events] == ["ready", "reset"]
+    assert events[1][2]["version"] == int(events[1][1]) > int(ready_id)
+
+
+def test_backlog_is_not_repeated_live(db, sample_project, short_streams):
+    pid = sample_project["id"]
+    feed = ChangeFeed(TestingSessionLocal, interval=60)
+    before = feed.subscribe(_Collector())
+    db.add(models.Apartment(project_id=pid, name="A1"))
+    db.commit()
+
+    async def stream():
+        subscription = change_feed.Subscription(asyncio.get_running_loop(), pid)
+        start_id, backlog = feed.open(subscription, before)
+        # The same rows can also reach the new subscriber through a poll
+        subscription.deliver(backlog, start_id)
+        return [m async for m in change_feed.event_stream(feed, subscription, start_id, backlog, since=before)]
+
+    try:
+        messages = asyncio.run(stream())
+    finally:
+        feed.stop()
+    assert sum(m.startswith("event: change") for m in messages) == 1
+
+
+def test_settle_waits_for_out_of_order_commits(db):
+    feed = ChangeFeed(TestingSessionLocal, interval=60, settle=3600)
+    collector = _Collector()
+    feed.subscribe(collector)
+    table = models.ChangeEvent.__table__
+    try:
+        with _raw_write(feed) as conn:
+            conn.execute(table.insert().values(id=10, project_id=1, entity="apartment", created_at=datetime.utcnow()))
+        feed.poll_once()
+        # id 9 was handed out first but its transaction commits after 10 was read
+        with _raw_write(feed) as conn:
+            conn.execute(table.insert().values(id=9, project_id=1, entity="customer_payment", created_at=datetime.utcnow()))
+        feed.poll_once()
+        feed.poll_once()
+    finally:
+        feed.stop()
+    assert [n["id"] for n in collector.received] == [10, 9]
+
+
+def test_stream_pushes_live_changes(client, sample_project, short_streams):
+    pid = sample_project["id"]
+
+    def write_later():
+        time.sleep(0.2)
+        db = TestingSessionLocal()
+        try:
+            db.add(models.CustomerPaymentPlan(project_id=pid, manual_date=datetime(2026, 1, 1), value=100))
+            db.commit()
+        finally:
+            db.close()
+
+    writer = threading.Thread(target=write_later)
+    writer.start()
+    events = _events(client.get(f"/events/changes?project_id={pid}").text)
+    writer.join()
+    assert [(e[0], e[2].get("entity")) for e in events] == [("ready", None), ("change", "payment_plan")]
@@ -0,0 +1,73 @@
+"""
+Tests for negotiated response compression and precompressed cached reports.
+"""
+import gzip
+
+from services import compression, report_cache
+from services.compression import choose_encoding
+
+
+def _raw(client, url, accept_encoding):
+    with client.stream("GET", url, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding(None) is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("br, gzip;q=0") is None
+    assert choose_encoding("*") == "gzip"
+
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+
+
+def test_large_responses_compressed_small_ones_not(client, sample_project, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    for i in range(40):
+        client.post("/projects/", json={"name": f"Project {i}", "remarks": "x" * 50})
+
+    response, body = _raw(client, "/projects/", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert len(gzip.decompress(body)) > len(body)
+
+    response, body = _raw(client, "/projects/", "identity")
+    assert "content-encoding" not in response.headers
+    assert body.startswith(b"[")
+
+    response, _ = _raw(client, "/health", "gzip")
+    assert "content-encoding" not in response.headers
+
+
+def test_cached_report_stores_compressed_body(db, client, sample_project, sample_budget_category, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    monkeypatch.setattr(report_cache, "COMPRESS_MIN_SIZE", 0)
+    calls = []
+    real_compress = report_cache.compress
+
+    def counting_compress(body, encoding):
+        calls.append(encoding)
+        return real_compress(body, encoding)
+    monkeypatch.setattr(report_cache, "compress", counting_compress)
+
+    url = "/reports/portfolio-summary"
+    first, body = _raw(client, url, "gzip")
+    assert first.headers["content-encoding"] == "gzip"
+    for _ in range(3):
+        response, cached_body = _raw(client, url, "gzip")
+        assert cached_body == body
+    assert calls == ["gzip"]
+
+    plain, plain_body = _raw(client, url, "identity")
+    assert "content-encoding" not in plain.headers
+    assert gzip.decompress(body) == plain_body
+
+    # A write bumps the data version: the report is rebuilt and recompressed
+    client.put(f"/budget-categories/{sample_budget_category.id}", json={"planned_amount": 1})
+    _raw(client, url, "gzip")
+    assert calls == ["gzip", "gzip"]
+    assert client.get(url).json()["totals"]["total_budget"] == 1
@@ -0,0 +1,193 @@
+"""
+Tests for the composite project dashboard endpoint.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+import models
+from conftest import engine
+from services import budget_report_service, dashboard_service, forecast_service
+from services.periods import add_months, current_month_key, month_label
+
+
+@pytest.fixture
+def project_data(db, sample_project, sample_apartment):
+    pid = sample_project["id"]
+    steel = models.BudgetCategory(project_id=pid, category_name="Steel", planned_amount=1000)
+    paint = models.BudgetCategory(project_id=pid, category_name="Paint", planned_amount=500)
+    db.add_all([steel, paint])
+    db.commit()
+    now = datetime.now()
+    db.add_all([
+        models.Transaction(project_id=pid, date=datetime(2025, 1, 10), amount=1200, transaction_type=1,
+                           type="expense", budget_item_id=steel.id),
+        # Matched to Paint by category name only
+        models.Transaction(project_id=pid, date=datetime(2025, 2, 10), amount=100, transaction_type=1,
+                           type="expense", category="paint"),
+        models.BudgetPlan(budget_category_id=paint.id, planned_date=datetime(now.year + 1, 1, 1), amount=400),
+        models.CustomerPaymentPlan(project_id=pid, phase_id=1, manual_date=datetime(now.year + 1, 2, 1), value=5000),
+        models.CustomerPayment(apartment_id=sample_apartment["id"], date=datetime(2025, 1, 5), amount=1000),
+    ])
+    db.commit()
+    return pid
+
+
+@pytest.fixture
+def statements():
+    seen = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+    event.listen(engine, "before_cursor_execute", before_execute)
+    yield seen
+    event.remove(engine, "before_cursor_execute", before_execute)
+
+
+def test_sections_match_single_endpoints(client, project_data, monkeypatch):
+    pid = project_data
+    # The budget report endpoint reads through its own sqlite connection; point it at the test DB
+    monkeypatch.setattr(budget_report_service, "get_db_connection", _SharedConnection)
+    dashboard = client.get(f"/projects/{pid}/dashboard").json()
+    assert list(dashboard) == ["kpi", "cash_flow", "budget", "budget_timeline"]
+    assert dashboard["kpi"] == client.get(f"/projects/{pid}/kpi-summary").json()
+    assert dashboard["cash_flow"] == client.get(f"/reports/cash-flow/{pid}").json()
+    assert dashboard["budget"] == client.get(f"/reports/budget/{pid}").json()
+    assert dashboard["budget_timeline"] == client.get(f"/reports/budget-timeline/{pid}").json()
+
+    timeline = {row["name"]: row for row in dashboard["budget_timeline"]}
+    assert timeline["Paint"]["total_actual"] == 100  # name fallback
+    assert dashboard["kpi"]["collection"]["total_collected"] == 1000
+
+
+class _SharedConnection:
+    """The test engine's in-memory connection, shaped like get_db_connection()'s result."""
+
+    def __init__(self, read_only=False):
+        self._conn = engine.raw_connection().driver_connection
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def close(self):
+        pass  # shared with the ORM session
+
+
+def test_kpi_budget_health_counts_every_project_row(client, db, project_data):
+    pid = project_data
+    steel = db.query(models.BudgetCategory).filter_by(project_id=pid, category_name="Steel").one()
+    # Executed against the project's category, but with no (or another) project on the row
+    db.add_all([
+        models.Transaction(project_id=None, date=datetime(2025, 3, 10), amount=300, transaction_type=1,
+                           type="expense", budget_item_id=steel.id),
+        models.Transaction(project_id=pid + 1000, date=datetime(2025, 4, 10), amount=50, transaction_type=1,
+                           budget_item_id=steel.id),
+    ])
+    db.commit()
+
+    health = client.get(f"/projects/{pid}/kpi-summary").json()["budget_health"]
+    assert health["total_spent"] == 1200 + 300 + 50
+    assert health["worst_category"] == {"name": "Steel", "progress": 155.0, "overrun": 550.0}
+    portfolio = next(p for p in client.get("/reports/portfolio-summary").json()["projects"] if p["id"] == pid)
+    assert portfolio["worst_category"] == health["worst_category"]
+
+
+def test_subset_and_unknown_section(client, project_data):
+    pid = project_data
+    data = client.get(f"/projects/{pid}/dashboard?sections=cash_flow, kpi").json()
+    assert list(data) == ["cash_flow", "kpi"]
+
+    response = client.get(f"/projects/{pid}/dashboard?sections=kpi,charts")
+    assert response.status_code == 400
+    assert "charts" in response.json()["detail"]
+
+
+def test_failing_section_does_not_fail_the_dashboard(client, project_data, monkeypatch):
+    pid = project_data
+    expected = client.get(f"/projects/{pid}/dashboard?sections=budget,kpi").json()
+
+    def broken(db, project_id):
+        raise RuntimeError("timeline query failed")
+    monkeypatch.setattr(dashboard_service, "_load_timeline", broken)
+
+    data = client.get(f"/projects/{pid}/dashboard?sections=budget,budget_timeline,kpi").json()
+    assert data["budget_timeline"] is None
+    assert data["errors"] == {"budget_timeline": "timeline query failed"}
+    assert {k: data[k] for k in ("budget", "kpi")} == expected
+    with pytest.raises(RuntimeError):
+        client.get(f"/reports/budget-timeline/{pid}")
+
+
+def test_forecast_computed_once(db, project_data, monkeypatch):
+    calls = []
+    real = dashboard_service.forecast_service.generate_cash_flow_forecast
+
+    def counting(db, project_id=None):
+        calls.append(project_id)
+        return real(db, project_id)
+    monkeypatch.setattr(dashboard_service.forecast_service, "generate_cash_flow_forecast", counting)
+
+    data = dashboard_service.project_dashboard(db, project_data)
+    assert calls == [project_data]
+    assert data["kpi"]["next_month"]["month"]
+
+
+def test_fewer_queries_than_separate_calls(client, project_data, statements):
+    pid = project_data
+    for url in (f"/projects/{pid}/kpi-summary", f"/reports/cash-flow/{pid}", f"/reports/budget-timeline/{pid}"):
+        client.get(url)
+    separate = len(statements)
+
+    statements.clear()
+    client.get(f"/projects/{pid}/dashboard?sections=kpi,cash_flow,budget_timeline")
+    assert len(statements) < separate
+
+
+@pytest.fixture
+def rolling_plans(db, project_data):
+    """Past-due, current and future plans with partial actuals, around next month."""
+    pid = project_data
+    current = current_month_key()
+
+    def at(months, day=12):
+        key = add_months(current, months)
+        return datetime(key // 100, key % 100, day)
+    steel = db.query(models.BudgetCategory).filter_by(project_id=pid, category_name="Steel").one()
+    db.add_all([
+        models.BudgetPlan(budget_category_id=steel.id, planned_date=at(-2), amount=900),
+        models.BudgetPlan(budget_category_id=steel.id, planned_date=at(1), amount=600),
+        models.BudgetPlan(budget_category_id=steel.id, planned_date=at(3), amount=300),
+        models.CustomerPaymentPlan(project_id=pid, phase_id=2, manual_date=at(-1), value=2500),
+        models.CustomerPaymentPlan(project_id=pid, phase_id=3, manual_date=at(1), value=3000),
+        models.Transaction(project_id=pid, date=at(-4), amount=1000, transaction_type=1, type="income", phase_id=3),
+        models.Transaction(project_id=pid, date=at(1), amount=250, transaction_type=1, type="expense",
+                           budget_item_id=steel.id),
+        models.Transaction(project_id=pid, date=at(1), amount=700, transaction_type=1, type="income"),
+    ])
+    db.commit()
+    return pid
+
+
+def test_targeted_months_match_full_forecast(db, rolling_plans):
+    full = {row["date"]: row for row in forecast_service.generate_cash_flow_forecast(db, rolling_plans)}
+    current = current_month_key()
+    for start, end in ((1, 1), (0, 0), (0, 3), (-30, -1), (2, 20), (-12, 12)):
+        from_key, to_key = add_months(current, start), add_months(current, end)
+        rows = forecast_service.forecast_months(db, rolling_plans, from_key, to_key)
+        expected = [
+            {k: v for k, v in row.items() if k != "cumulative_balance"}
+            for label, row in sorted(full.items()) if month_label(from_key) <= label <= month_label(to_key)
+        ]
+        assert rows == expected
+
+
+def test_kpi_projection_skips_full_forecast(client, db, rolling_plans, monkeypatch):
+    with_forecast = client.get(f"/projects/{rolling_plans}/dashboard?sections=kpi,cash_flow").json()["kpi"]
+    monkeypatch.setattr(
+        dashboard_service.forecast_service, "generate_cash_flow_forecast",
+        lambda *args: pytest.fail("the KPI summary built the full forecast"),
+    )
+    kpi = client.get(f"/projects/{rolling_plans}/kpi-summary").json()
+    assert kpi == with_forecast
+    assert kpi["next_month"]["projected_income"] == 700 + 2000
@@ -0,0 +1,113 @@
+"""
+Tests for the frozen historical partition of cash-flow forecasts.
+"""
+from datetime import datetime
+
+import pytest
+
+import models
+from services import forecast_service, ledger_snapshot
+from services.periods import add_months, current_month_key
+
+CURRENT = current_month_key()
+
+
+def _date(key, day=10):
+    return datetime(key // 100, key % 100, day)
+
+
+@pytest.fixture
+def project(db, sample_project):
+    pid = sample_project["id"]
+    for back in range(24, 0, -1):
+        month = add_months(CURRENT, -back)
+        db.add(models.Transaction(project_id=pid, date=_date(month), amount=900 + back,
+                                  transaction_type=1, type="income"))
+        db.add(models.Transaction(project_id=pid, date=_date(month, 20), amount=300,
+                                  transaction_type=1, type="expense"))
+    db.add(models.CustomerPaymentPlan(project_id=pid, phase_id=1, manual_date=_date(add_months(CURRENT, -3)), value=800))
+    db.add(models.CustomerPaymentPlan(project_id=pid, phase_id=2, manual_date=_date(add_months(CURRENT, 4)), value=1200))
+    db.commit()
+    return pid
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """actual_from of every load_forecast_inputs call."""
+    calls = []
+    real = forecast_service.load_forecast_inputs
+
+    def spy(db, project_id=None, current_key=None, actual_from=None):
+        calls.append(actual_from)
+        return real(db, project_id, current_key, actual_from)
+    monkeypatch.setattr(forecast_service, "load_forecast_inputs", spy)
+    return calls
+
+
+def _uncached(db, pid):
+    return forecast_service.build_forecast_report(forecast_service.load_forecast_inputs(db, pid))
+
+
+def _add(client, pid, month, amount, kind="expense"):
+    client.post("/transactions/", json={
+        "project_id": pid, "date": _date(month).isoformat(), "amount": amount,
+        "transaction_type": 1, "type": kind,
+    })
+
+
+def test_history_is_computed_once(db, project, loads):
+    first = forecast_service.generate_cash_flow_forecast(db, project)
+    assert forecast_service.generate_cash_flow_forecast(db, project) == first
+    assert loads == [None, CURRENT]
+    loads.clear()
+    assert first == _uncached(db, project)
+
+
+def test_current_and_future_writes_keep_history(client, db, project, loads):
+    forecast_service.generate_cash_flow_forecast(db, project)
+    _add(client, project, CURRENT, 450)
+    _add(client, project, add_months(CURRENT, 2), 700, "income")
+    # Another project's back-dated write does not touch this one
+    other = client.post("/projects/", json={"name": "Other"}).json()["id"]
+    _add(client, other, add_months(CURRENT, -5), 50)
+
+    loads.clear()
+    rows = forecast_service.generate_cash_flow_forecast(db, project)
+    assert loads == [CURRENT]
+    loads.clear()
+    assert rows == _uncached(db, project)
+
+
+def test_back_dated_write_rebuilds_history(client, db, project, loads):
+    forecast_service.generate_cash_flow_forecast(db, project)
+    _add(client, project, add_months(CURRENT, -7), 5000)
+
+    loads.clear()
+    rows = forecast_service.generate_cash_flow_forecast(db, project)
+    assert loads == [None]
+    loads.clear()
+    assert rows == _uncached(db, project)
+
+
+def test_window_uses_frozen_rows(db, project, loads):
+    full = forecast_service.generate_cash_flow_forecast(db, project)
+    loads.clear()
+
+    past = forecast_service.generate_cash_flow_window(db, project, add_months(CURRENT, -10), add_months(CURRENT, -4))
+    assert [r["date"] for r in past] == [r["date"] for r in full[14:21]]
+    assert past == full[14:21]
+    assert loads == []
+
+    assert forecast_service.generate_cash_flow_window(db, project, add_months(CURRENT, -2)) == full[22:]
+    assert loads == [CURRENT]
+
+
+def test_stale_snapshot_is_not_frozen(client, db, project, monkeypatch):
+    stale = ledger_snapshot.get_versioned_ledger(db)
+    _add(client, project, add_months(CURRENT, -7), 5000)
+    # A snapshot that has not caught up with the write yet
+    with monkeypatch.context() as m:
+        m.setattr(forecast_service, "get_versioned_ledger", lambda db: stale)
+        forecast_service.generate_cash_flow_forecast(db, project)
+
+    assert forecast_service.generate_cash_flow_forecast(db, project) == _uncached(db, project)
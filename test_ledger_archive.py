@@ -0,0 +1,134 @@
+"""
+Tests for yearly archival of closed-period transactions.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import models
+from services import ledger_archive, project_rollups
+
+CLOSED = datetime.now().year - 2
+OPEN = datetime.now().year
+
+
+@pytest.fixture
+def archive_path(tmp_path, monkeypatch):
+    path = tmp_path / "archive.db"
+    monkeypatch.setattr(ledger_archive, "ARCHIVE_DB_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def ledger(db, sample_project, sample_budget_category):
+    pid = sample_project["id"]
+    project_type = models.AccountType(name="Project Account")
+    db.add(project_type)
+    db.commit()
+    project_account = models.Account(name="Project Bank", account_type_id=project_type.id)
+    db.add(project_account)
+    db.commit()
+
+    def tx(year, month, amount, **kwargs):
+        return models.Transaction(project_id=pid, date=datetime(year, month, 5), amount=amount,
+                                  transaction_type=1, **kwargs)
+    db.add_all([
+        tx(CLOSED, 1, 1000, type="expense", budget_item_id=sample_budget_category.id, category="Materials"),
+        tx(CLOSED, 1, 250, type="expense", budget_item_id=sample_budget_category.id, category="Materials"),
+        tx(CLOSED, 3, 80, type="expense", category="materials"),
+        tx(CLOSED, 4, 5000, type="income", phase_id=1),
+        # Untyped: income because it goes into a project account
+        tx(CLOSED, 6, 700, to_account_id=project_account.id),
+        tx(OPEN, 1, 300, type="expense", budget_item_id=sample_budget_category.id),
+    ])
+    db.add(models.CustomerPaymentPlan(project_id=pid, phase_id=1, manual_date=datetime(OPEN + 1, 1, 1), value=9000))
+    db.commit()
+    return pid
+
+
+def _reports(client, db, pid):
+    return {
+        "dashboard": client.get(f"/projects/{pid}/dashboard?sections=kpi,cash_flow,budget_timeline").json(),
+        "budget": client.get(f"/projects/{pid}/dashboard?sections=budget").json(),
+        "portfolio": client.get("/reports/portfolio-summary").json()["totals"],
+        "rollups": project_rollups.compute_rollups(db, [pid]),
+    }
+
+
+def test_archiving_keeps_report_totals(client, db, ledger, archive_path):
+    before = _reports(client, db, ledger)
+
+    response = client.post("/admin/archive")
+    assert response.json() == {"archived": {str(CLOSED): 5}}
+    assert archive_path.exists()
+
+    assert [t.month_key // 100 for t in db.query(models.Transaction)] == [OPEN]
+    summaries = db.query(models.TransactionSummary).all()
+    assert {s.year for s in summaries} == {CLOSED}
+    assert len(summaries) == 4  # the two identical January expenses share a row
+    assert _reports(client, db, ledger) == before
+    assert client.get("/admin/archive").json()["archived_years"] == [CLOSED]
+
+
+def test_ledger_reads_archive_on_demand(client, ledger, archive_path, monkeypatch):
+    before = client.get("/transactions/?limit=100").json()
+    client.post("/admin/archive")
+
+    attached = []
+    real_attach = ledger_archive.attach
+    monkeypatch.setattr(ledger_archive, "attach", lambda conn: attached.append(1) or real_attach(conn))
+
+    current = client.get(f"/transactions/?date_from={OPEN}-01-01").json()
+    assert current["total"] == 1 and not attached
+
+    assert client.get("/transactions/?limit=100").json() == before
+    archived = client.get(f"/transactions/?date_from={CLOSED}-01-01&date_to={CLOSED}-12-31&search=material").json()
+    assert [item["amount"] for item in archived["items"]] == [80, 1000, 250]
+    assert attached
+
+
+def test_late_entries_for_an_archived_year(client, db, ledger, archive_path):
+    client.post("/admin/archive")
+    assert client.post(f"/admin/archive?year={OPEN}").status_code == 400
+
+    client.post("/transactions/", json={
+        "project_id": ledger, "date": f"{CLOSED}-12-20T00:00:00", "amount": 40,
+        "transaction_type": 1, "type": "expense",
+    })
+    spent = project_rollups.compute_rollups(db, [ledger])[ledger]["actual_spent"]
+    assert spent == (1000 + 250 + 80 + 300 + 40) * 100
+
+    assert ledger_archive.closed_years(db) == [CLOSED]
+    assert client.post("/admin/archive").json() == {"archived": {str(CLOSED): 1}}
+    db.expire_all()
+    assert db.get(models.ArchivedYear, CLOSED).transaction_count == 6
+    assert project_rollups.compute_rollups(db, [ledger])[ledger]["actual_spent"] == spent
+
+
+def test_archived_ids_are_not_reused(client, db, ledger, archive_path):
+    # The newest transaction belongs to the closed year, so archiving removes the highest id
+    late = models.Transaction(project_id=ledger, date=datetime(CLOSED, 12, 1), amount=60, transaction_type=1)
+    db.add(late)
+    db.commit()
+    late_id = late.id
+    client.post("/admin/archive")
+
+    created = client.post("/transactions/", json={
+        "project_id": ledger, "date": f"{CLOSED}-12-20T00:00:00", "amount": 40, "transaction_type": 1,
+    }).json()
+    assert created["id"] > late_id
+    assert client.post("/admin/archive").json() == {"archived": {str(CLOSED): 1}}
+
+
+def test_archiving_an_archived_id_fails(db, ledger, archive_path):
+    ledger_archive.archive_year(db, CLOSED)
+    # A hot row whose id is already in the archive, as older databases could produce
+    db.execute(ledger_archive.archived_transactions.insert().values(id=1000, amount=1))
+    db.add(models.Transaction(id=1000, project_id=ledger, date=datetime(CLOSED, 2, 1), amount=2))
+    db.commit()
+
+    with pytest.raises(IntegrityError):
+        ledger_archive.archive_year(db, CLOSED)
+    db.rollback()
+    assert db.get(models.Transaction, 1000).amount == 2
@@ -0,0 +1,151 @@
+"""
+Tests for the in-memory columnar ledger snapshot.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+
+import models
+from services import lean_rows, ledger_snapshot
+from services.ledger_snapshot import get_ledger, group_sum, INCOME, EXPENSE
+
+
+def _tx(project_id, month, amount, **kwargs):
+    return models.Transaction(
+        project_id=project_id, date=datetime(2025, month, 10), amount=Decimal(amount),
+        transaction_type=1, **kwargs,
+    )
+
+
+def test_group_sum_is_exact_and_sorted():
+    values = np.array([2**53, 1, 5, 7], dtype=np.int64)
+    keys = np.array([3, 3, 1, 1])
+    unique, sums = group_sum(values, keys)
+    assert unique.tolist() == [1, 3]
+    assert sums.tolist() == [12, 2**53 + 1]
+
+
+def test_group_sum_two_keys():
+    values = np.array([10, 20, 30, 40])
+    a = np.array([1, 1, 2, 1])
+    b = np.array([5, 6, 5, 5])
+    ka, kb, sums = group_sum(values, a, b)
+    assert list(zip(ka.tolist(), kb.tolist(), sums.tolist())) == [(1, 5, 50), (1, 6, 20), (2, 5, 30)]
+
+
+def test_snapshot_columns(db, sample_project):
+    pid = sample_project["id"]
+    db.add_all([
+        _tx(pid, 1, "100.50", type="income", phase_id=4),
+        _tx(pid, 2, "40", type="expense", budget_item_id=9),
+    ])
+    db.commit()
+
+    ledger = get_ledger(db)
+    assert len(ledger) == 2
+    assert ledger.amount_cents.tolist() == [10050, 4000]
+    assert ledger.month_key.tolist() == [202501, 202502]
+    assert ledger.direction.tolist() == [INCOME, EXPENSE]
+    assert ledger.budget_item_id.tolist() == [0, 9]
+    assert ledger.phase_id.tolist() == [4, 0]
+
+
+def test_snapshot_streamed_in_batches(db, sample_project, monkeypatch):
+    pid = sample_project["id"]
+    db.add_all([_tx(pid, month, str(month), type="expense", budget_item_id=month) for month in range(1, 8)])
+    db.commit()
+    whole = get_ledger(db)
+
+    monkeypatch.setattr(lean_rows, "YIELD_PER", 3)
+    batched = ledger_snapshot._load_rows(db, 0)
+    for column in ("ids", "amount_cents", "month_key", "budget_item_id", "direction"):
+        assert getattr(batched, column).tolist() == getattr(whole, column).tolist()
+    assert ledger_snapshot._load_rows(db, int(whole.ids[-1])).amount_cents.tolist() == []
+
+
+def test_snapshot_appends_new_rows_incrementally(db, sample_project, monkeypatch):
+    pid = sample_project["id"]
+    db.add(_tx(pid, 1, "10", type="income"))
+    db.commit()
+    assert len(get_ledger(db)) == 1
+
+    loaded_after = []
+    original = ledger_snapshot._load_rows
+
+    def spy(session, after_id):
+        loaded_after.append(after_id)
+        return original(session, after_id)
+
+    monkeypatch.setattr(ledger_snapshot, "_load_rows", spy)
+    db.add(_tx(pid, 2, "20", type="income"))
+    db.commit()
+
+    ledger = get_ledger(db)
+    assert ledger.amount_cents.tolist() == [1000, 2000]
+    assert loaded_after == [1]  # only rows above the last seen id were read
+
+
+def test_snapshot_invalidated_on_update_and_delete(db, sample_project):
+    pid = sample_project["id"]
+    first, second = _tx(pid, 1, "10", type="income"), _tx(pid, 2, "20", type="income")
+    db.add_all([first, second])
+    db.commit()
+    assert get_ledger(db).amount_cents.tolist() == [1000, 2000]
+
+    first.amount = Decimal("15")
+    db.commit()
+    assert get_ledger(db).amount_cents.tolist() == [1500, 2000]
+
+    db.delete(second)
+    db.commit()
+    assert get_ledger(db).amount_cents.tolist() == [1500]
+
+
+def test_snapshot_detects_rows_deleted_elsewhere(db, sample_project):
+    from conftest import engine
+    from sqlalchemy import text
+
+    pid = sample_project["id"]
+    db.add_all([_tx(pid, 1, "10", type="income"), _tx(pid, 2, "20", type="income")])
+    db.commit()
+    assert len(get_ledger(db)) == 2
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM transactions WHERE id = 1"))
+    assert get_ledger(db).amount_cents.tolist() == [2000]
+
+
+def _write_elsewhere(statement, pid, inserts_only):
+    """A write by another worker: its SQL plus the change event its flush would log."""
+    from conftest import engine
+    from sqlalchemy import insert, text
+
+    with engine.begin() as conn:
+        conn.execute(text(statement))
+        conn.execute(insert(models.ChangeEvent).values(project_id=pid, entity="transaction", inserts_only=inserts_only))
+
+
+def test_snapshot_sees_updates_made_elsewhere(db, sample_project, monkeypatch):
+    pid = sample_project["id"]
+    db.add_all([_tx(pid, 1, "10", type="income"), _tx(pid, 2, "20", type="income")])
+    db.commit()
+    assert get_ledger(db).amount_cents.tolist() == [1000, 2000]
+
+    _write_elsewhere("UPDATE transactions SET amount = 15, amount_cents = 1500 WHERE id = 1", pid, False)
+    assert get_ledger(db).amount_cents.tolist() == [1500, 2000]
+
+    loaded_after = []
+    original = ledger_snapshot._load_rows
+
+    def spy(session, after_id):
+        loaded_after.append(after_id)
+        return original(session, after_id)
+
+    monkeypatch.setattr(ledger_snapshot, "_load_rows", spy)
+    _write_elsewhere(
+        f"INSERT INTO transactions (id, project_id, date, month_key, amount, amount_cents, transaction_type, type) "
+        f"VALUES (3, {pid}, '2025-03-10', 202503, 30, 3000, 1, 'income')", pid, True,
+    )
+    assert get_ledger(db).amount_cents.tolist() == [1500, 2000, 3000]
+    assert loaded_after == [2]  # an insert-only event appends
@@ -0,0 +1,66 @@
+"""
+Tests for integer-cents money helpers and the *_cents shadow columns.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import models
+import services.forecast_service
+from services.money import to_cents, from_cents, scale_cents
+
+
+def test_to_cents_rounds_half_up():
+    assert to_cents(Decimal("10.005")) == 1001
+    assert to_cents(0.1) == 10
+    assert to_cents("1234.56") == 123456
+    assert to_cents(-2.345) == -235
+    assert to_cents(None) is None
+
+
+def test_from_cents():
+    assert from_cents(123456) == 1234.56
+    assert from_cents(None) == 0.0
+
+
+def test_scale_cents():
+    assert scale_cents(1000, 1, 3) == 333
+    assert scale_cents(1000, 2, 3) == 667
+    assert scale_cents(-1000, 2, 3) == -667
+    assert scale_cents(1000, 1, 0) == 0
+
+
+def test_shadow_columns_follow_writes(db, sample_project):
+    tx = models.Transaction(project_id=sample_project["id"], date=datetime(2025, 1, 1), amount=Decimal("19.99"))
+    db.add(tx)
+    db.commit()
+    assert tx.amount_cents == 1999
+
+    tx.amount = Decimal("25.10")
+    db.commit()
+    assert tx.amount_cents == 2510
+
+
+def test_api_writes_fill_shadow_columns(client, db, sample_apartment, sample_budget_category):
+    client.post(f"/apartments/{sample_apartment['id']}/payments", json={
+        "date": "2025-02-01T00:00:00", "amount": 1500.25,
+    })
+    client.post(f"/budget-categories/{sample_budget_category.id}/plans", json={
+        "planned_date": "2025-03-01T00:00:00", "amount": 999.99,
+    })
+    assert db.query(models.CustomerPayment).one().amount_cents == 150025
+    assert db.query(models.BudgetPlan).one().amount_cents == 99999
+
+
+def test_forecast_sums_exactly(db, sample_project):
+    """Ten 0.10 transactions must total exactly 1.00."""
+    for _ in range(10):
+        db.add(models.Transaction(
+            project_id=sample_project["id"], date=datetime(2024, 5, 3),
+            amount=Decimal("0.10"), type="income", transaction_type=1,
+        ))
+    db.commit()
+
+    report = services.forecast_service.generate_cash_flow_forecast(db, sample_project["id"])
+    may = next(row for row in report if row["date"] == "2024-05")
+    assert may["actual_income"] == 1.0
+    assert may["cumulative_balance"] == 1.0
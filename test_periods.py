@@ -0,0 +1,43 @@
+"""
+Tests for yyyymm month keys and the month_key columns.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import models
+import services.forecast_service
+from services.periods import month_key, month_label, parse_month_label, add_months, current_month_key
+
+
+def test_month_key_helpers():
+    assert month_key(datetime(2025, 3, 31, 23, 59)) == 202503
+    assert month_key("2024-07-12") == 202407
+    assert month_key(None) is None
+    assert month_label(202503) == "2025-03"
+    assert parse_month_label("2025-03") == 202503
+    assert add_months(202511, 2) == 202601
+    assert add_months(202601, -1) == 202512
+    assert add_months(202503, -27) == 202212
+
+
+def test_month_key_columns_follow_writes(db, sample_project, sample_budget_category):
+    tx = models.Transaction(project_id=sample_project["id"], date=datetime(2025, 1, 15), amount=Decimal(10))
+    plan = models.CustomerPaymentPlan(project_id=sample_project["id"], manual_date=datetime(2025, 6, 1), value=Decimal(5))
+    bp = models.BudgetPlan(budget_category_id=sample_budget_category.id, planned_date=datetime(2026, 2, 1), amount=Decimal(7))
+    db.add_all([tx, plan, bp])
+    db.commit()
+    assert (tx.month_key, plan.month_key, bp.month_key) == (202501, 202506, 202602)
+
+    tx.date = datetime(2025, 12, 1)
+    db.commit()
+    assert tx.month_key == 202512
+
+
+def test_past_budget_plans_roll_into_current_month(client, db, sample_budget_category):
+    cat_id = sample_budget_category.id
+    past = (datetime.now() - timedelta(days=120)).strftime("%Y-%m-%dT00:00:00")
+    client.post(f"/budget-categories/{cat_id}/plans", json={"planned_date": past, "amount": 1000.0})
+
+    report = services.forecast_service.generate_cash_flow_forecast(db, sample_budget_category.project_id)
+    assert [row["date"] for row in report] == [month_label(current_month_key())]
+    assert report[0]["planned_expense"] == 1000.0
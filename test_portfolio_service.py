@@ -0,0 +1,57 @@
+"""
+Tests for the portfolio summary's split into compact inputs and per-project computation.
+"""
+import pickle
+from datetime import datetime
+
+import pytest
+
+import models
+from services import forecast_partitions, portfolio_service, process_pool
+
+
+@pytest.fixture
+def portfolio(db, sample_project, sample_apartment, sample_budget_category):
+    pid = sample_project["id"]
+    second = models.Project(name="Second", status="Completed")
+    db.add(second)
+    db.commit()
+    now = datetime.now()
+    db.add_all([
+        models.Transaction(project_id=pid, date=datetime(now.year - 1, 3, 5), amount=120000, transaction_type=1,
+                           type="expense", budget_item_id=sample_budget_category.id),
+        models.Transaction(project_id=second.id, date=datetime(now.year - 1, 6, 5), amount=800, transaction_type=1,
+                           type="income"),
+        models.CustomerPayment(apartment_id=sample_apartment["id"], date=datetime(now.year - 1, 2, 1), amount=250000),
+        models.CustomerPaymentPlan(project_id=pid, phase_id=1, manual_date=datetime(now.year + 1, 1, 1), value=9000),
+        models.Apartment(project_id=second.id, name="A", sale_price=1000),
+    ])
+    db.commit()
+    return [pid, second.id]
+
+
+def test_inputs_are_plain_data(db, portfolio):
+    inputs = portfolio_service.load_portfolio_inputs(db)
+    assert [p.id for p in inputs] == portfolio
+    first = pickle.loads(pickle.dumps(inputs[0]))
+    assert first.sale_cents.tolist() == [25000000] and first.paid_cents.tolist() == [25000000]
+    assert first.executed_cents.tolist() == [12000000]
+
+    summary = portfolio_service.summarize_project(first)
+    assert summary["fully_paid"] == 1
+    assert summary["categories_over"] == 1
+    assert summary["worst_category"]["overrun"] == 20000
+
+
+def test_process_pool_gives_the_same_summary(client, portfolio):
+    inline = client.get("/reports/portfolio-summary?run=inline").json()
+    assert inline["totals"]["project_count"] == 2
+
+    process_pool.configure(2)
+    try:
+        forecast_partitions._caches.clear()
+        assert client.get("/reports/portfolio-summary?run=cold").json() == inline
+        # Frozen past months are merged back in the request worker
+        assert client.get("/reports/portfolio-summary?run=warm").json() == inline
+    finally:
+        process_pool.configure(0)
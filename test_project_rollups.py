@@ -0,0 +1,74 @@
+"""
+Tests for the single-query project list and cached project rollups.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+import models
+from conftest import engine
+
+
+@pytest.fixture
+def statements():
+    seen = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+    event.listen(engine, "before_cursor_execute", before_execute)
+    yield seen
+    event.remove(engine, "before_cursor_execute", before_execute)
+
+
+def _projects(db, count):
+    projects = [models.Project(name=f"P{i}", status="Active") for i in range(count)]
+    db.add_all(projects)
+    db.commit()
+    for i, project in enumerate(projects):
+        db.add(models.BudgetCategory(project_id=project.id, category_name="Steel", planned_amount=100 * (i + 1)))
+        db.add(models.Apartment(project_id=project.id, name=f"A{i}"))
+    db.commit()
+    return [p.id for p in projects]
+
+
+def test_list_uses_constant_queries(db, client, statements):
+    _projects(db, 2)
+    statements.clear()
+    assert len(client.get("/projects/").json()) == 2
+    small = len(statements)
+
+    _projects(db, 20)
+    statements.clear()
+    projects = client.get("/projects/?rollups=true").json()
+    assert len(projects) == 22
+    assert len(statements) <= small + 4  # versions + three grouped rollup queries
+
+    statements.clear()
+    client.get("/projects/?rollups=true")
+    assert len(statements) == small + 1  # cached: only the version check
+
+
+def test_list_shape_unchanged(client, sample_project, sample_budget_category):
+    project = client.get("/projects/").json()[0]
+    assert "rollups" not in project
+    assert project["total_budget"] == 100000.0
+    assert set(project) == {"id", "name", "status", "project_account_val", "property_cost", "remarks",
+                            "account_balance", "total_budget"}
+
+
+def test_rollup_values_and_invalidation(db, client, sample_project, sample_apartment):
+    pid = sample_project["id"]
+    db.add_all([
+        models.Transaction(project_id=pid, date=datetime(2025, 1, 1), amount=300, transaction_type=1, type="expense"),
+        models.Transaction(project_id=pid, date=datetime(2025, 1, 1), amount=900, transaction_type=2, type="expense"),
+        models.CustomerPayment(apartment_id=sample_apartment["id"], date=datetime(2025, 1, 5), amount=1000),
+    ])
+    db.commit()
+
+    rollups = client.get("/projects/?rollups=true").json()[0]["rollups"]
+    assert rollups == {"actual_spent": 300.0, "total_collected": 1000.0, "apartments_count": 1}
+
+    payload = {"project_id": pid, "date": "2025-02-01T00:00:00", "amount": 50, "transaction_type": 1, "type": "expense"}
+    assert client.post("/transactions/", json=payload).status_code == 200
+    assert client.get("/projects/?rollups=true").json()[0]["rollups"]["actual_spent"] == 350.0
@@ -0,0 +1,45 @@
+"""
+Tests for the read-only report engine.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from database import create_report_engine
+
+
+@pytest.fixture
+def wal_file(tmp_path):
+    path = tmp_path / "reports.db"
+    writer = create_engine(f"sqlite:///{path}")
+    with writer.begin() as conn:
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+        conn.execute(text("CREATE TABLE payments (id INTEGER PRIMARY KEY, amount INTEGER)"))
+        conn.execute(text("INSERT INTO payments (amount) VALUES (100)"))
+    yield path, writer
+    writer.dispose()
+
+
+def test_report_engine_cannot_write(wal_file):
+    path, _ = wal_file
+    reports = create_report_engine(f"sqlite:///file:{path}?mode=ro&uri=true")
+    with reports.connect() as conn:
+        assert conn.execute(text("SELECT SUM(amount) FROM payments")).scalar() == 100
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO payments (amount) VALUES (1)"))
+    reports.dispose()
+
+
+def test_reports_read_while_a_write_is_open(wal_file):
+    path, writer = wal_file
+    reports = create_report_engine(f"sqlite:///file:{path}?mode=ro&uri=true")
+    with writer.connect() as write_conn:
+        write_conn.exec_driver_sql("BEGIN IMMEDIATE")
+        write_conn.execute(text("INSERT INTO payments (amount) VALUES (50)"))
+        # The open write transaction neither blocks the report nor leaks into it
+        with reports.connect() as conn:
+            assert conn.execute(text("SELECT SUM(amount) FROM payments")).scalar() == 100
+        write_conn.exec_driver_sql("COMMIT")
+    with reports.connect() as conn:
+        assert conn.execute(text("SELECT SUM(amount) FROM payments")).scalar() == 150
+    reports.dispose()
@@ -0,0 +1,111 @@
+"""
+Tests for the vectorized what-if scenario engine.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import models
+from services.forecast_service import ForecastInputs, build_forecast_report
+from services.scenario_service import evaluate_scenarios
+
+
+def _inputs():
+    return ForecastInputs(
+        current_month=202503,
+        actual={202501: [500000, 100000], 202502: [0, 50000]},
+        planned_income=[(202504, 300000), (202506, 200000)],
+        planned_expense=[(7, 202503, 150000), (8, 202505, 400000)],
+    )
+
+
+def test_baseline_matches_forecast_report():
+    inputs = _inputs()
+    result = evaluate_scenarios(inputs, [], buffer_cents=0)
+    baseline = result["scenarios"][0]
+    assert baseline["name"] == "Baseline"
+
+    by_month = dict(zip(result["months"], baseline["cumulative_balance"]))
+    for row in build_forecast_report(inputs):
+        assert by_month[row["date"]] == row["cumulative_balance"]
+    assert result["months"] == ["2025-01", "2025-02", "2025-03", "2025-04", "2025-05", "2025-06"]
+
+
+def test_income_shift_moves_collections_later():
+    result = evaluate_scenarios(_inputs(), [{"name": "Late buyers", "income_shift_months": 2}], buffer_cents=0)
+    late = result["scenarios"][1]
+    assert result["months"][-1] == "2025-08"
+    assert late["planned_income"][result["months"].index("2025-06")] == 3000.0
+    assert late["planned_income"][result["months"].index("2025-08")] == 2000.0
+    assert late["end_balance"] == result["scenarios"][0]["end_balance"]
+    assert late["vs_baseline"]["end_balance"] == 0.0
+
+
+def test_negative_shift_is_clamped_to_current_month():
+    result = evaluate_scenarios(_inputs(), [{"name": "Early", "expense_shift_months": -5}], buffer_cents=0)
+    early = result["scenarios"][1]
+    assert early["planned_expense"][result["months"].index("2025-03")] == 5500.0
+
+
+def test_category_override_scales_one_category():
+    scenarios = [{
+        "name": "Steel +50%",
+        "expense_factor": 1.1,
+        "category_overrides": [{"budget_category_id": 8, "factor": 1.5}],
+    }]
+    result = evaluate_scenarios(_inputs(), scenarios, buffer_cents=0)
+    scenario = result["scenarios"][1]
+    months = result["months"]
+    assert scenario["planned_expense"][months.index("2025-03")] == 1650.0  # 1500 * 1.1
+    assert scenario["planned_expense"][months.index("2025-05")] == 6000.0  # 4000 * 1.5
+    assert scenario["vs_baseline"]["end_balance"] == -2150.0
+
+
+def test_breaches_below_buffer():
+    result = evaluate_scenarios(_inputs(), [{"name": "Costs double", "expense_factor": 2}], buffer_cents=100000)
+    baseline, doubled = result["scenarios"]
+    assert result["buffer"] == 1000.0
+    assert baseline["breach_count"] == 0
+    assert doubled["first_breach_month"] == "2025-03"
+    assert doubled["breaches"][0] == {"month": "2025-03", "balance": 500.0, "shortfall": 500.0}
+    assert doubled["min_balance"] == -4500.0
+    assert doubled["min_balance_month"] == "2025-05"
+
+
+def test_scenarios_endpoint(client, db, sample_project, sample_budget_category):
+    pid = sample_project["id"]
+    next_year = datetime.now().year + 1
+    db.add(models.BudgetPlan(
+        budget_category_id=sample_budget_category.id,
+        planned_date=datetime(next_year, 1, 1),
+        amount=Decimal("1000"),
+    ))
+    db.commit()
+
+    response = client.post(f"/reports/scenarios/{pid}", json={
+        "scenarios": [{"name": "Slip", "expense_shift_months": 1}],
+        "cash_buffer_amount": 0,
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert [s["name"] for s in data["scenarios"]] == ["Baseline", "Slip"]
+    assert data["scenarios"][0]["end_balance"] == -1000.0
+    assert data["scenarios"][1]["planned_expense"][-1] == 1000.0
+    assert data["months"][-1] == f"{next_year}-02"
+
+
+def test_scenarios_endpoint_errors(client, sample_project):
+    assert client.post("/reports/scenarios/9999", json={"scenarios": []}).status_code == 404
+    too_many = [{"name": str(i)} for i in range(101)]
+    response = client.post(f"/reports/scenarios/{sample_project['id']}", json={"scenarios": too_many})
+    assert response.status_code == 400
+    for huge in ({"income_shift_months": 10**9}, {"category_overrides": [{"budget_category_id": 1, "shift_months": -121}]}):
+        response = client.post(f"/reports/scenarios/{sample_project['id']}", json={"scenarios": [dict(huge, name="x")]})
+        assert response.status_code == 422
+    # Factors must be finite and within [0, MAX_FACTOR]; NaN and Infinity are valid JSON to the parser
+    for factor in ("NaN", "Infinity", "-1", "101"):
+        for scenario in ('{"name": "x", "income_factor": %s}', '{"name": "x", "expense_factor": %s}',
+                         '{"name": "x", "category_overrides": [{"budget_category_id": 1, "factor": %s}]}'):
+            body = '{"scenarios": [%s]}' % (scenario % factor)
+            response = client.post(f"/reports/scenarios/{sample_project['id']}", content=body,
+                                   headers={"Content-Type": "application/json"})
+            assert response.status_code == 422, (factor, scenario)
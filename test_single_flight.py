@@ -0,0 +1,134 @@
+"""
+Tests for single-flight coalescing of report computations.
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from services import bulkhead, forecast_service, report_cache, single_flight
+from services.single_flight import SharedResults, SingleFlight
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def _concurrent(flights, key, fn, followers=4):
+    """Start a leader running fn, then followers for the same key once it is in flight."""
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_call(flights, key, fn)))]
+    threads[0].start()
+    _wait_for(lambda: key in flights._calls)
+    threads += [threading.Thread(target=lambda: results.append(_call(flights, key, fn))) for _ in range(followers)]
+    for t in threads[1:]:
+        t.start()
+    return threads, results
+
+
+def _call(flights, key, fn):
+    try:
+        return flights.run(key, fn)
+    except Exception as e:
+        return e
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"rows": len(calls)}
+
+    threads, results = _concurrent(flights, ("cash-flow", 1, 7), compute)
+    _wait_for(lambda: flights.waiters(("cash-flow", 1, 7)) == 4)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert len(results) == 5 and all(r is results[0] for r in results)
+
+    # Done calls are not cached: the next caller computes again
+    assert flights.run(("cash-flow", 1, 7), compute) == {"rows": 2}
+
+
+def test_followers_get_the_leaders_error():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("bad month")
+
+    threads, results = _concurrent(flights, "k", fail, followers=2)
+    _wait_for(lambda: flights.waiters("k") == 2)
+    release.set()
+    for t in threads:
+        t.join()
+    assert [type(r) for r in results] == [ValueError] * 3
+
+
+def test_stuck_leader_times_out():
+    flights = SingleFlight(timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=flights.run, args=("k", lambda: release.wait(5)))
+    leader.start()
+    _wait_for(lambda: "k" in flights._calls)
+    assert flights.run("k", lambda: "own") == "own"
+    release.set()
+    leader.join()
+
+
+def test_followers_wait_no_longer_than_a_report_may_queue(tmp_path):
+    # Followers hold a report_pool thread while they wait
+    assert single_flight.WAIT_TIMEOUT <= bulkhead.REPORT_QUEUE_TIMEOUT
+    assert SharedResults(str(tmp_path)).timeout == SingleFlight().timeout == single_flight.WAIT_TIMEOUT
+
+
+def test_shared_results_across_workers(tmp_path):
+    shared = SharedResults(str(tmp_path))
+    lock_path, body_path = shared._paths(("db", "/reports/portfolio-summary", 3))
+    # Another worker holds the lease and publishes its result a moment later
+    open(lock_path, "w").close()
+
+    def other_worker():
+        time.sleep(0.1)
+        with open(body_path, "wb") as f:
+            f.write(b'{"from":"other"}')
+        os.remove(lock_path)
+    threading.Thread(target=other_worker).start()
+
+    assert shared.run(("db", "/reports/portfolio-summary", 3), lambda: pytest.fail("computed twice")) == b'{"from":"other"}'
+    # A finished result is reused; a new version computes and stores its own
+    assert shared.run(("db", "/reports/portfolio-summary", 3), lambda: b"again") == b'{"from":"other"}'
+    assert shared.run(("db", "/reports/portfolio-summary", 4), lambda: b"v4") == b"v4"
+    assert not os.path.exists(shared._paths(("db", "/reports/portfolio-summary", 4))[0])
+
+
+def test_stale_lease_is_taken_over(tmp_path):
+    shared = SharedResults(str(tmp_path), lease_seconds=60)
+    lock_path, _ = shared._paths("k")
+    open(lock_path, "w").close()
+    os.utime(lock_path, (time.time() - 120, time.time() - 120))
+    assert shared.run("k", lambda: b"mine") == b"mine"
+
+
+def test_report_endpoint_uses_shared_results(client, sample_project, tmp_path, monkeypatch):
+    single_flight.configure(str(tmp_path))
+    try:
+        first = client.get(f"/reports/cash-flow/{sample_project['id']}").json()
+        assert [f for f in os.listdir(tmp_path) if f.endswith(".body")]
+
+        # Another worker (empty in-process cache) reuses the stored body
+        report_cache._caches.clear()
+        monkeypatch.setattr(forecast_service, "generate_cash_flow_forecast", lambda *a: pytest.fail("recomputed"))
+        assert client.get(f"/reports/cash-flow/{sample_project['id']}").json() == first
+    finally:
+        single_flight.configure(None)
@@ -0,0 +1,187 @@
+"""
+Tests for the in-memory account -> category suggestion index.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import models
+from conftest import TestingSessionLocal
+from services import suggestion_index
+from services.suggestion_index import suggest_categories, use_weight
+
+
+def _category(db, project_id, name):
+    cat = models.BudgetCategory(project_id=project_id, category_name=name, planned_amount=1000)
+    db.add(cat)
+    db.commit()
+    return cat.id
+
+
+def _tx(project_id, account_id, category_id, when):
+    return models.Transaction(
+        project_id=project_id, date=when, amount=Decimal("10"), transaction_type=1,
+        to_account_id=account_id, budget_item_id=category_id,
+    )
+
+
+def test_use_weight_halves_every_half_life():
+    now = datetime(2025, 1, 1)
+    older = now - timedelta(seconds=suggestion_index.HALF_LIFE)
+    assert abs(use_weight(older) / use_weight(now) - 0.5) < 1e-9
+
+
+def test_ranking_by_recency_and_frequency(db, sample_project, sample_accounts):
+    pid = sample_project["id"]
+    account_id = sample_accounts["regular"].id
+    steel, paint, glass = (_category(db, pid, n) for n in ("Steel", "Paint", "Glass"))
+    now = datetime.now()
+    db.add_all(
+        # Steel: used often, long ago. Paint: once, last week. Glass: three times, last month
+        [_tx(pid, account_id, steel, now - timedelta(days=720 + i)) for i in range(5)]
+        + [_tx(pid, account_id, paint, now - timedelta(days=7))]
+        + [_tx(pid, account_id, glass, now - timedelta(days=30 + i)) for i in range(3)]
+    )
+    db.commit()
+
+    ranked = suggest_categories(db, [account_id])[account_id]
+    assert [c for c, _ in ranked] == [glass, paint, steel]
+    assert 2.2 < ranked[0][1] < 2.5  # three uses, about a month old (2 ** -1/3 each)
+
+
+def test_index_updates_incrementally_after_commit(db, client, sample_project, sample_accounts, monkeypatch):
+    pid = sample_project["id"]
+    account_id = sample_accounts["regular"].id
+    steel, paint = _category(db, pid, "Steel"), _category(db, pid, "Paint")
+    db.add(_tx(pid, account_id, steel, datetime.now() - timedelta(days=1)))
+    db.commit()
+    assert client.get(f"/accounts/{account_id}/suggested-category").json() == {"budget_category_id": steel}
+
+    # No rebuild from here on: later changes must arrive incrementally
+    monkeypatch.setattr(suggestion_index.SuggestionIndex, "_build", None)
+    payload = {"project_id": pid, "date": datetime.now().isoformat(), "amount": 5,
+               "to_account_id": account_id, "budget_item_id": paint}
+    client.post("/transactions/", json=payload)
+    tx_id = client.post("/transactions/", json=payload).json()["id"]
+    assert client.get(f"/accounts/{account_id}/suggested-category").json() == {"budget_category_id": paint}
+
+    # Rolled back writes are ignored
+    db.add(_tx(pid, account_id, steel, datetime.now()))
+    db.flush()
+    db.rollback()
+    assert client.get(f"/accounts/{account_id}/suggested-category").json() == {"budget_category_id": paint}
+
+    # Deleting a category stops it being suggested
+    client.delete(f"/transactions/{tx_id}")
+    db.delete(db.get(models.BudgetCategory, paint))
+    db.commit()
+    assert client.get(f"/accounts/{account_id}/suggested-category").json() == {"budget_category_id": steel}
+
+
+def test_batch_suggestions_filter_by_project(db, client, sample_project, sample_accounts):
+    pid = sample_project["id"]
+    other = client.post("/projects/", json={"name": "Other", "status": "Active"}).json()["id"]
+    regular, system = sample_accounts["regular"].id, sample_accounts["system"].id
+    ours, theirs = _category(db, pid, "Steel"), _category(db, other, "Steel")
+    now = datetime.now()
+    db.add_all([
+        _tx(pid, regular, ours, now - timedelta(days=60)),
+        _tx(other, regular, theirs, now),
+        _tx(other, regular, theirs, now),
+    ])
+    db.commit()
+
+    response = client.post("/accounts/suggested-categories", json={
+        "account_ids": [regular, system, regular], "project_id": pid,
+    })
+    assert response.status_code == 200
+    suggestions = response.json()["suggestions"]
+    assert [s["account_id"] for s in suggestions] == [regular, system]
+    assert suggestions[0]["budget_category_id"] == ours
+    assert [c["budget_category_id"] for c in suggestions[0]["candidates"]] == [ours]
+    assert suggestions[1] == {"account_id": system, "budget_category_id": None, "candidates": []}
+
+    unfiltered = client.post("/accounts/suggested-categories", json={"account_ids": [regular]}).json()
+    assert [c["budget_category_id"] for c in unfiltered["suggestions"][0]["candidates"]] == [theirs, ours]
+
+
+def test_removed_uses_leave_no_residue_and_future_dates_count_as_now(db, sample_project, sample_accounts, monkeypatch):
+    pid = sample_project["id"]
+    account_id = sample_accounts["regular"].id
+    steel, paint, typo = (_category(db, pid, n) for n in ("Steel", "Paint", "Typo"))
+    now = datetime.now()
+    db.add_all([_tx(pid, account_id, steel, now - timedelta(days=400)), _tx(pid, account_id, typo, now.replace(year=2100))])
+    db.add_all(_tx(pid, account_id, paint, now - timedelta(days=1)) for _ in range(2))
+    db.commit()
+    assert [c for c, _ in suggest_categories(db, [account_id])[account_id]] == [paint, typo, steel]
+
+    monkeypatch.setattr(suggestion_index.SuggestionIndex, "_build", None)
+    added = [_tx(pid, account_id, steel, now - timedelta(days=d)) for d in (3, 17, 101)]
+    for tx in added:
+        db.add(tx)
+        db.commit()
+    for tx in db.query(models.Transaction).filter(models.Transaction.budget_item_id == steel):
+        db.delete(tx)
+        db.commit()
+    assert [c for c, _ in suggest_categories(db, [account_id])[account_id]] == [paint, typo]
+
+
+def _index_state(index):
+    # Weights are large floats summed in a different order; compare them to 12 significant digits
+    return index._counts, {a: {c: float(f"{w:.12g}") for c, w in per.items()} for a, per in index._weights.items()}
+
+
+def test_incremental_index_matches_a_rebuild(db, client, sample_project, sample_accounts):
+    pid = sample_project["id"]
+    account_id = sample_accounts["regular"].id
+    steel, paint = _category(db, pid, "Steel"), _category(db, pid, "Paint")
+    db.add(_tx(pid, account_id, steel, datetime.now() - timedelta(days=40)))
+    db.commit()
+    suggest_categories(db, [account_id])
+    index = suggestion_index._indexes.for_session(db)
+
+    # Creates and updates also upsert the mapping rows, which a rebuild counts once each
+    payload = {"project_id": pid, "date": (datetime.now() - timedelta(days=5)).isoformat(), "amount": 5,
+               "to_account_id": account_id, "budget_item_id": paint}
+    first = client.post("/transactions/", json=payload).json()["id"]
+    client.post("/transactions/", json=payload)
+    client.put(f"/transactions/{first}", json={**payload, "budget_item_id": steel})
+    client.post("/transactions/bulk", json=[payload, {**payload, "budget_item_id": steel}])
+
+    incremental = _index_state(index)
+    weights, counts, _ = index._build(db)
+    index._weights, index._counts = weights, counts
+    assert incremental == _index_state(index)
+
+
+def test_rebuild_does_not_block_readers(db, sample_project, sample_accounts, monkeypatch):
+    pid = sample_project["id"]
+    account_id = sample_accounts["regular"].id
+    steel = _category(db, pid, "Steel")
+    db.add(_tx(pid, account_id, steel, datetime.now()))
+    db.commit()
+    suggest_categories(db, [account_id])
+    index = suggestion_index._indexes.for_session(db)
+
+    started, release = threading.Event(), threading.Event()
+    real_build = suggestion_index.SuggestionIndex._build
+
+    def slow_build(self, session):
+        started.set()
+        release.wait(5)
+        return real_build(self, session)
+    monkeypatch.setattr(suggestion_index.SuggestionIndex, "_build", slow_build)
+    monkeypatch.setattr(suggestion_index, "MAX_AGE", 0)
+    time.sleep(0.01)
+
+    rebuild = threading.Thread(target=index.ensure, args=(TestingSessionLocal(),))
+    rebuild.start()
+    assert started.wait(5)
+    # Served from the previous index while the rebuild runs
+    assert index.suggest([account_id])[account_id][0][0] == steel
+    waited = time.monotonic()
+    index.ensure(db)
+    assert time.monotonic() - waited < 1
+    release.set()
+    rebuild.join()
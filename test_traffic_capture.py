@@ -0,0 +1,81 @@
+"""
+Tests for the traffic capture middleware and the replay harness.
+"""
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI
+
+from replay_traffic import load_capture, percentile, replay, summarize
+from services.traffic_capture import TrafficCaptureMiddleware, sanitize_query
+
+
+def _capture_app(capture_path):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    return TrafficCaptureMiddleware(app, capture_path=str(capture_path))
+
+
+def test_sanitize_query_redacts_free_text():
+    assert sanitize_query("project_id=3&search=John+Doe") == "project_id=3&search=redacted"
+    assert sanitize_query("q=&limit=10") == "q=&limit=10"
+    assert sanitize_query("") == ""
+
+
+def test_middleware_appends_jsonl(tmp_path):
+    from fastapi.testclient import TestClient
+
+    capture = tmp_path / "capture.jsonl"
+    client = TestClient(_capture_app(capture))
+    client.get("/items/7?search=secret&limit=5")
+    client.get("/missing")
+    client.app.flush()
+
+    lines = [json.loads(line) for line in capture.read_text().splitlines()]
+    assert len(lines) == 2
+    first = lines[0]
+    assert first["method"] == "GET"
+    assert first["path"] == "/items/7"
+    assert first["route"] == "/items/{item_id}"
+    assert first["query"] == "search=redacted&limit=5"
+    assert first["status"] == 200
+    assert first["duration_ms"] >= 0
+    assert lines[1]["status"] == 404
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0
+
+
+def test_replay_reports_per_route(tmp_path):
+    capture = tmp_path / "capture.jsonl"
+    records = [
+        {"ts": 1000.0, "method": "GET", "path": "/items/1", "route": "/items/{item_id}", "query": ""},
+        {"ts": 1000.1, "method": "GET", "path": "/items/2", "route": "/items/{item_id}", "query": ""},
+        {"ts": 1000.2, "method": "GET", "path": "/missing", "route": "/missing", "query": ""},
+        {"ts": 1000.3, "method": "POST", "path": "/items/", "route": "/items/", "query": ""},
+    ]
+    capture.write_text("\n".join(json.dumps(r) for r in records))
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    transport = httpx.ASGITransport(app=app)
+    results = asyncio.run(replay(load_capture(capture), "http://test", concurrency=2, rate=0, transport=transport))
+    summary = {row["route"]: row for row in summarize(results)}
+
+    assert len(results) == 3  # POST is skipped
+    assert summary["/items/{item_id}"]["count"] == 2
+    assert summary["/items/{item_id}"]["error_rate"] == 0
+    assert summary["/missing"]["client_error_rate"] == 100.0